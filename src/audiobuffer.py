@@ -0,0 +1,175 @@
+"""
+PCM audio passed from capture to playback without copies.
+
+An Audio is a memoryview of PCM samples plus their format. It stands in for
+WAV bytes anywhere in the pipeline: the WAV header is only built when
+something needs a WAV file (an STT upload, a network client), and WAV bytes
+coming in (TTS responses) are parsed into an Audio pointing into them.
+
+A PcmBuffer is where the VAD records an utterance: a preallocated bytearray
+the chunks are written into once, handing out Audio views of it.
+"""
+import io
+import struct
+
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+def wav_header(data_size: int, rate: int, channels: int, sample_width: int) -> bytes:
+    """Canonical 44 byte header of a PCM WAV file with data_size bytes of frames."""
+    block_align = channels * sample_width
+    return WAV_HEADER.pack(b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, channels, rate,
+                           rate * block_align, block_align, sample_width * 8, b"data", data_size)
+
+class Audio:
+    """PCM samples and their format, framed as a WAV file only on demand."""
+    __slots__ = ("pcm", "rate", "channels", "sample_width")
+
+    def __init__(self, pcm, rate=16000, channels=1, sample_width=2):
+        self.pcm = memoryview(pcm).cast("B")
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+    @classmethod
+    def from_wav(cls, data) -> "Audio":
+        """Parse WAV bytes, the Audio shares their memory."""
+        view = memoryview(data).cast("B")
+        if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+            raise ValueError("Not a WAV file")
+        pos = 12
+        fmt = None
+        while pos + 8 <= len(view):
+            chunk_id = view[pos:pos + 4].tobytes()
+            chunk_size, = struct.unpack_from("<I", view, pos + 4)
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", view, pos + 8)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV file has no fmt chunk before its data")
+                format_tag, channels, rate, _, _, bits = fmt
+                # PCM or WAVE_FORMAT_EXTENSIBLE, mu-law WAVs need decoders.decode
+                if format_tag not in (1, 0xFFFE):
+                    raise ValueError(f"WAV file is not PCM (format {format_tag})")
+                # Streamed WAVs may not know their size and leave it at 0 or 0xFFFFFFFF
+                end = len(view) if chunk_size in (0, 0xFFFFFFFF) else min(len(view), pos + 8 + chunk_size)
+                frame_size = channels * bits // 8
+                end -= (end - pos - 8) % frame_size
+                return cls(view[pos + 8:end], rate, channels, bits // 8)
+            # Chunks are padded to an even size
+            pos += 8 + chunk_size + (chunk_size & 1)
+        raise ValueError("WAV file has no data chunk")
+
+    @property
+    def header(self) -> bytes:
+        return wav_header(len(self.pcm), self.rate, self.channels, self.sample_width)
+
+    @property
+    def frames(self) -> int:
+        return len(self.pcm) // (self.channels * self.sample_width)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.rate
+
+    def __len__(self):
+        # Size as a WAV file, like the bytes it replaces
+        return WAV_HEADER.size + len(self.pcm)
+
+    def __bytes__(self):
+        """The WAV file, the one copy for consumers that need contiguous bytes."""
+        return self.header + self.pcm
+
+    def file(self) -> "WavFile":
+        """A readable, seekable WAV file over the samples, for uploads."""
+        return WavFile(self)
+
+class WavFile(io.RawIOBase):
+    """File object reading the header and then the samples of an Audio, without joining them."""
+    def __init__(self, audio: Audio):
+        self.header = audio.header
+        self.pcm = audio.pcm
+        self.size = len(self.header) + len(self.pcm)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, buffer):
+        written = 0
+        target = memoryview(buffer).cast("B")
+        for source, start in ((self.header, 0), (self.pcm, len(self.header))):
+            offset = self.position - start
+            if 0 <= offset < len(source) and written < len(target):
+                count = min(len(source) - offset, len(target) - written)
+                target[written:written + count] = source[offset:offset + count]
+                written += count
+                self.position += count
+        return written
+
+def as_audio(audio) -> Audio:
+    """An Audio for audio given as an Audio or as WAV bytes."""
+    return audio if isinstance(audio, Audio) else Audio.from_wav(audio)
+
+class PcmBuffer:
+    """
+    Growable PCM recording buffer.
+
+    Chunks are copied in once, into a preallocated bytearray, and audio()
+    returns views of it. Growing allocates a larger bytearray instead of
+    resizing, so views handed out earlier stay valid, and clear() only
+    allocates a new one if views of the old one may still be in use.
+    """
+    def __init__(self, capacity=320000, rate=16000, channels=1, sample_width=2):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.buffer = bytearray(capacity)
+        self.length = 0
+        self.exported = False
+        # Bytes allocated and copied, for the allocation benchmark
+        self.allocated = capacity
+        self.copied = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, chunk):
+        end = self.length + len(chunk)
+        if end > len(self.buffer):
+            grown = bytearray(max(end, 2 * len(self.buffer)))
+            grown[:self.length] = memoryview(self.buffer)[:self.length]
+            self.allocated += len(grown)
+            self.copied += self.length
+            self.buffer = grown
+            self.exported = False
+        self.buffer[self.length:end] = chunk
+        self.copied += len(chunk)
+        self.length = end
+
+    def extend(self, chunks):
+        for chunk in chunks:
+            self.append(chunk)
+
+    def audio(self, start=0, end=None) -> Audio:
+        """Audio of bytes start to end, sharing the buffer's memory."""
+        end = self.length if end is None else min(end, self.length)
+        self.exported = True
+        return Audio(memoryview(self.buffer)[start:end], self.rate, self.channels, self.sample_width)
+
+    def clear(self):
+        if self.exported:
+            self.buffer = bytearray(len(self.buffer))
+            self.allocated += len(self.buffer)
+            self.exported = False
+        self.length = 0
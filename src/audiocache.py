@@ -0,0 +1,88 @@
+"""
+Build-once cache of decoded audio assets.
+
+Decoding an mp3 needs ffmpeg and is slow, so the decoded (and faded) PCM is
+written once as a WAV file next to the source asset, keyed by a hash of the
+source bytes and the processing options. Later loads memory-map that file:
+no decoding at startup, and every Player in every process shares the same
+page-cache pages instead of holding its own copy on the heap.
+"""
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import wave
+
+logger = logging.getLogger(__name__)
+
+# Size of the canonical PCM WAV header written by the wave module
+WAV_HEADER_SIZE = 44
+
+def _cache_path(source_path, fade_in_ms, sample_rate, channels, sample_width):
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f"fade={fade_in_ms};rate={sample_rate};channels={channels};width={sample_width}".encode())
+    return f"{source_path}.{digest.hexdigest()[:16]}.pcm.wav"
+
+def _decode(source_path, fade_in_ms, sample_rate, channels, sample_width):
+    from pydub import AudioSegment
+    logger.info(f"Decoding {os.path.basename(source_path)}")
+    segment = AudioSegment.from_file(source_path)
+    if fade_in_ms:
+        segment = segment.fade_in(fade_in_ms)
+    if sample_rate:
+        segment = segment.set_frame_rate(sample_rate)
+    if channels:
+        segment = segment.set_channels(channels)
+    if sample_width:
+        segment = segment.set_sample_width(sample_width)
+    return segment
+
+def _write(segment, source_path, cache_path):
+    # Write to a temporary file first so concurrent loaders never see a partial cache
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with wave.open(tmp_path, 'wb') as wav_file:
+        wav_file.setnchannels(segment.channels)
+        wav_file.setsampwidth(segment.sample_width)
+        wav_file.setframerate(segment.frame_rate)
+        wav_file.writeframes(segment.raw_data)
+    os.replace(tmp_path, cache_path)
+
+    # Drop caches built from older versions of the asset
+    for stale in glob.glob(f"{glob.escape(source_path)}.*.pcm.wav"):
+        if stale != cache_path:
+            os.remove(stale)
+
+def load_cached_pcm(source_path, fade_in_ms=0, sample_rate=None, channels=None, sample_width=None):
+    """
+    Return the decoded PCM of an audio asset, memory-mapped from its cache.
+
+    sample_rate, channels and sample_width convert the audio to a device format,
+    None keeps the source format.
+
+    Returns:
+        (memoryview, channels, sample_width, sample_rate)
+    """
+    cache_path = _cache_path(source_path, fade_in_ms, sample_rate, channels, sample_width)
+    if not os.path.exists(cache_path):
+        segment = _decode(source_path, fade_in_ms, sample_rate, channels, sample_width)
+        try:
+            _write(segment, source_path, cache_path)
+        except OSError as e:
+            # Read-only install: still play, just without the shared cache
+            logger.warning(f"Could not write audio cache {cache_path}: {e}")
+            return memoryview(segment.raw_data), segment.channels, segment.sample_width, segment.frame_rate
+
+    with open(cache_path, 'rb') as cache_file:
+        mapped = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[0:4] != b'RIFF' or mapped[36:40] != b'data':
+        raise ValueError(f"Unexpected WAV header in {cache_path}")
+    num_channels, sample_rate, _, _, bits = struct.unpack('<HIIHH', mapped[22:36])
+    data_size, = struct.unpack('<I', mapped[40:44])
+    logger.debug(f"Memory-mapped {data_size} bytes of audio from {cache_path}")
+    pcm = memoryview(mapped)[WAV_HEADER_SIZE:WAV_HEADER_SIZE + data_size]
+    return pcm, num_channels, bits // 8, sample_rate
@@ -0,0 +1,156 @@
+"""
+Queue of speech between the event loop and the playback thread.
+
+Speech is synthesized on the event loop and played from a thread or an
+audio callback. An AudioQueue lets the loop await room in it instead of
+polling its size, with room counted in clips, bytes or seconds of audio,
+and lets the consumer block on it from a thread, poll it from a callback
+that must not block, or await it on the loop.
+
+flush() drops everything queued in one step and starts a new generation.
+Producers pass the generation they started in with each item and items of
+an older one are refused, so speech synthesized for an interrupted answer
+cannot slip in after the flush. Consumers get each item's generation and
+check it is still current before playing it, in case the flush came while
+they were taking it.
+"""
+import asyncio
+import queue
+import threading
+from collections import deque
+
+from audiobuffer import Audio
+
+def audio_size(audio):
+    """
+    (bytes, seconds) of PCM in an Audio or PCM WAV bytes. Other encodings
+    count by their size, their duration is only known once decoded.
+    """
+    if not isinstance(audio, Audio):
+        try:
+            audio = Audio.from_wav(audio)
+        except ValueError:
+            return len(audio), 0.0
+    return len(audio.pcm), audio.duration
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+class AudioQueue:
+    """
+    Thread-safe FIFO of (generation, item), awaitable from the event loop.
+
+    measure(item) returns the (bytes, seconds) of audio an item holds. It is
+    read whenever room is checked, so items still growing, like streamed
+    clips, are counted as they are now.
+    """
+    def __init__(self, measure=None):
+        self.measure = measure or (lambda item: (0, 0.0))
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._items = deque()
+        # (loop, future) of coroutines waiting for the queue to change
+        self._waiters = []
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def _notify(self):
+        # Called with the lock held
+        self._changed.notify_all()
+        for loop, future in self._waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's loop is closed, nobody is waiting anymore
+                pass
+        self._waiters.clear()
+
+    async def _wait(self, ready):
+        """Wait until ready(), called with the lock held, returns something other than None."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                result = ready()
+                if result is not None:
+                    return result
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def put(self, item, generation=None) -> bool:
+        """
+        Queue item, never blocks. Returns False, dropping item, if the queue
+        was flushed since generation.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._items.append((self.generation, item))
+            self._notify()
+            return True
+
+    def _has_room(self, max_clips, max_bytes, max_seconds):
+        # An empty queue always takes the next clip, however long
+        if not self._items:
+            return True
+        if max_clips is not None and len(self._items) >= max_clips:
+            return None
+        if max_bytes is not None or max_seconds is not None:
+            sizes = [self.measure(item) for _, item in self._items]
+            if max_bytes is not None and sum(size for size, _ in sizes) >= max_bytes:
+                return None
+            if max_seconds is not None and sum(seconds for _, seconds in sizes) >= max_seconds:
+                return None
+        return True
+
+    async def wait_for_room(self, max_clips=None, max_bytes=None, max_seconds=None):
+        """Wait until the queue holds less than every given limit."""
+        await self._wait(lambda: self._has_room(max_clips, max_bytes, max_seconds))
+
+    def _pop(self):
+        if not self._items:
+            return None
+        entry = self._items.popleft()
+        self._notify()
+        return entry
+
+    def get(self, timeout=None):
+        """(generation, item) of the next item, blocking. Raises queue.Empty after timeout."""
+        with self._lock:
+            if not self._changed.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._pop()
+
+    def get_nowait(self):
+        """(generation, item) of the next item. Raises queue.Empty if there is none."""
+        with self._lock:
+            entry = self._pop()
+        if entry is None:
+            raise queue.Empty
+        return entry
+
+    async def get_async(self):
+        """(generation, item) of the next item, awaited on the event loop."""
+        return await self._wait(self._pop)
+
+    def flush(self) -> int:
+        """Drop every queued item and start a new generation, which is returned."""
+        with self._lock:
+            self._items.clear()
+            self.generation += 1
+            self._notify()
+            return self.generation
+
+    def is_current(self, generation) -> bool:
+        return generation == self.generation
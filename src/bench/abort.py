@@ -0,0 +1,107 @@
+"""
+How fast an interrupted answer closes its upstream LLM and TTS streams.
+
+Conversation runs GroqGen and GroqPlayai against the local stand-in, which
+streams a long answer and throttles the speech, with FakeSTT, FakePlayer
+and ScriptedVAD cutting every answer off --barge-in-after seconds in. The
+stand-in logs when each of its streams ended and how much it sent: every
+stream still running at an interrupt must end within the conversation's
+abort timeout, instead of running to the end of the answer. Both the
+whole-clip and the streaming TTS modes are checked.
+
+Run from src/: python -m bench.abort [--turns 6] [--barge-in-after 2]
+"""
+import argparse
+import asyncio
+import sys
+
+from bench.fakes import FakePlayer, FakeSTT, ScriptedVAD, Timeline
+from bench.standin import StandinServer
+from clients import close_clients
+from conversation import Conversation
+from gen.groq import GroqGen
+from tracing import Tracer
+from tts.groqPlayai import GroqPlayai
+
+# How late the stand-in can notice a closed connection: it only fails on its next writes
+DETECTION_SLACK = 0.25
+
+def answer_tokens(count):
+    # Sentences of twelve words
+    return [f" word{i}" + ("." if i % 12 == 11 else "") for i in range(count)]
+
+def close_delays(streams, stops):
+    """Seconds from each stop to the end of every stream of that kind running at it, None if it never ended."""
+    delays = []
+    for stop in stops:
+        for stream in streams:
+            if stream.start < stop and (stream.end is None or stream.end > stop):
+                delays.append(None if stream.end is None else stream.end - stop)
+    return delays
+
+async def run_mode(args, streaming_tts):
+    timeline = Timeline()
+    tracer = Tracer()
+    # Tokens saved are estimated from the answers heard to the end, none are here
+    tracer.answer_finished(args.tokens)
+    # 24 kHz 16-bit speech arrives at 1.5 times real time
+    with StandinServer(tokens=answer_tokens(args.tokens), token_delay=args.token_ms / 1000,
+                       default_rate=24000, bandwidth=72000) as server:
+        conversation = Conversation(
+            vad=ScriptedVAD(timeline, [(args.barge_in_after, 1.0)] * args.turns),
+            stt=FakeSTT(0.1, 0.0),
+            tts=GroqPlayai(api_key="standin", base_url=server.base_url),
+            gen=GroqGen(api_key="standin", base_url=server.base_url),
+            player=FakePlayer(timeline),
+            streaming_tts=streaming_tts,
+            tracer=tracer,
+            warmup=False,
+            abort_timeout=args.abort_timeout,
+            initial_history=[{"role": "system", "content": "You are a helpful assistant."}],
+        )
+        listening = asyncio.create_task(conversation.listen())
+        # The VAD runs out of turns after the last one, which is never answered
+        await listening
+        await asyncio.sleep(args.abort_timeout + DETECTION_SLACK)
+        await close_clients()
+    return server.streams, timeline.interrupts, tracer
+
+async def run(args):
+    failures = 0
+    print(f"{'tts':>9} {'stream':>6} {'cut off':>7} {'p50 ms':>7} {'max ms':>7} {'sent':>14}")
+    for streaming_tts in (False, True):
+        streams, stops, tracer = await run_mode(args, streaming_tts)
+        mode = "streaming" if streaming_tts else "clip"
+        for kind, unit, full in (("chat", "tokens", args.tokens), ("speech", "KB", None)):
+            logged = [stream for stream in streams if stream.kind == kind]
+            delays = close_delays(logged, stops)
+            ended = sorted(delay for delay in delays if delay is not None)
+            sent = sum(stream.sent for stream in logged) / max(1, len(logged)) if logged else 0.0
+            if kind == "speech":
+                sent /= 1000
+            print(f"{mode:>9} {kind:>6} {len(delays):>7} "
+                  f"{ended[len(ended) // 2] * 1000 if ended else float('nan'):>7.0f} "
+                  f"{ended[-1] * 1000 if ended else float('nan'):>7.0f} "
+                  f"{sent:>7.1f}{'/' + str(full) if full else '':>4} {unit}")
+            late = [delay for delay in delays if delay is None or delay > args.abort_timeout + DETECTION_SLACK]
+            if late:
+                print(f"FAIL: {len(late)} {kind} streams kept running after an interrupt")
+                failures += 1
+        unsent = sum(args.tokens - stream.sent for stream in streams if stream.kind == "chat" and stream.aborted)
+        print(f"{'':>9} {tracer.aborted} answers aborted, ~{tracer.tokens_saved} tokens ({unsent} never sent) "
+              f"and ~{tracer.audio_seconds_saved:.1f}s of speech saved")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--barge-in-after", type=float, default=2.0, help="seconds into each answer the user speaks")
+    parser.add_argument("--tokens", type=int, default=240, help="tokens of a full answer")
+    parser.add_argument("--token-ms", type=float, default=40, help="stand-in delay between tokens")
+    parser.add_argument("--abort-timeout", type=float, default=1.0)
+    if asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+    print("OK: every interrupted stream was closed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Memory and time spent moving one utterance from capture to STT upload, and
+one TTS answer to the player, with the old byte-joining path versus Audio views.
+
+The old path keeps the VAD chunks in a list, joins them, writes a WAV into a
+BytesIO and copies it out with getvalue(), and the player parses the TTS WAV
+with wave and reads its frames into new bytes. The new path records into a
+PcmBuffer, uploads through Audio.file() in 64 KiB reads like httpx does, and
+plays the TTS samples where they are. tracemalloc's peak gives the extra
+memory held at once on top of the captured chunks, timings are taken
+without it.
+
+Run from src/: python -m bench.audio_copies [--seconds 10 30 120]
+"""
+import argparse
+import io
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from audiobuffer import PcmBuffer, as_audio
+
+RATE = 16000
+CHUNK_BYTES = 1024
+UPLOAD_READ = 64 * 1024
+
+def chunks_for(seconds):
+    # Distinct bytes objects, like the ones read from the ring buffer
+    noise = np.random.default_rng(0).integers(-3000, 3000, int(seconds * RATE), dtype=np.int16).tobytes()
+    return [noise[i:i + CHUNK_BYTES] for i in range(0, len(noise), CHUNK_BYTES)]
+
+def wav_of(pcm):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+def old_path(chunks, answer):
+    speech_buffer = []
+    for chunk in chunks:
+        speech_buffer.append(chunk)
+    # SileroVAD._pcm_to_wav, the upload then sends these bytes
+    upload = wav_of(b''.join(speech_buffer))
+    # Player: BytesIO, wave, readframes, then simpleaudio's own copy
+    with wave.open(io.BytesIO(answer), 'rb') as wave_read:
+        frames = wave_read.readframes(wave_read.getnframes())
+    return len(upload) + len(frames)
+
+def new_path(chunks, answer, buffer):
+    buffer.clear()
+    for chunk in chunks:
+        buffer.append(chunk)
+    upload = buffer.audio().file()
+    sent = 0
+    while True:
+        block = upload.read(UPLOAD_READ)
+        if not block:
+            break
+        sent += len(block)
+    frames = as_audio(answer).pcm
+    return sent + len(frames)
+
+def measure(run, *args):
+    # Timed without tracemalloc, its hooks slow every allocation down
+    start = time.perf_counter()
+    run(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 30, 120], help="utterance lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'seconds':>7} {'audio MB':>8} {'old peak MB':>11} {'new peak MB':>11} {'old ms':>7} {'new ms':>7}")
+    for seconds in args.seconds:
+        chunks = chunks_for(seconds)
+        answer = wav_of(b''.join(chunks))
+        # Sized for the utterance, a fresh one per utterance as in SileroVAD
+        buffer = PcmBuffer(len(chunks) * CHUNK_BYTES)
+        old = [min(values) for values in zip(*(measure(old_path, chunks, answer) for _ in range(args.repeat)))]
+        new = [min(values) for values in zip(*(measure(new_path, chunks, answer, buffer) for _ in range(args.repeat)))]
+        size = len(chunks) * CHUNK_BYTES / 1e6
+        print(f"{seconds:>7.0f} {size:>8.1f} {old[0] / 1e6:>11.1f} {new[0] / 1e6:>11.1f} "
+              f"{old[1] * 1000:>7.1f} {new[1] * 1000:>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Hand-off delay and stale audio of the player queue, polled queue.Queue vs AudioQueue.
+
+Enqueue delay: a playback thread plays clips of --clip-ms while the event
+loop keeps --max-queue clips queued ahead of it. Measured from the moment
+the thread takes a clip, freeing room, to the next clip being queued: the
+old loop polled qsize() every 100 ms, AudioQueue.wait_for_room() wakes up
+when the room appears.
+
+Stale audio: a producer keeps queueing clips of the current answer while
+interrupts flush the queue every few milliseconds. Counts the clips that
+start playing after the answer they belong to was interrupted. The old
+flush cleared queue.Queue under its mutex, a producer that checked for an
+interrupt just before could still put, and the player could not tell a
+clip taken just before the flush from a current one. AudioQueue refuses
+clips of an older generation and the player checks the generation before
+playing.
+
+Run from src/: python -m bench.audio_queue [--clip-ms 200]
+"""
+import argparse
+import asyncio
+import queue
+import random
+import threading
+import time
+
+from audioqueue import AudioQueue
+
+POLL_INTERVAL = 0.1
+
+async def enqueue_delays(args, awaited):
+    """Seconds from the player freeing room to the next clip being queued."""
+    clips = AudioQueue() if awaited else queue.Queue()
+    freed = []
+    queued = []
+
+    def player():
+        for _ in range(args.clips):
+            clips.get()
+            freed.append(time.monotonic())
+            time.sleep(args.clip_ms / 1000)
+
+    thread = threading.Thread(target=player, daemon=True)
+    thread.start()
+    for index in range(args.clips):
+        if awaited:
+            await clips.wait_for_room(args.max_queue)
+        else:
+            while clips.qsize() >= args.max_queue:
+                await asyncio.sleep(POLL_INTERVAL)
+        clips.put(index)
+        queued.append(time.monotonic())
+    await asyncio.to_thread(thread.join)
+    # Clip i + max_queue waits for the player to take clip i
+    return [queued[i + args.max_queue] - freed[i] for i in range(args.clips - args.max_queue)]
+
+def count_stale(args, tagged):
+    """Clips that started playing after their answer was interrupted."""
+    clips = AudioQueue() if tagged else queue.Queue()
+    # The answer being spoken, bumped by every interrupt
+    answer = [0]
+    stale = [0]
+    played = [0]
+    done = threading.Event()
+
+    def interrupt():
+        if tagged:
+            answer[0] = clips.flush()
+        else:
+            with clips.mutex:
+                clips.queue.clear()
+            answer[0] += 1
+
+    def producer():
+        while not done.is_set():
+            current = answer[0]
+            for _ in range(5):
+                if answer[0] != current:
+                    break
+                if tagged:
+                    clips.put(current, current)
+                else:
+                    clips.put(current)
+                time.sleep(random.uniform(0, 0.0005))
+
+    def player():
+        while not done.is_set():
+            try:
+                if tagged:
+                    generation, clip = clips.get(timeout=0.01)
+                else:
+                    clip = clips.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            # Decoding and handing the clip to the device
+            time.sleep(random.uniform(0, 0.001))
+            if tagged and not clips.is_current(generation):
+                continue
+            played[0] += 1
+            if clip != answer[0]:
+                stale[0] += 1
+            time.sleep(random.uniform(0, 0.0005))
+
+    threads = [threading.Thread(target=producer), threading.Thread(target=player)]
+    for thread in threads:
+        thread.start()
+    for _ in range(args.interrupts):
+        time.sleep(random.uniform(0, 0.004))
+        interrupt()
+    done.set()
+    for thread in threads:
+        thread.join()
+    return stale[0], played[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--clip-ms", type=float, default=200)
+    parser.add_argument("--max-queue", type=int, default=2)
+    parser.add_argument("--interrupts", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'queue':>12} {'enqueue p50 ms':>14} {'max ms':>7} {'stale clips':>14}")
+    for name, new in (("polled", False), ("AudioQueue", True)):
+        delays = sorted(asyncio.run(enqueue_delays(args, new)))
+        stale, played = count_stale(args, new)
+        print(f"{name:>12} {delays[len(delays) // 2] * 1000:>14.1f} {delays[-1] * 1000:>7.1f} {f'{stale}/{played}':>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares fixed and adaptive end-of-turn detection on a recorded corpus.
+
+The corpus is a directory of WAV files, each with a JSON file of the same
+name holding the true end of every user turn in seconds:
+
+    {"turn_ends": [3.2, 9.8, 15.1]}
+
+Each recording runs through the real SileroVAD state machine, once with the
+fixed off_consecutive timeout and once with the AdaptiveEndpointer. For every
+detected end of turn the delay after the true end is measured; detections
+that do not follow a true end within --max-delay are counted as cut-offs.
+
+Run from src/: python -m bench.endpointing corpus/
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+
+from vad.endpointer import AdaptiveEndpointer
+from vad.silero_model import DEFAULT_ONNX_PATH
+from vad.silerovad import SileroVAD, SPEECH
+from vad.wavlistener import WavListener
+
+def detect_turn_ends(path, adaptive, model_path):
+    listener = WavListener([path], gap_ms=2000, realtime=False)
+    endpointer = AdaptiveEndpointer(chunk_ms=listener.chunk_ms) if adaptive else None
+    vad = SileroVAD(listener=listener, endpointer=endpointer, model_path=model_path)
+    ends = []
+    for index, chunk in enumerate(listener.chunks()):
+        for kind, _ in vad._process(chunk, vad._speech_prob(chunk)):
+            if kind == SPEECH:
+                ends.append((index + 1) * listener.chunk_ms / 1000)
+    return ends
+
+def score(detected, truth, max_delay):
+    delays = []
+    cutoffs = 0
+    matched = set()
+    for end in detected:
+        candidates = [t for t in truth if t <= end <= t + max_delay and t not in matched]
+        if candidates:
+            true_end = max(candidates)
+            matched.add(true_end)
+            delays.append(end - true_end)
+        else:
+            cutoffs += 1
+    return delays, cutoffs, len(truth) - len(matched)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of WAV files with JSON labels")
+    parser.add_argument("--max-delay", type=float, default=2.0, help="seconds after a true end a detection may come")
+    parser.add_argument("--model-path", default=DEFAULT_ONNX_PATH)
+    args = parser.parse_args()
+
+    results = {"fixed": ([], 0, 0), "adaptive": ([], 0, 0)}
+    for path in sorted(glob.glob(os.path.join(args.corpus, "*.wav"))):
+        label_path = os.path.splitext(path)[0] + ".json"
+        if not os.path.exists(label_path):
+            print(f"skipping {path}: no labels")
+            continue
+        with open(label_path) as labels:
+            truth = json.load(labels)["turn_ends"]
+        for name, adaptive in (("fixed", False), ("adaptive", True)):
+            delays, cutoffs, missed = score(detect_turn_ends(path, adaptive, args.model_path), truth, args.max_delay)
+            all_delays, all_cutoffs, all_missed = results[name]
+            results[name] = (all_delays + delays, all_cutoffs + cutoffs, all_missed + missed)
+
+    print(f"{'mode':<9} {'turns':>5} {'median ms':>10} {'p90 ms':>7} {'cut-offs':>9} {'missed':>7}")
+    for name, (delays, cutoffs, missed) in results.items():
+        median = statistics.median(delays) * 1000 if delays else float("nan")
+        print(f"{name:<9} {len(delays):>5} {median:>10.0f} {percentile(delays, 0.9) * 1000:>7.0f} {cutoffs:>9} {missed:>7}")
+
+if __name__ == "__main__":
+    main()
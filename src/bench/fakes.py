@@ -0,0 +1,213 @@
+"""
+Stand-in components for running Conversation offline.
+
+Each fake follows its base class and, instead of calling an API, waits a
+configurable latency with normally distributed jitter. The
+FakePlayer plays silence in real time and records on a Timeline when each
+clip starts and stops, which is what the latency benchmark measures.
+"""
+import asyncio
+import io
+import random
+import threading
+import time
+import wave
+
+from audioqueue import AudioQueue, audio_size
+from gen.base import Gen
+from player import BasePlayer
+from stt.base import STT
+from decoders import decode
+from tts.base import TTS
+from vad.base import VAD
+
+def _delay(latency, jitter):
+    return max(0.0, random.gauss(latency, jitter))
+
+def silent_wav(seconds, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(bytes(int(seconds * rate) * 2))
+    return buffer.getvalue()
+
+def wav_duration(audio) -> float:
+    return decode(audio).duration
+
+class Clip:
+    def __init__(self, start):
+        self.start = start
+        self.end = None
+        self.stopped = False
+
+class Timeline:
+    """Timestamps of the events of one run, on the time.monotonic clock."""
+    def __init__(self):
+        self.turn_ends = []
+        # When the user started speaking over the assistant
+        self.speech_onsets = []
+        self.interrupts = []
+        self.clips = []
+
+    def clip_started(self) -> Clip:
+        clip = Clip(time.monotonic())
+        self.clips.append(clip)
+        return clip
+
+class FakeSTT(STT):
+    def __init__(self, latency=0.3, jitter=0.05, transcripts=("Tell me something about Linux.",)):
+        self.latency = latency
+        self.jitter = jitter
+        self.transcripts = transcripts
+        self.calls = 0
+
+    async def transcribe(self, audio: bytes) -> str:
+        await asyncio.sleep(_delay(self.latency, self.jitter))
+        text = self.transcripts[self.calls % len(self.transcripts)]
+        self.calls += 1
+        return text
+
+    def close(self):
+        pass
+
+class FakeGen(Gen):
+    def __init__(self, first_token_latency=0.3, token_latency=0.02, jitter=0.05, reply=None):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.reply = reply or (
+            "Linux is a free and open source operating system kernel, first released in 1991. "
+            "It powers most servers, every Android phone and all of the top supercomputers. "
+            "Distributions bundle it with tools and a desktop, so you can pick the one you like."
+        )
+
+    async def generate(self, messages=[]):
+        await asyncio.sleep(_delay(self.first_token_latency, self.jitter))
+        # Leading spaces like real LLM tokens, so punctuation ends a token
+        for index, word in enumerate(self.reply.split(" ")):
+            yield f" {word}" if index else word
+            await asyncio.sleep(_delay(self.token_latency, self.jitter / 10))
+
+    def close(self):
+        pass
+
+class FakeTTS(TTS):
+    def __init__(self, latency=0.4, jitter=0.1, chars_per_second=40, chunks=4, chunk_interval=0.05):
+        self.latency = latency
+        self.jitter = jitter
+        self.chars_per_second = chars_per_second
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+
+    def _speech(self, text):
+        return silent_wav(len(text) / self.chars_per_second)
+
+    async def generate_speech(self, text: str) -> bytes:
+        await asyncio.sleep(_delay(self.latency, self.jitter))
+        return self._speech(text)
+
+    async def generate_speech_stream(self, text: str):
+        # First bytes after a fraction of the full latency, the rest trickles in
+        await asyncio.sleep(_delay(self.latency / 2, self.jitter))
+        speech = self._speech(text)
+        size = -(-len(speech) // self.chunks)
+        for start in range(0, len(speech), size):
+            yield speech[start:start + size]
+            await asyncio.sleep(self.chunk_interval)
+
+    def close(self):
+        pass
+
+class FakePlayer(BasePlayer):
+    """Plays WAV audio as silence in real time, recording clips on the timeline."""
+    def __init__(self, timeline: Timeline):
+        self.timeline = timeline
+        self.queue = AudioQueue(measure=lambda item: audio_size(item[0]))
+        self._stop_event = threading.Event()
+        self.playing = False
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def enqueue(self, audio: bytes, on_start=None, generation=None, on_done=None):
+        self.queue.put((audio, on_start, on_done), generation)
+
+    def play(self):
+        self._stop_event.clear()
+        self.playing = True
+
+    def stop(self):
+        self._stop_event.set()
+        self.playing = False
+        self.queue.flush()
+
+    def close(self):
+        self.stop()
+
+    def _worker(self):
+        while True:
+            generation, (audio, on_start, on_done) = self.queue.get()
+            if not self.queue.is_current(generation):
+                continue
+            self._stop_event.clear()
+            clip = self.timeline.clip_started()
+            if on_start:
+                on_start()
+            stopped = self._stop_event.wait(wav_duration(audio))
+            clip.end = time.monotonic()
+            clip.stopped = stopped
+            if on_done and not stopped:
+                on_done()
+
+class ScriptedVAD(VAD):
+    """
+    VAD stand-in that 'hears' scripted turns instead of listening.
+
+    Each turn is (pause, speech): the user starts speaking pause seconds after
+    the previous turn was yielded and speaks for speech seconds. Like the
+    real VAD, interrupt is called detect_ms after speech starts and the turn
+    is yielded endpoint_ms after it ends. Turns whose pause is shorter than
+    the assistant's answer are barge-ins.
+    """
+    def __init__(self, timeline: Timeline, turns, detect_ms=160, endpoint_ms=640):
+        self.timeline = timeline
+        self.turns = turns
+        self.detect_ms = detect_ms
+        self.endpoint_ms = endpoint_ms
+
+    async def listen(self, interrupt=None, on_partial=None, on_pause=None, on_resume=None):
+        for pause, speech in self.turns:
+            await asyncio.sleep(pause)
+            self.timeline.speech_onsets.append(time.monotonic())
+            await asyncio.sleep(self.detect_ms / 1000)
+            if interrupt:
+                self.timeline.interrupts.append(time.monotonic())
+                interrupt()
+            await asyncio.sleep(max(0.0, speech - self.detect_ms / 1000) + self.endpoint_ms / 1000)
+            self.timeline.turn_ends.append(time.monotonic())
+            yield silent_wav(speech)
+
+    def close(self):
+        pass
+
+class TimedVAD(VAD):
+    """
+    Wraps a real VAD, e.g. SileroVAD on a WavListener, recording on the
+    timeline when it interrupts and when it yields a turn.
+    """
+    def __init__(self, vad: VAD, timeline: Timeline):
+        self.vad = vad
+        self.timeline = timeline
+
+    async def listen(self, interrupt=None, on_partial=None, on_pause=None, on_resume=None):
+        def timed_interrupt():
+            self.timeline.interrupts.append(time.monotonic())
+            if interrupt:
+                interrupt()
+        async for audio in self.vad.listen(timed_interrupt, on_partial, on_pause, on_resume):
+            self.timeline.turn_ends.append(time.monotonic())
+            yield audio
+
+    def close(self):
+        self.vad.close()
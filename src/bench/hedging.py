@@ -0,0 +1,90 @@
+"""
+Time to first token of a single LLM backend vs HedgedGen over two, while
+the first provider is healthy, in a brownout and down.
+
+Both backends are GroqGen against local stand-ins: the primary answers
+after --primary-ms, the fallback after --fallback-ms. In the brownout a
+share of the primary's requests takes --slow-ms before the first token;
+in the outage every request gets a 503. Every answer must arrive complete
+and in order, whichever backend it came from.
+
+Run from src/: python -m bench.hedging [--requests 100] [--hedge-ms 500]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.standin import StandinServer
+from clients import close_clients
+from gen.groq import GroqGen
+from gen.hedged import HedgedGen
+
+TOKENS = [f"word{i} " for i in range(8)]
+
+SCENARIOS = [
+    ("healthy", {}),
+    ("brownout", {"slow_fraction": 0.1}),
+    ("outage", {"error_fraction": 1.0}),
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else float("nan")
+
+async def measure(gen, count):
+    """(seconds to first token of each answered request, number of errors or incomplete answers)."""
+    ttft = []
+    errors = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        first = None
+        text = ""
+        try:
+            async for token in gen.generate([{"role": "user", "content": "Hi"}]):
+                if first is None:
+                    first = time.perf_counter() - start
+                text += token
+        except Exception:
+            pass
+        if text == "".join(TOKENS):
+            ttft.append(first)
+        else:
+            errors += 1
+    return ttft, errors
+
+async def run(args):
+    failures = 0
+    print(f"{'scenario':>9} {'gen':>7} {'p50 ms':>7} {'p90 ms':>7} {'p99 ms':>7} {'errors':>6}  hedging")
+    for name, primary_options in SCENARIOS:
+        with StandinServer(tokens=TOKENS, first_token_delay=args.primary_ms / 1000, token_delay=0.005,
+                           slow_delay=args.slow_ms / 1000, **primary_options) as primary, \
+             StandinServer(tokens=TOKENS, first_token_delay=args.fallback_ms / 1000, token_delay=0.005) as fallback:
+            single = GroqGen(api_key="standin", base_url=primary.base_url)
+            hedged = HedgedGen([GroqGen(api_key="standin", base_url=primary.base_url),
+                                GroqGen(api_key="standin", base_url=fallback.base_url)],
+                               hedge_delay=args.hedge_ms / 1000)
+            for label, gen in (("single", single), ("hedged", hedged)):
+                ttft, errors = await measure(gen, args.requests)
+                report = f"{hedged.stats}, breakers {'/'.join(b.state for b in hedged.breakers)}" if gen is hedged else ""
+                print(f"{name:>9} {label:>7} {percentile(ttft, 0.5) * 1000:>7.0f} {percentile(ttft, 0.9) * 1000:>7.0f} "
+                      f"{percentile(ttft, 0.99) * 1000:>7.0f} {errors:>6}  {report}")
+                if gen is hedged and errors:
+                    print(f"FAIL: {errors} hedged answers were lost or incomplete in the {name} scenario")
+                    failures += 1
+        await close_clients()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and gen")
+    parser.add_argument("--hedge-ms", type=float, default=500, help="HedgedGen hedge delay")
+    parser.add_argument("--primary-ms", type=float, default=200, help="primary's usual time to first token")
+    parser.add_argument("--fallback-ms", type=float, default=300, help="fallback's time to first token")
+    parser.add_argument("--slow-ms", type=float, default=3000, help="primary's time to first token when slow")
+    if asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+    print("OK: every hedged answer arrived complete")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+End-to-end latency of the conversation loop, offline.
+
+Drives Conversation with the stand-ins from bench.fakes through scripted
+turns and reports, as percentiles:
+
+* time to first audio: from the end of a user turn being detected to the
+  first sentence of the answer starting to play
+* inter-sentence gap: silence between two sentences of the same answer
+* barge-in reaction: from the user starting to speak over the assistant to
+  the assistant going quiet
+
+By default the user is simulated by ScriptedVAD, alternating turns that wait
+for the answer with turns that cut it off. With --wav the files are replayed
+through the real SileroVAD instead, one file per turn, --gap-ms apart; use
+a gap shorter than the answers to measure barge-ins.
+
+Run from src/: python -m bench.latency [--wav turn1.wav turn2.wav ...]
+"""
+import argparse
+import asyncio
+import random
+
+from bench.fakes import FakeGen, FakePlayer, FakeSTT, FakeTTS, ScriptedVAD, TimedVAD, Timeline
+from conversation import Conversation
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else float("nan")
+
+def measure(timeline: Timeline):
+    ttfa = []
+    gaps = []
+    reactions = []
+    turn_ends = sorted(timeline.turn_ends)
+    for index, turn_end in enumerate(turn_ends):
+        next_end = turn_ends[index + 1] if index + 1 < len(turn_ends) else float("inf")
+        clips = [clip for clip in timeline.clips if turn_end <= clip.start < next_end]
+        if not clips:
+            continue
+        ttfa.append(clips[0].start - turn_end)
+        for previous, clip in zip(clips, clips[1:]):
+            if not previous.stopped:
+                gaps.append(clip.start - previous.end)
+    for onset in timeline.speech_onsets:
+        # Barge-ins are onsets while a clip was audible
+        for clip in timeline.clips:
+            if clip.start <= onset and clip.stopped and clip.end > onset:
+                reactions.append(clip.end - onset)
+                break
+    return {"time to first audio": ttfa, "inter-sentence gap": gaps, "barge-in reaction": reactions}
+
+def scripted_turns(count, answer_wait, barge_in_after, speech):
+    # Even turns let the assistant finish, odd turns cut it off
+    return [(answer_wait if i % 2 == 0 else barge_in_after, speech) for i in range(count)]
+
+async def run(args, timeline):
+    if args.wav:
+        # Imported here, the scripted mode needs neither the model nor the listener
+        from vad.silerovad import SileroVAD
+        from vad.wavlistener import WavListener
+        listener = WavListener(args.wav, gap_ms=args.gap_ms)
+        vad = TimedVAD(SileroVAD(listener=listener), timeline)
+        stop_after = len(args.wav)
+    else:
+        listener = None
+        turns = scripted_turns(args.turns, args.answer_wait, args.barge_in_after, args.speech)
+        vad = ScriptedVAD(timeline, turns)
+        stop_after = len(turns)
+
+    conversation = Conversation(
+        vad=vad,
+        stt=FakeSTT(args.stt_latency, args.jitter),
+        tts=FakeTTS(args.tts_latency, args.jitter, chars_per_second=args.chars_per_second),
+        gen=FakeGen(args.first_token_latency, args.token_latency, args.jitter),
+        player=FakePlayer(timeline),
+        streaming_tts=args.streaming_tts,
+        initial_history=[{"role": "system", "content": "You are a helpful assistant."}],
+    )
+    listening = asyncio.create_task(conversation.listen())
+    # Let the last answer play out, then stop listening
+    while len(timeline.turn_ends) < stop_after:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(args.answer_wait)
+    listening.cancel()
+    try:
+        await listening
+    except asyncio.CancelledError:
+        pass
+    if listener is not None:
+        timeline.speech_onsets = [listener.started_at + offset for offset in listener.offsets]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", nargs="+", help="replay these files through SileroVAD, one per turn")
+    parser.add_argument("--gap-ms", type=int, default=2500, help="silence between replayed files")
+    parser.add_argument("--turns", type=int, default=6, help="number of scripted turns")
+    parser.add_argument("--speech", type=float, default=1.5, help="seconds the scripted user speaks")
+    parser.add_argument("--answer-wait", type=float, default=7.0, help="pause before a turn that lets the answer finish")
+    parser.add_argument("--barge-in-after", type=float, default=2.0, help="pause before a turn that cuts the answer off")
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.05, help="standard deviation of every latency")
+    parser.add_argument("--chars-per-second", type=float, default=60, help="speaking rate of the fake TTS")
+    parser.add_argument("--streaming-tts", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    timeline = Timeline()
+    asyncio.run(run(args, timeline))
+
+    print(f"{'metric':<20} {'n':>3} {'p50 ms':>7} {'p90 ms':>7} {'p99 ms':>7}")
+    for name, values in measure(timeline).items():
+        print(f"{name:<20} {len(values):>3} " + " ".join(
+            f"{percentile(values, fraction) * 1000:>7.0f}" for fraction in (0.5, 0.9, 0.99)))
+
+if __name__ == "__main__":
+    main()
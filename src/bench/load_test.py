@@ -0,0 +1,125 @@
+"""
+Load test for the WebSocket voice server.
+
+Simulates N callers at once. Each caller streams the WAV files in real time,
+one per turn, followed by enough silence for the answer. It measures the time
+from the end of its speech to the first audio of the answer, and counts
+rejected calls and audio messages.
+
+Against a running server:   python -m bench.load_test ws://127.0.0.1:8765 --wav hi.wav
+Self-contained, with the fake providers of bench.fakes and the real VAD
+(needs assets/silero_vad.onnx):
+                            python -m bench.load_test --standin --callers 100 --wav hi.wav
+
+Run from src/.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from bench.fakes import FakeGen, FakeSTT, FakeTTS
+from vad.wavlistener import WavListener
+
+CHUNK_MS = 32
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else float("nan")
+
+class Results:
+    def __init__(self):
+        self.connected = 0
+        self.rejected = 0
+        self.failed = 0
+        self.audio_messages = 0
+        self.clears = 0
+        self.ttfa = []
+
+async def receive(websocket, results, turn_ends, answered):
+    try:
+        async for message in websocket:
+            if isinstance(message, bytes):
+                results.audio_messages += 1
+                # First audio after the latest turn the caller finished
+                if turn_ends and len(answered) < len(turn_ends):
+                    answered.append(time.monotonic())
+                    results.ttfa.append(answered[-1] - turn_ends[len(answered) - 1])
+            else:
+                results.clears += 1
+    except ConnectionClosed:
+        pass
+
+async def caller(url, turns, silence_s, results):
+    chunk_bytes = 16000 * CHUNK_MS // 1000 * 2
+    silence = bytes(chunk_bytes)
+    # Spread the connections over the first second
+    await asyncio.sleep(random.uniform(0, 1))
+    try:
+        async with connect(url) as websocket:
+            results.connected += 1
+            turn_ends = []
+            answered = []
+            receiving = asyncio.create_task(receive(websocket, results, turn_ends, answered))
+            next_time = time.monotonic()
+            for audio in turns:
+                for start in range(0, len(audio), chunk_bytes):
+                    await websocket.send(audio[start:start + chunk_bytes])
+                    next_time += CHUNK_MS / 1000
+                    await asyncio.sleep(max(0, next_time - time.monotonic()))
+                turn_ends.append(time.monotonic())
+                for _ in range(int(silence_s * 1000 / CHUNK_MS)):
+                    await websocket.send(silence)
+                    next_time += CHUNK_MS / 1000
+                    await asyncio.sleep(max(0, next_time - time.monotonic()))
+            receiving.cancel()
+    except InvalidStatus:
+        results.rejected += 1
+    except (ConnectionClosed, OSError):
+        results.failed += 1
+
+async def run(args):
+    server = None
+    url = args.url
+    if args.standin:
+        from server import VoiceServer
+        from websockets.asyncio.server import serve
+        voice_server = VoiceServer(stt=FakeSTT(), tts=FakeTTS(), gen=FakeGen(), max_sessions=args.max_sessions)
+        await voice_server.start()
+        server = await serve(voice_server.handle, "127.0.0.1", 0, process_request=voice_server.process_request)
+        port = list(server.sockets)[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}"
+
+    turns = [WavListener([path], gap_ms=0, realtime=False).audio for path in args.wav]
+    results = Results()
+    start = time.monotonic()
+    await asyncio.gather(*(caller(url, turns, args.silence, results) for _ in range(args.callers)))
+    elapsed = time.monotonic() - start
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+        voice_server.close()
+    return results, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", nargs="?", default="ws://127.0.0.1:8765")
+    parser.add_argument("--wav", nargs="+", required=True, help="what each caller says, one file per turn")
+    parser.add_argument("--callers", type=int, default=20)
+    parser.add_argument("--silence", type=float, default=6.0, help="seconds of silence after each turn")
+    parser.add_argument("--standin", action="store_true", help="start a server with fake providers in this process")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="session limit of the --standin server")
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run(args))
+    print(f"callers: {args.callers}  connected: {results.connected}  rejected: {results.rejected}  failed: {results.failed}  in {elapsed:.1f}s")
+    print(f"audio messages: {results.audio_messages}  clears: {results.clears}")
+    print(f"time to first audio: n={len(results.ttfa)}  " + "  ".join(
+        f"p{int(fraction * 100)} {percentile(results.ttfa, fraction) * 1000:.0f}ms" for fraction in (0.5, 0.9, 0.99)))
+
+if __name__ == "__main__":
+    main()
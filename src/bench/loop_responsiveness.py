@@ -0,0 +1,118 @@
+"""
+Checks that the event loop stays responsive while the providers are called.
+
+A stand-in server answers GroqGen with slowly streamed tokens, GroqWhisper
+with a transcript of an uploaded utterance and GroqPlayai with speech sent
+over a slow link, as a whole clip and as a stream. Meanwhile a ticker
+coroutine measures how late each of its 10 ms wake-ups fires. With a
+blocking client the lag grows to the full request duration; with the async
+clients it stays within a few milliseconds.
+
+Run from src/: python -m bench.loop_responsiveness
+"""
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from audiobuffer import Audio
+from bench.standin import StandinServer
+from clients import close_clients
+from gen.groq import GroqGen
+from stt.groqWhisper import GroqWhisper
+from tts.groqPlayai import GroqPlayai
+
+TICK = 0.01
+MAX_LAG = 0.05
+RATE = 16000
+SPEECH = "Here is a sentence long enough to take a couple of seconds to download."
+
+async def ticker(lags, done):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+def utterance(words=3, burst_s=0.4, pause_s=0.5) -> Audio:
+    """Bursts of noise between pauses, which the stand-in transcribes as one word each."""
+    rng = np.random.default_rng(0)
+    silence = np.zeros(int(RATE * pause_s))
+    parts = [silence]
+    for _ in range(words):
+        parts += [rng.standard_normal(int(RATE * burst_s)) * 0.3, silence]
+    return Audio((np.clip(np.concatenate(parts), -1, 1) * 32767).astype(np.int16).tobytes())
+
+async def generate(base_url):
+    gen = GroqGen(api_key="standin", base_url=base_url)
+    tokens = 0
+    async for _ in gen.generate([{"role": "user", "content": "hello"}]):
+        tokens += 1
+    return f"{tokens} tokens"
+
+async def transcribe(base_url):
+    stt = GroqWhisper(api_key="standin", base_url=base_url)
+    try:
+        text = await stt.transcribe(utterance())
+    finally:
+        stt.close()
+    return f"{len(text.split())} words"
+
+async def synthesize(base_url):
+    tts = GroqPlayai(api_key="standin", base_url=base_url)
+    speech = await tts.generate_speech(SPEECH)
+    return f"{len(speech or b'') // 1024} KB"
+
+async def synthesize_stream(base_url):
+    tts = GroqPlayai(api_key="standin", base_url=base_url)
+    size = 0
+    async for chunk in tts.generate_speech_stream(SPEECH):
+        size += len(chunk)
+    return f"{size // 1024} KB"
+
+CALLS = {
+    "GroqGen.generate": generate,
+    "GroqWhisper.transcribe": transcribe,
+    "GroqPlayai.generate_speech": synthesize,
+    "GroqPlayai.generate_speech_stream": synthesize_stream,
+}
+
+async def measure(call, base_url):
+    lags = []
+    done = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, done))
+    start = time.perf_counter()
+    try:
+        result = await call(base_url)
+    finally:
+        done.set()
+        await tick_task
+    return result, time.perf_counter() - start, sorted(lags)
+
+async def run(base_url):
+    results = {}
+    try:
+        for name, call in CALLS.items():
+            results[name] = await measure(call, base_url)
+    finally:
+        await close_clients()
+    return results
+
+def main():
+    # Over a 128 KB/s link the speech takes a few seconds to download
+    with StandinServer(bandwidth=128 * 1024) as server:
+        results = asyncio.run(run(server.base_url))
+    blocked = False
+    print(f"{'call':>34} {'result':>10} {'seconds':>7} {'ticks':>5} {'p99 lag ms':>10} {'max lag ms':>10}")
+    for name, (result, elapsed, lags) in results.items():
+        p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+        worst = lags[-1] if lags else float("inf")
+        blocked |= worst > MAX_LAG
+        print(f"{name:>34} {result:>10} {elapsed:7.2f} {len(lags):5d} {p99 * 1000:10.1f} {worst * 1000:10.1f}")
+    if blocked:
+        print("FAIL: event loop was blocked")
+        sys.exit(1)
+    print("OK: event loop stayed responsive")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Checks SentenceSegmenter on tricky token streams and measures its cost per token.
+
+Each case is fed whole, in LLM-like word tokens, in 3 character tokens and
+one character at a time; the chunks must be the expected ones every time,
+and joined back they must give the original text. Then streams of growing
+length are segmented to show the time per token stays flat.
+
+Run from src/: python -m bench.segmenter
+"""
+import re
+import sys
+import time
+
+from segmenter import SentenceSegmenter
+
+# (text, expected chunks) with the default sizes
+CASES = [
+    ("Sure, I can help with that. Dr. Smith arrives at 3.30 p.m. on Jan. 5th and pays $4.99 for it. Then he leaves.",
+     ["Sure, I can help with that.",
+      " Dr. Smith arrives at 3.30 p.m. on Jan. 5th and pays $4.99 for it.",
+      " Then he leaves."]),
+    ("Open https://example.com/docs/v2.0?page=1. It explains everything about the U.S. release, e.g. pricing. Got it?",
+     ["Open https://example.com/docs/v2.0?page=1.",
+      " It explains everything about the U.S. release, e.g. pricing.",
+      " Got it?"]),
+    ("Here is the plan:\n1. Buy eggs and milk.\n2. Bake the cake for 40 min.\n3. Enjoy!",
+     ["Here is the plan:\n1. Buy eggs and milk.",
+      "\n2. Bake the cake for 40 min.\n3. Enjoy!"]),
+    ("She said \"It is over.\" Then we left (quietly, of course.) Nobody noticed... or did they?",
+     ["She said \"It is over.\"",
+      " Then we left (quietly, of course.) Nobody noticed... or did they?"]),
+    ("J. R. R. Tolkien wrote The Hobbit in 1937. Version 3.11.2 of the file is at notes.txt now.",
+     ["J. R. R. Tolkien wrote The Hobbit in 1937.",
+      " Version 3.11.2 of the file is at notes.txt now."]),
+    ("Well, honestly, that depends on a lot of things",
+     ["Well, honestly, that depends on a lot of things"]),
+]
+
+def word_tokens(text):
+    # Like LLM tokens: the spaces go with the next word
+    return [token for token in re.split(r"(?=\s)", text) if token]
+
+def sized_tokens(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def segment(tokens, **options):
+    segmenter = SentenceSegmenter(**options)
+    chunks = []
+    for token in tokens:
+        chunks.extend(segmenter.feed(token))
+    rest = segmenter.flush()
+    if rest:
+        chunks.append(rest)
+    return chunks
+
+def check_cases():
+    failures = 0
+    for text, expected in CASES:
+        for name, tokens in (("whole", [text]), ("words", word_tokens(text)),
+                             ("3 chars", sized_tokens(text, 3)), ("chars", list(text))):
+            chunks = segment(tokens)
+            if chunks != expected or "".join(chunks) != text:
+                failures += 1
+                print(f"FAIL ({name} tokens): {text!r}\n  got      {chunks!r}\n  expected {expected!r}")
+    return failures
+
+def check_growth():
+    """Chunk sizes grow after a short first chunk, and the longest is capped."""
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = segment(word_tokens(text))
+    lengths = [len(chunk) for chunk in chunks]
+    print(f"chunk lengths: {lengths[:6]} ... over {len(chunks)} chunks")
+    run_on = segment(word_tokens("word " * 500))
+    if lengths[0] > 40 or lengths[2] <= lengths[1] or max(len(chunk) for chunk in run_on) > 400:
+        print("FAIL: chunk sizes do not adapt")
+        return 1
+    return 0
+
+def time_per_token(tokens):
+    start = time.perf_counter()
+    segment(tokens)
+    return (time.perf_counter() - start) / len(tokens)
+
+def check_cost():
+    """Time per token of streams 1x to 64x longer, which must stay flat."""
+    sentence = "The price went from 3.50 to 4.25 dollars, e.g. about 20 percent. Is that right? "
+    costs = []
+    for repeat in (10, 80, 640):
+        tokens = word_tokens(sentence * repeat)
+        costs.append(min(time_per_token(tokens) for _ in range(5)))
+        print(f"{len(tokens):>7} tokens: {costs[-1] * 1e6:.2f}µs/token")
+    if costs[-1] > costs[0] * 3:
+        print("FAIL: cost per token grows with the stream length")
+        return 1
+    return 0
+
+def main():
+    failures = check_cases() + check_growth() + check_cost()
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(CASES)} token streams segmented as expected")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Local stand-in for the provider HTTP APIs.
+
+Serves the OpenAI-compatible endpoints the Groq clients talk to, with
+configurable delays, so the real client code can be exercised without
+network access or API keys.
+
+Transcriptions decode the upload with ffmpeg, whatever its format, and
+return one word per burst of sound in it, so uploads of the same speech in
+different encodings must give the same transcript.
+
+Chat completions can be made slow or failing, for a share of requests or
+all of them, to stand in for a provider brownout or outage.
+
+Speech is a voiced tone as long as the text would take to say, in the
+requested format and sample rate, sent at most bandwidth bytes per second
+to stand in for a slow link.
+"""
+import json
+import random
+import subprocess
+import threading
+import time
+from email.parser import BytesParser
+
+import numpy as np
+
+from audiobuffer import Audio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.endswith("/models"):
+            self._send_json({"object": "list", "data": []})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path.endswith("/chat/completions"):
+            self._chat_completions()
+        elif self.path.endswith("/audio/transcriptions"):
+            self._transcriptions(body)
+        elif self.path.endswith("/audio/speech"):
+            self._speech(json.loads(body))
+        else:
+            self.send_error(404)
+
+    def _chat_completions(self):
+        server = self.server.standin
+        first_token_delay, status = server.chat_behaviour()
+        if status:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        stream = server.log_stream("chat")
+        try:
+            time.sleep(first_token_delay)
+            for token in server.tokens:
+                chunk = {
+                    "id": "standin",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "standin",
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                stream.sent += 1
+                time.sleep(server.token_delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up mid-stream, e.g. a cancelled hedge or an interrupted answer
+            server.chat_aborted += 1
+            stream.aborted = True
+            self.close_connection = True
+        stream.end = time.monotonic()
+
+    def _transcriptions(self, body):
+        server = self.server.standin
+        form = BytesParser().parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        for part in form.get_payload():
+            if part.get_filename():
+                upload = part.get_payload(decode=True)
+                server.uploads.append((part.get_filename(), len(upload)))
+                self._send_json({"text": transcribe_bursts(upload)})
+                return
+        self.send_error(400)
+
+    def _speech(self, request):
+        server = self.server.standin
+        audio = server.speech(request["input"], request.get("response_format", "wav"),
+                              request.get("sample_rate") or server.default_rate)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        stream = server.log_stream("speech")
+        try:
+            time.sleep(server.speech_delay)
+            start = time.perf_counter()
+            for sent in range(0, len(audio), 1024):
+                self._write_chunk(audio[sent:sent + 1024])
+                server.speech_bytes += len(audio[sent:sent + 1024])
+                stream.sent += len(audio[sent:sent + 1024])
+                if server.bandwidth:
+                    time.sleep(max(0.0, start + (sent + 1024) / server.bandwidth - time.perf_counter()))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            stream.aborted = True
+            self.close_connection = True
+        stream.end = time.monotonic()
+
+# ffmpeg output options of the speech response formats
+SPEECH_FORMATS = {
+    "flac": ["-f", "flac"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"],
+    "mulaw": ["-f", "mulaw"],
+    "ogg": ["-c:a", "libopus", "-b:a", "32k", "-f", "ogg"],
+}
+
+class StreamLog:
+    """One streamed response: when it ran, tokens or bytes sent, and whether the client hung up."""
+    def __init__(self, kind):
+        self.kind = kind
+        self.start = time.monotonic()
+        self.end = None
+        self.sent = 0
+        self.aborted = False
+
+def synthesize(seconds: float, rate: int, response_format: str) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    # Harmonics of a 150 Hz voice, in syllables of 200ms
+    voiced = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6)) * (np.sin(2 * np.pi * 2.5 * t) > -0.3)
+    pcm = (voiced * 6000).astype(np.int16).tobytes()
+    if response_format == "wav":
+        return bytes(Audio(pcm, rate))
+    return subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(rate), "-ac", "1",
+                           "-i", "pipe:0", *SPEECH_FORMATS[response_format], "pipe:1"],
+                          input=pcm, capture_output=True, check=True).stdout
+
+def transcribe_bursts(upload: bytes, rate=16000, frame_ms=50, min_pause_ms=300) -> str:
+    """One word per stretch of sound separated by at least min_pause_ms of quiet."""
+    pcm = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+                          "-f", "s16le", "-ar", str(rate), "-ac", "1", "pipe:1"],
+                         input=upload, capture_output=True, check=True).stdout
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+    frame = rate * frame_ms // 1000
+    count = len(samples) // frame
+    if count == 0:
+        return ""
+    level = 10 * np.log10(np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1) + 1e-10)
+    loud = level > level.max() - 20
+    words, quiet = 0, None
+    for is_loud in loud:
+        if is_loud:
+            if quiet is None or quiet * frame_ms >= min_pause_ms:
+                words += 1
+            quiet = 0
+        elif quiet is not None:
+            quiet += 1
+    return " ".join(f"word{i}" for i in range(words))
+
+class StandinServer:
+    def __init__(self, tokens=None, first_token_delay=0.2, token_delay=0.05, host="127.0.0.1", port=0,
+                 speech_delay=0.2, bandwidth=None, default_rate=48000, chars_per_second=15,
+                 slow_fraction=0.0, slow_delay=2.0, error_fraction=0.0, error_status=503, seed=0):
+        self.tokens = tokens or [f"word{i} " for i in range(40)]
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        # Share of chat requests delayed to slow_delay before their first token,
+        # and of those answered with error_status instead
+        self.slow_fraction = slow_fraction
+        self.slow_delay = slow_delay
+        self.error_fraction = error_fraction
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.chat_requests = 0
+        self.chat_aborted = 0
+        # StreamLog of every chat and speech response
+        self.streams = []
+        # Synthesis time before the first speech byte, and link speed in bytes/s
+        self.speech_delay = speech_delay
+        self.bandwidth = bandwidth
+        self.default_rate = default_rate
+        self.chars_per_second = chars_per_second
+        self.speech_bytes = 0
+        self._speech_cache = {}
+        # (file name, size) of each transcription upload
+        self.uploads = []
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self.thread = None
+
+    def log_stream(self, kind) -> StreamLog:
+        stream = StreamLog(kind)
+        with self.lock:
+            self.streams.append(stream)
+        return stream
+
+    def chat_behaviour(self):
+        """(first token delay, error status or None) of the next chat request."""
+        with self.lock:
+            self.chat_requests += 1
+            draw = self.random.random()
+        if draw < self.error_fraction:
+            return 0.0, self.error_status
+        if draw < self.error_fraction + self.slow_fraction:
+            return self.slow_delay, None
+        return self.first_token_delay, None
+
+    def speech(self, text, response_format, rate):
+        """The stand-in speech for text, encoded once so encoding time stays out of the measurements."""
+        key = (text, response_format, rate)
+        if key not in self._speech_cache:
+            self._speech_cache[key] = synthesize(len(text) / self.chars_per_second, rate, response_format)
+        return self._speech_cache[key]
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
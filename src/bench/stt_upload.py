@@ -0,0 +1,90 @@
+"""
+Bytes uploaded and encode time per second of speech for each STT upload format.
+
+Each utterance gets the silence the VAD leaves around speech (its 500ms
+pre-buffer before, the 640ms end-of-turn timeout after) and goes through
+UploadEncoder as wav, flac and opus, with and without trimming. Then every
+variant is transcribed by GroqWhisper against the local stand-in, which
+decodes the upload and returns one word per burst of sound: the
+transcripts must all match the plain wav one. Needs ffmpeg on the PATH.
+
+Run from src/: python -m bench.stt_upload [--seconds 2 5 10] [--wav speech.wav]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from audiobuffer import Audio
+from bench.standin import StandinServer
+from bench.vad_backends import RATE, load_audio
+from clients import close_clients
+from stt.encoding import FORMATS, UploadEncoder
+from stt.groqWhisper import GroqWhisper
+
+PREBUFFER_S = 0.5
+END_OF_TURN_S = 0.64
+
+def utterance(path, seconds):
+    speech = load_audio(path, seconds)
+    noise = np.random.default_rng(1).standard_normal(int(RATE * (PREBUFFER_S + END_OF_TURN_S))) * 0.001
+    cut = int(RATE * PREBUFFER_S)
+    samples = np.concatenate([noise[:cut], speech, noise[cut:]])
+    return Audio((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+
+async def measure_encoding(audio, variants, repeat):
+    print(f"{'format':>6} {'trim':>5} {'bytes/s':>8} {'vs wav':>7} {'encode ms/s':>11}")
+    for upload_format, trim in variants:
+        encoder = UploadEncoder(upload_format, trim=trim)
+        await encoder.prepare(audio.rate, audio.channels)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _, upload = await encoder.encode(audio)
+            times.append(time.perf_counter() - start)
+            # Let the spare for the next utterance start, as between real turns
+            await asyncio.sleep(0.05)
+        size = len(upload) if isinstance(upload, bytes) else upload.size
+        encoder.close()
+        print(f"{upload_format:>6} {str(trim):>5} {size / audio.duration:>8.0f} {size / len(audio):>6.0%} "
+              f"{min(times) * 1000 / audio.duration:>11.2f}")
+
+async def check_transcripts(audio, variants, base_url):
+    transcripts = {}
+    for upload_format, trim in variants:
+        stt = GroqWhisper(api_key="standin", base_url=base_url, upload_format=upload_format, trim_silence=trim)
+        transcripts[upload_format, trim] = await stt.transcribe(audio)
+        stt.close()
+    reference = transcripts["wav", False]
+    mismatches = [variant for variant, text in transcripts.items() if text != reference]
+    print(f"stand-in transcript: {reference!r}")
+    for upload_format, trim in mismatches:
+        print(f"FAIL: {upload_format} (trim {trim}) gave {transcripts[upload_format, trim]!r}")
+    return len(mismatches)
+
+async def run(args):
+    variants = [(upload_format, trim) for upload_format in FORMATS for trim in (False, True)]
+    failures = 0
+    with StandinServer() as server:
+        for seconds in args.seconds:
+            audio = utterance(args.wav, seconds)
+            print(f"\n{audio.duration:.1f}s utterance ({seconds:g}s of speech)")
+            await measure_encoding(audio, variants, args.repeat)
+            failures += await check_transcripts(audio, variants, server.base_url)
+    await close_clients()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2, 5, 10], help="speech per utterance")
+    parser.add_argument("--wav", help="16kHz mono 16-bit speech recording instead of synthetic audio")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if asyncio.run(run(args)):
+        sys.exit(1)
+    print("\nOK: every format and trimming gave the same transcripts")
+
+if __name__ == "__main__":
+    main()
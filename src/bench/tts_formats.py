@@ -0,0 +1,112 @@
+"""
+Download size and time to first audio of each TTS response format on a slow link.
+
+GroqPlayai streams every sentence from the local stand-in, which sends at
+most --kbps and waits --synthesis-ms before the first byte, and an
+AudioStreamDecoder decodes it to the StreamPlayer's 48 kHz as it arrives,
+like StreamPlayer.enqueue_stream does. Streamed time to first audio is when
+the first PCM comes out of the decoder, stall is how far the rest falls
+behind real-time playback after that. Players that wait for the whole clip,
+like Player, start when the download is done. Every variant must decode to
+the full length of the speech, at the rate it was sent at. Compressed
+formats need ffmpeg.
+
+Run from src/: python -m bench.tts_formats [--kbps 1000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.standin import StandinServer
+from clients import close_clients
+from decoders import AudioStreamDecoder
+from tts.groqPlayai import GroqPlayai
+
+VARIANTS = [
+    ("wav", None),
+    ("wav", 24000),
+    ("wav", 16000),
+    ("mulaw", None),
+    ("mulaw", 8000),
+    ("mulaw", 24000),
+    ("flac", 24000),
+    ("mp3", 24000),
+    ("ogg", 24000),
+]
+
+SENTENCES = [
+    "Sure, I can help with that.",
+    "Arch Linux is a rolling release distribution, so you always get the latest packages.",
+    "It follows the KISS principle and leaves every choice to you.",
+    "Want me to walk you through the installation?",
+]
+
+async def play(tts, sentence, rate):
+    """(seconds to first PCM, longest stall, seconds to the end, seconds of audio) of one sentence."""
+    decoder = AudioStreamDecoder(rate, 1)
+    start = time.perf_counter()
+    first = None
+    # Seconds of audio decoded so far, and the longest wait for more once playing
+    played = 0.0
+    stall = 0.0
+
+    def arrived(pcm):
+        nonlocal first, played, stall
+        if not pcm:
+            return
+        now = time.perf_counter() - start
+        if first is None:
+            first = now
+        stall = max(stall, now - (first + played))
+        output_rate, channels, width = decoder.output_format
+        played += len(pcm) / (output_rate * channels * width)
+
+    try:
+        async for chunk in tts.generate_speech_stream(sentence):
+            arrived(decoder.feed(chunk))
+        arrived(decoder.flush())
+    finally:
+        decoder.close()
+    done = time.perf_counter() - start
+    return first if first is not None else done, stall, done, played
+
+async def run(args):
+    failures = 0
+    with StandinServer(bandwidth=args.kbps * 1000 / 8, speech_delay=args.synthesis_ms / 1000) as server:
+        print(f"{args.kbps} kbit/s link, {args.synthesis_ms} ms synthesis")
+        print(f"{'format':>6} {'rate':>7} {'KB/s audio':>10} {'streamed TTFA':>13} {'max stall':>9} {'whole-clip TTFA':>15}")
+        for response_format, sample_rate in VARIANTS:
+            tts = GroqPlayai(api_key="standin", base_url=server.base_url,
+                             response_format=response_format, sample_rate=sample_rate)
+            # Encoded by the stand-in ahead of time, not while measured
+            for sentence in SENTENCES:
+                server.speech(sentence, response_format, tts._options().get("sample_rate") or server.default_rate)
+            server.speech_bytes = 0
+            results = [await play(tts, sentence, args.output_rate) for sentence in SENTENCES]
+            firsts = sorted(first for first, _, _, _ in results)
+            stall = max(stall for _, stall, _, _ in results)
+            dones = sorted(done for _, _, done, _ in results)
+            seconds = sum(audio for _, _, _, audio in results)
+            # Medians over the sentences, in milliseconds
+            print(f"{response_format:>6} {str(sample_rate or 'default'):>7} {server.speech_bytes / seconds / 1000:>10.1f} "
+                  f"{firsts[len(firsts) // 2] * 1000:>13.0f} {stall * 1000:>9.0f} {dones[len(dones) // 2] * 1000:>15.0f}")
+            expected = sum(len(sentence) / server.chars_per_second for sentence in SENTENCES)
+            if abs(seconds - expected) > 0.02 * expected:
+                print(f"FAIL: {response_format} at {sample_rate or 'default'} decoded to {seconds:.2f}s "
+                      f"of audio, {expected:.2f}s were sent")
+                failures += 1
+    await close_clients()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kbps", type=float, default=1000, help="link speed in kbit/s")
+    parser.add_argument("--synthesis-ms", type=float, default=200, help="stand-in delay before the first byte")
+    parser.add_argument("--output-rate", type=int, default=48000, help="player output rate")
+    if asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+    print("OK: every format decoded to the full speech")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of the Silero VAD backends.
+
+Each backend runs in a fresh interpreter so its startup time and resident
+memory are measured on their own. Reports load time, chunks/sec, p50/p99
+per-chunk latency, peak RSS and whether torch got imported.
+
+Run from src/: python -m bench.vad_backends [--wav speech.wav] [--backends onnx torch]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+from vad.silero_model import load_silero_model, DEFAULT_ONNX_PATH
+
+RATE = 16000
+CHUNK = 512  # 32ms at 16kHz, one Listener chunk
+
+def load_audio(path, seconds):
+    if path:
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getframerate() != RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+                raise ValueError("Expected a 16kHz mono 16-bit WAV file")
+            pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+        return pcm.astype(np.float32) / 32768
+    # Synthetic stand-in: noise with bursts of voiced-like harmonics
+    rng = np.random.default_rng(0)
+    t = np.arange(int(RATE * seconds)) / RATE
+    voiced = sum(np.sin(2 * np.pi * f * t) for f in (180, 360, 540)) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    return (0.1 * voiced + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+def run_worker(backend, model_path, wav, seconds):
+    start = time.perf_counter()
+    model = load_silero_model(backend, model_path, RATE)
+    state = model.initial_state()
+    load_time = time.perf_counter() - start
+
+    audio = load_audio(wav, seconds)
+    chunks = [audio[i:i + CHUNK] for i in range(0, len(audio) - CHUNK + 1, CHUNK)]
+    for chunk in chunks[:10]:
+        _, state = model(chunk, RATE, state)
+
+    latencies = []
+    start = time.perf_counter()
+    for chunk in chunks:
+        chunk_start = time.perf_counter()
+        _, state = model(chunk, RATE, state)
+        latencies.append(time.perf_counter() - chunk_start)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_time,
+        "chunks": len(chunks),
+        "chunks_per_s": len(chunks) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "torch_imported": "torch" in sys.modules,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["onnx", "torch"])
+    parser.add_argument("--model-path", default=DEFAULT_ONNX_PATH)
+    parser.add_argument("--wav", default=None, help="16kHz mono 16-bit WAV to feed instead of synthetic audio")
+    parser.add_argument("--seconds", type=float, default=60, help="length of the synthetic audio")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.model_path, args.wav, args.seconds)
+        return
+
+    print(f"{'backend':<8} {'load s':>7} {'chunks/s':>9} {'p50 ms':>7} {'p99 ms':>7} {'RSS MB':>7}  torch")
+    for backend in args.backends:
+        command = [sys.executable, "-m", "bench.vad_backends", "--worker", backend,
+                   "--model-path", args.model_path, "--seconds", str(args.seconds)]
+        if args.wav:
+            command += ["--wav", args.wav]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{backend:<8} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<8} {r['load_s']:>7.2f} {r['chunks_per_s']:>9.0f} {r['p50_ms']:>7.3f} "
+              f"{r['p99_ms']:>7.3f} {r['rss_mb']:>7.0f}  {'yes' if r['torch_imported'] else 'no'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Streams per core of Silero VAD inference, batched versus one call per chunk.
+
+For each stream count, runs --seconds of synthetic audio per stream through
+the ONNX model, once chunk by chunk per stream and once with the chunks of
+all streams at the same instant in one batched call, as the BatchScheduler
+does. The CPU time spent gives how many real-time streams one core sustains.
+
+Run from src/: python -m bench.vad_batching [--streams 1 8 32 128]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench.vad_backends import CHUNK, RATE, load_audio
+from vad.silero_model import DEFAULT_ONNX_PATH, SileroOnnxModel
+
+def stream_audio(streams, seconds):
+    audio = load_audio(None, seconds + 1)
+    steps = int(seconds * RATE / CHUNK)
+    # Each stream starts at a different offset of the same recording
+    offsets = np.linspace(0, RATE, streams, endpoint=False).astype(int)
+    return np.stack([
+        np.stack([audio[offset + step * CHUNK:offset + (step + 1) * CHUNK] for step in range(steps)])
+        for offset in offsets
+    ])
+
+def unbatched(model, chunks):
+    states = [model.initial_state() for _ in range(chunks.shape[0])]
+    start = time.process_time()
+    for step in range(chunks.shape[1]):
+        for stream, state in enumerate(states):
+            model(chunks[stream, step], RATE, state)
+    return time.process_time() - start
+
+def batched(model, chunks):
+    states = [model.initial_state() for _ in range(chunks.shape[0])]
+    start = time.process_time()
+    for step in range(chunks.shape[1]):
+        model.batch(chunks[:, step], states)
+    return time.process_time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=10, help="audio per stream")
+    parser.add_argument("--model-path", default=DEFAULT_ONNX_PATH)
+    args = parser.parse_args()
+
+    model = SileroOnnxModel(args.model_path, RATE)
+    print("Real-time streams one core sustains")
+    print(f"{'streams':>7} {'unbatched':>10} {'batched':>8} {'speedup':>8}")
+    for streams in args.streams:
+        chunks = stream_audio(streams, args.seconds)
+        audio_seconds = streams * chunks.shape[1] * CHUNK / RATE
+        results = [audio_seconds / run(model, chunks) for run in (unbatched, batched)]
+        print(f"{streams:>7} {results[0]:>10.0f} {results[1]:>8.0f} {results[1] / results[0]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared async API clients.
+
+Every component talking to the same provider (LLM, STT and TTS all talk to
+Groq by default) goes through one client per provider, API key and base URL,
+so they reuse a single keep-alive connection pool instead of paying a TCP/TLS
+handshake on every request.
+"""
+import logging
+import threading
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Keep idle connections around long enough to survive the pause between turns
+CONNECTION_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60,
+)
+
+_clients = {}
+# Components are built concurrently in threads, so two could race to create the same client
+_clients_lock = threading.Lock()
+
+def groq_client(api_key=None, base_url=None):
+    """Return the shared AsyncGroq client for this API key and base URL."""
+    key = ("groq", api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            from groq import AsyncGroq, DefaultAsyncHttpxClient
+            logger.debug("Creating shared Groq client")
+            _clients[key] = AsyncGroq(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultAsyncHttpxClient(limits=CONNECTION_LIMITS),
+            )
+        return _clients[key]
+
+def openai_client(api_key=None, base_url=None):
+    """Return the shared AsyncOpenAI client for this API key and base URL."""
+    key = ("openai", api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            logger.debug("Creating shared OpenAI client")
+            _clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultAsyncHttpxClient(limits=CONNECTION_LIMITS),
+            )
+        return _clients[key]
+
+async def warm_up(client):
+    """Open a pooled connection with a cheap request, so the first turn skips the handshake."""
+    try:
+        await client.models.list()
+    except Exception as e:
+        logger.warning(f"Client warm-up failed: {e}")
+
+async def close_clients():
+    """Close every shared client and its connection pool."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.error(f"Error closing client: {e}")
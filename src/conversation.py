@@ -1,106 +1,424 @@
 from vad.silerovad import SileroVAD
 from stt.groqWhisper import GroqWhisper
+from stt.streaming import StreamingTranscriber
 from tts.groqPlayai import GroqPlayai
+from tts.prefetch import PrefetchedSpeech
 from gen.groq import GroqGen
 from player import Player
+from history import History
+from segmenter import SentenceSegmenter
+from speculation import Speculation, SpeculationStats
+from tracing import Tracer, TurnTrace
 import logging
 import asyncio
+import functools
+import inspect
+import time
+from contextlib import aclosing
 
 logger = logging.getLogger(__name__)
 
+# Components built by Conversation.start(), in this order in the startup report
+COMPONENTS = ("vad", "stt", "tts", "gen", "player")
+# Components with network clients worth warming up before the first turn
+WARMUP_COMPONENTS = ("stt", "tts", "gen")
+# Speaking rate used to estimate the speech of sentences whose synthesis was aborted
+SPEECH_CHARS_PER_SECOND = 15
+
+def _is_factory(component):
+    return isinstance(component, (type, functools.partial)) or inspect.isroutine(component)
+
 class Conversation:
+    """
+    Voice conversation loop.
+
+    Each component can be given as an instance or as a zero-argument factory
+    (the class itself by default). Factories are only called by start(), which
+    builds all components concurrently, so constructing a Conversation is cheap.
+    """
     def __init__(self,
-                 vad=SileroVAD(),
-                 stt=GroqWhisper(),
-                 tts=GroqPlayai(),
-                 gen=GroqGen(),
-                 player=Player(),
+                 vad=SileroVAD,
+                 stt=GroqWhisper,
+                 tts=GroqPlayai,
+                 gen=GroqGen,
+                 player=Player,
                  max_audio_queue=2,
-                 initial_history=[]
+                 max_audio_queue_bytes=None,
+                 max_audio_queue_seconds=None,
+                 tts_lookahead=3,
+                 streaming_stt=False,
+                 streaming_tts=False,
+                 speculative=False,
+                 history_tokens=4000,
+                 segmenter=SentenceSegmenter,
+                 tracer=None,
+                 warmup=True,
+                 initial_history=[],
+                 abort_timeout=1.0
                  ):
         self.vad = vad
         self.stt = stt
         self.tts = tts
         self.gen = gen
         self.player = player
-        self.history = initial_history
+        self.started = False
+        # Seconds spent building and warming up each component, filled by start()
+        self.startup_report = {}
+        # Off when the components are shared and were warmed up by their owner
+        self.warmup = warmup
+        # initial_history can also be a History, e.g. one with a summarizer
+        if isinstance(initial_history, History):
+            self.history = initial_history
+        else:
+            self.history = History(initial_history, max_tokens=history_tokens)
+        # Builds the SentenceSegmenter cutting each answer into spoken chunks
+        self.segmenter = segmenter
+        # Speech waiting in the player, in clips, PCM bytes and seconds; None for no limit
         self.max_audio_queue = max_audio_queue
+        self.max_audio_queue_bytes = max_audio_queue_bytes
+        self.max_audio_queue_seconds = max_audio_queue_seconds
+        # Most sentences synthesized at once, counting the one being handed to the player
+        self.tts_lookahead = max(1, tts_lookahead)
+        # Start playing each sentence as soon as its first audio bytes arrive
+        self.streaming_tts = streaming_tts
+        # Transcribe partial segments while the user is still speaking
+        self.streaming_stt = streaming_stt
+        self.transcriber = None
+        # Start STT and generation at the first pause, before the turn is over
+        self.speculative = speculative
+        self.speculation = None
+        self.speculation_stats = SpeculationStats()
+        # Per-turn latency spans, see tracing.py
+        self.tracer = tracer or Tracer()
+        self.trace = None
         # Track the current response generation task
         self.current_response_task = None
+        # Clips of the current answer that started and did not finish playing yet
+        self.clips_playing = 0
+        # Seconds an interrupted answer waits for its LLM and TTS requests to close
+        self.abort_timeout = abort_timeout
     
-    async def _yield_sentence(self, generator, min_length=50):
-        sentence = ""
-        separators = ['.', '?', '!', ',', '\n']
-        async for token in generator:
-            # Check if task was cancelled
-            if asyncio.current_task().cancelled():
-                logger.debug("Generation cancelled")
+    async def _start_component(self, name):
+        start = time.perf_counter()
+        component = getattr(self, name)
+        if _is_factory(component):
+            # Model loads and device opens block, keep them off the event loop
+            component = await asyncio.to_thread(component)
+            setattr(self, name, component)
+        if self.warmup and name in WARMUP_COMPONENTS:
+            await component.warmup()
+        self.startup_report[name] = time.perf_counter() - start
+
+    async def start(self):
+        """Build and warm up all components concurrently, then log the startup time."""
+        if self.started:
+            return
+        start = time.perf_counter()
+        await asyncio.gather(*(self._start_component(name) for name in COMPONENTS))
+        if self.streaming_stt:
+            self.transcriber = StreamingTranscriber(self.stt)
+        self.startup_report["total"] = time.perf_counter() - start
+        self.tracer.start()
+        self.started = True
+
+        details = ", ".join(f"{name} {self.startup_report[name]:.2f}s" for name in COMPONENTS)
+        logger.info(f"⏱️  Ready to listen in {self.startup_report['total']:.2f}s ({details})")
+
+    async def _yield_sentence(self, generator):
+        segmenter = self.segmenter()
+        # Closing the sentences closes the token stream under them
+        async with aclosing(generator):
+            async for token in generator:
+                for sentence in segmenter.feed(token):
+                    # Custom segmenters may hand out whitespace, not worth a TTS request
+                    if sentence.strip():
+                        yield sentence
+        rest = segmenter.flush()
+        if rest and rest.strip():
+            yield rest
+
+    async def _traced_tokens(self, tokens, trace):
+        async with aclosing(tokens):
+            async for token in tokens:
+                trace.mark("first_token")
+                trace.tokens += 1
+                yield token
+
+    async def _traced_speech_stream(self, sentence, trace):
+        start = time.monotonic()
+        first = True
+        async for chunk in self.tts.generate_speech_stream(sentence):
+            if first:
+                first = False
+                trace.mark("tts_response")
+                trace.span("tts", time.monotonic() - start)
+            yield chunk
+
+    def _traced_speech_done(self, trace, start, task):
+        if not task.cancelled() and task.exception() is None:
+            trace.mark("tts_response")
+            trace.span("tts", time.monotonic() - start)
+
+    def _synthesize(self, sentence, trace):
+        trace.mark("tts_request")
+        if self.streaming_tts:
+            return PrefetchedSpeech(self._traced_speech_stream(sentence, trace))
+        task = asyncio.create_task(self.tts.generate_speech(sentence))
+        task.add_done_callback(functools.partial(self._traced_speech_done, trace, time.monotonic()))
+        return task
+
+    def _on_playback_start(self, loop, turn, index, trace, generation):
+        # Called from the player's thread, the trace and turn are only touched on the loop
+        loop.call_soon_threadsafe(self._playback_started, turn, index, trace, generation, time.monotonic())
+
+    def _playback_started(self, turn, index, trace, generation, at):
+        trace.mark("playback_start", at)
+        turn.mark_played(index)
+        if self.player.queue.is_current(generation):
+            self.clips_playing += 1
+
+    def _on_playback_done(self, loop, trace, generation):
+        # Called from the player's thread
+        loop.call_soon_threadsafe(self._playback_done, trace, generation, time.monotonic())
+
+    def _playback_done(self, trace, generation, at):
+        if self.player.queue.is_current(generation):
+            self.clips_playing -= 1
+            # Moved by every clip, the answer's last one leaves it at the end of playback
+            trace.mark("playback_stop", at, last=True)
+
+    def _stop_player(self):
+        self.player.stop()
+        self.clips_playing = 0
+
+    async def _enqueue_speech(self, speech, on_start, on_done, trace, generation):
+        if not self.streaming_tts:
+            speech = await speech
+            if speech is None:
                 return
-                
-            sentence += token
-            if len(sentence.strip()) > min_length and sentence[-1] in separators:
-                yield sentence
-                sentence = ""
-        if sentence:
-            yield sentence
-
-    async def generate_assistant_response(self, text: str):
+            # Decoded here, off the loop, so the queue knows how long it is and
+            # the player has no decoding left to do on the loop
+            speech = await asyncio.to_thread(self.player.prepare, speech)
+
+        # Wait until queue has space before handing the speech to the player
+        await self.player.queue.wait_for_room(self.max_audio_queue, self.max_audio_queue_bytes,
+                                              self.max_audio_queue_seconds)
+
+        logger.debug(f"Speech enqueued")
+        trace.mark("enqueue")
+        # Speech of a turn whose audio was flushed since is dropped by the player
+        if self.streaming_tts:
+            await self.player.enqueue_stream(speech, on_start, generation, on_done)
+        else:
+            self.player.enqueue(speech, on_start, generation, on_done)
+
+    async def _feed_player(self, pending, slots, trace, generation):
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            try:
+                await self._enqueue_speech(*item, trace, generation)
+            except Exception as e:
+                logger.error(f"Error enqueuing speech: {e}")
+            finally:
+                # In the player or failed, the next sentence can start synthesis
+                slots.release()
+
+    async def generate_assistant_response(self, text: str, tokens=None, trace=None):
+        """
+        Speak the response to text. tokens can stream an already started
+        generation for it, e.g. from a committed speculation. The stages of
+        the turn are marked on trace.
+        """
+        trace = trace or TurnTrace(0)
         logger.debug("Generating assistant response")
+        # Speech being synthesized, in sentence order. The feeder hands it to
+        # the player while the next sentences are still being synthesized.
+        pending = asyncio.Queue()
+        # One slot per synthesis, taken before it starts and given back once the
+        # feeder is done with it, so at most tts_lookahead run at once
+        slots = asyncio.Semaphore(self.tts_lookahead)
+        synthesizing = []
+        # Audio queued before the next stop() of the player belongs to this answer
+        generation = self.player.queue.generation
+        feeder = asyncio.create_task(self._feed_player(pending, slots, trace, generation))
+        loop = asyncio.get_running_loop()
+        sentences = None
         try:
-            self.history.append({"role": "user", "content": text})
-            async for sentence in self._yield_sentence(self.gen.generate(self.history)):
-                # Check if task was cancelled between sentences
-                if asyncio.current_task().cancelled():
-                    logger.debug("Response generation cancelled")
-                    return
-
-                self.history.append({"role": "assistant", "content": sentence})
+            self.history.add_user(text)
+            trace.mark("gen_request")
+            if tokens is None:
+                tokens = self.gen.generate(self.history.messages())
+            sentences = self._yield_sentence(self._traced_tokens(tokens, trace))
+            # Holds only the sentences that start playing, so an interrupted
+            # answer is remembered the way the user heard it
+            turn = self.history.start_assistant_turn()
+            async for sentence in sentences:
+                index = turn.add(sentence)
+                trace.mark("first_sentence")
                 logger.debug(f"Assistant sentence: {sentence}")
-                
-                # Wait until queue has space before generating speech
-                while self.player.queue.qsize() >= self.max_audio_queue:
-                    # Check if task was cancelled while waiting
-                    if asyncio.current_task().cancelled():
-                        logger.debug("Response generation cancelled while waiting for queue space")
-                        return
-                    
-                    await asyncio.sleep(0.1)  # Wait 100ms before checking again
-                
-                speech = await self.tts.generate_speech(sentence)
-                logger.debug(f"Speech enqueued")
-                self.player.enqueue(speech)
+                on_start = functools.partial(self._on_playback_start, loop, turn, index, trace, generation)
+                on_done = functools.partial(self._on_playback_done, loop, trace, generation)
+
+                # Start synthesis once a slot is free, blocks while the lookahead is full
+                await slots.acquire()
+                speech = self._synthesize(sentence, trace)
+                synthesizing.append((sentence, speech))
+                await pending.put((speech, on_start, on_done))
+
+            await pending.put(None)
+            await feeder
+            self.tracer.answer_finished(trace.tokens)
         except asyncio.CancelledError:
             logger.debug("Response generation was cancelled")
-            # Don't re-raise, just exit gracefully
+            unsynthesized = sum(len(sentence) for sentence, speech in synthesizing if not speech.done())
+            self.tracer.answer_aborted(trace.tokens, unsynthesized / SPEECH_CHARS_PER_SECOND)
+            raise
         except Exception as e:
             logger.error(f"Error in generate_assistant_response: {e}")
+        finally:
+            # Drop in-flight synthesis for sentences that will never be played
+            feeder.cancel()
+            for _, speech in synthesizing:
+                speech.cancel()
+            await self._close_upstream(sentences, feeder, [speech for _, speech in synthesizing])
+
+    async def _close_upstream(self, sentences, feeder, synthesizing):
+        """Wait, at most abort_timeout, for the LLM stream and the TTS requests of an answer to close."""
+        tasks = [feeder] + [speech.task if isinstance(speech, PrefetchedSpeech) else speech for speech in synthesizing]
+        if sentences is not None:
+            tasks.append(asyncio.ensure_future(sentences.aclose()))
+        _, still_open = await asyncio.wait(tasks, timeout=self.abort_timeout)
+        if still_open:
+            logger.warning(f"Upstream requests of the answer still open after {self.abort_timeout}s")
+
+    async def _transcribe_preview(self, audio):
+        if self.transcriber:
+            return await self.transcriber.preview(audio)
+        return await self.stt.transcribe(audio)
+
+    def _hint_endpointer(self, transcription_task):
+        # Let the endpointer judge from the words whether the turn is over
+        endpointer = getattr(self.vad, "endpointer", None)
+        if endpointer and not transcription_task.cancelled() and transcription_task.exception() is None:
+            endpointer.hint(transcription_task.result())
+
+    def _transcribe_partial(self, audio):
+        self.transcriber.feed(audio).add_done_callback(self._hint_endpointer)
+
+    def _speculate(self, audio):
+        if self.speculation is None:
+            logger.debug("Pause detected, speculating")
+            self.speculation = Speculation(self._transcribe_preview(audio), self.gen, self.history)
+            self.speculation_stats.started += 1
+            self.speculation.transcription.add_done_callback(self._hint_endpointer)
+
+    def _discard_speculation(self):
+        if self.speculation is None:
+            return
+        self.speculation.cancel()
+        self.speculation_stats.discarded += 1
+        self.speculation_stats.wasted_tokens += len(self.speculation.tokens)
+        logger.debug(f"Speculation discarded: {self.speculation_stats}")
+        self.speculation = None
+
+    async def _commit_speculation(self):
+        """Return the transcription and token stream of the pending speculation, if usable."""
+        speculation = self.speculation
+        if speculation is None:
+            return None, None
+        if not speculation.still_valid(self.history):
+            self._discard_speculation()
+            return None, None
+        self.speculation = None
+        try:
+            transcription = await speculation.transcription
+        except Exception as e:
+            logger.error(f"Speculative transcription failed: {e}")
+            speculation.cancel()
+            return None, None
+        self.speculation_stats.committed += 1
+        logger.debug(f"Speculation committed: {self.speculation_stats}")
+        if self.transcriber:
+            self.transcriber.reset()
+        return transcription, speculation.stream()
 
     async def listen(self):
+        await self.start()
         logger.info("🎙️  Listening for voice input...")
         def interrupt():
-            if self.current_response_task and not self.current_response_task.done():
+            answering = self.current_response_task and not self.current_response_task.done()
+            if answering:
                 self.current_response_task.cancel()            
+            # Speech of the answer still to come, queued or playing
+            speaking = answering or self.player.queue.qsize() or self.clips_playing
+            if self.trace and speaking:
+                self.trace.interrupted = True
+                self.trace.mark("playback_stop", last=True)
             # Stop and restart audio playback
-            self.player.stop()
+            self._stop_player()
         
-        self.player.stop()
-        async for chunk in self.vad.listen(interrupt=interrupt):
-            logger.debug("Audio received")
-            
-            # Cancel current response generation if running
+        self._stop_player()
+        on_partial = self._transcribe_partial if self.transcriber else None
+        on_pause = self._speculate if self.speculative else None
+        on_resume = self._discard_speculation if self.speculative else None
+        try:
+            async for chunk in self.vad.listen(interrupt=interrupt, on_partial=on_partial,
+                                               on_pause=on_pause, on_resume=on_resume):
+                logger.debug("Audio received")
+                self._next_trace()
+                trace = self.trace
+                
+                # Cancel current response generation if running
+                if self.current_response_task and not self.current_response_task.done():
+                    logger.debug("Cancelling current response generation")
+                    self.current_response_task.cancel()
+                
+                # Stop and restart audio playback
+                self._stop_player()
+                self.player.play()
+                
+                # A speculation started in the last pause already has the answer going
+                transcription, tokens = await self._commit_speculation()
+
+                # Transcribe the new audio, in streaming mode only the tail is left
+                if transcription is None:
+                    trace.mark("stt_request")
+                    try:
+                        if self.transcriber:
+                            transcription = await self.transcriber.finish(chunk)
+                        else:
+                            transcription = await self.stt.transcribe(chunk)
+                    except Exception as e:
+                        # One failed transcription loses the turn, not the call
+                        logger.error(f"Error transcribing the turn, skipping it: {e}")
+                        if self.transcriber:
+                            self.transcriber.reset()
+                        continue
+                    trace.mark("stt_response")
+                logger.info(f"📝 User said: {transcription}")
+                
+                # Start new response generation in background
+                self.current_response_task = asyncio.create_task(
+                    self.generate_assistant_response(transcription, tokens, trace),
+                )
+        finally:
+            # The answer in progress must not outlive the conversation
             if self.current_response_task and not self.current_response_task.done():
-                logger.debug("Cancelling current response generation")
                 self.current_response_task.cancel()
-            
-            # Stop and restart audio playback
-            self.player.stop()
-            self.player.play()
-            
-            # Transcribe the new audio
-            transcription = await self.stt.transcribe(chunk)
-            logger.info(f"📝 User said: {transcription}")
-            
-            # Start new response generation in background
-            self.current_response_task = asyncio.create_task(
-                self.generate_assistant_response(transcription),
-            )
\ No newline at end of file
+            self._discard_speculation()
+            if self.transcriber:
+                self.transcriber.reset()
+            if self.trace:
+                self.tracer.finish(self.trace)
+                self.trace = None
+
+    def _next_trace(self):
+        """Close the trace of the last turn, its playback is over or cut off by now."""
+        if self.trace:
+            self.tracer.finish(self.trace)
+        self.trace = self.tracer.start_turn()
+        now = time.monotonic()
+        self.trace.mark("turn_detected", getattr(self.vad, "turn_detected_at", None) or now)
+        self.trace.mark("speech_end", getattr(self.vad, "speech_ended_at", None) or now)
\ No newline at end of file
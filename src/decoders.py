@@ -0,0 +1,255 @@
+"""
+Incremental decoders of TTS audio to 16-bit PCM.
+
+TTS responses can be WAV (PCM or mu-law), FLAC, Ogg or MP3. The format is
+recognised from the first bytes, so players and caches keep handling speech
+as opaque bytes. Raw mu-law has no header to recognise, nor to tell its
+rate, so the TTS puts it in a WAV header (see mulaw_wav_header) before
+handing it out. WAV is decoded here; the compressed formats go through an
+ffmpeg subprocess, fed as the bytes arrive and resampled straight to the
+player's output format.
+"""
+import struct
+import subprocess
+import threading
+from collections import deque
+
+import numpy as np
+
+from audiobuffer import Audio
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_MULAW = 7
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def _mulaw_table():
+    # G.711: bits are stored inverted, sign, 3 bit exponent, 4 bit mantissa
+    code = ~np.arange(256) & 0xFF
+    magnitude = (((code & 0x0F) << 3) + 0x84) << ((code >> 4) & 0x07)
+    return np.where(code & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.int16)
+
+MULAW_TABLE = _mulaw_table()
+
+def mulaw_to_pcm(data) -> bytes:
+    return MULAW_TABLE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+def mulaw_wav_header(rate: int, size: int = None) -> bytes:
+    """
+    WAV header for size bytes of mono 8-bit mu-law at rate, to put before raw
+    mu-law. Streams of unknown size get 0xFFFFFFFF, like streamed WAVs.
+    """
+    data_size = 0xFFFFFFFF if size is None else size
+    fmt = struct.pack('<HHIIHH', WAVE_FORMAT_MULAW, 1, rate, rate, 1, 8)
+    return (b'RIFF' + struct.pack('<I', min(0xFFFFFFFF, 36 + data_size)) + b'WAVE'
+            + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'data' + struct.pack('<I', data_size))
+
+def sniff(data):
+    """Audio format of a stream starting with data (at least 4 bytes), None if not recognised."""
+    head = bytes(data[:4])
+    if head == b"RIFF":
+        return "wav"
+    if head == b"fLaC":
+        return "flac"
+    if head == b"OggS":
+        return "ogg"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+class WavStreamDecoder:
+    """
+    Incremental WAV parser.
+
+    Fed with the chunks of a WAV byte stream, it returns whole PCM frames as
+    soon as they are available. The data size in the header is ignored, since
+    streamed responses cannot know it up front. Mu-law WAVs come out as 16-bit PCM.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.header_done = False
+        self.format_tag = None
+        self.rate = None
+        self.channels = None
+        self.sample_width = None
+
+    def _parse_header(self):
+        # RIFF header, then chunks until "data"; needs more input until found
+        if len(self.buffer) < 12:
+            return False
+        if self.buffer[0:4] != b'RIFF' or self.buffer[8:12] != b'WAVE':
+            raise ValueError("Not a WAV stream")
+        pos = 12
+        while pos + 8 <= len(self.buffer):
+            chunk_id = bytes(self.buffer[pos:pos + 4])
+            chunk_size, = struct.unpack('<I', self.buffer[pos + 4:pos + 8])
+            if chunk_id == b'data':
+                del self.buffer[:pos + 8]
+                return True
+            if pos + 8 + chunk_size > len(self.buffer):
+                return False
+            if chunk_id == b'fmt ':
+                self.format_tag, self.channels, self.rate, _, _, bits = struct.unpack('<HHIIHH', self.buffer[pos + 8:pos + 24])
+                self.sample_width = bits // 8
+            # Chunks are padded to an even size
+            pos += 8 + chunk_size + (chunk_size & 1)
+        return False
+
+    def feed(self, data: bytes) -> bytes:
+        """Add bytes from the stream, returns the PCM frames completed by them."""
+        self.buffer += data
+        if not self.header_done:
+            self.header_done = self._parse_header()
+            if not self.header_done:
+                return b''
+            if self.rate is None:
+                raise ValueError("WAV stream has no fmt chunk before its data")
+            if self.format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE, WAVE_FORMAT_MULAW):
+                raise ValueError(f"Unsupported WAV encoding {self.format_tag}")
+        frame_size = self.channels * self.sample_width
+        usable = len(self.buffer) - len(self.buffer) % frame_size
+        pcm = bytes(self.buffer[:usable])
+        del self.buffer[:usable]
+        if self.format_tag == WAVE_FORMAT_MULAW:
+            return mulaw_to_pcm(pcm)
+        return pcm
+
+    def flush(self) -> bytes:
+        """PCM left at the end of the stream, always whole frames already."""
+        return b''
+
+    def output_format(self):
+        """(rate, channels, sample_width) of the PCM returned, once the header was parsed."""
+        if self.format_tag == WAVE_FORMAT_MULAW:
+            return self.rate, self.channels, 2
+        return self.rate, self.channels, self.sample_width
+
+class FFmpegStreamDecoder:
+    """
+    Compressed audio decoded by an ffmpeg subprocess, to 16-bit PCM at the
+    given rate and channel count.
+
+    feed() writes to ffmpeg and returns the PCM it has produced so far; a
+    thread keeps reading its output, so the pipes never fill up both ways.
+    """
+    def __init__(self, format, rate, channels, ffmpeg="ffmpeg"):
+        self.rate = rate
+        self.channels = channels
+        self.frame_size = 2 * channels
+        self.process = subprocess.Popen(
+            # The format is known, so ffmpeg need not buffer input to probe it
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-probesize", "32",
+             "-f", format, "-i", "pipe:0", "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-flush_packets", "1", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        self.output = deque()
+        self.pending = b''
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        while True:
+            data = self.process.stdout.read1(65536)
+            if not data:
+                break
+            self.output.append(data)
+
+    def _take(self) -> bytes:
+        chunks = [self.pending]
+        while self.output:
+            chunks.append(self.output.popleft())
+        pcm = b''.join(chunks)
+        usable = len(pcm) - len(pcm) % self.frame_size
+        self.pending = pcm[usable:]
+        return pcm[:usable]
+
+    def feed(self, data: bytes) -> bytes:
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+        return self._take()
+
+    def flush(self) -> bytes:
+        self.process.stdin.close()
+        self.reader.join()
+        if self.process.wait() != 0:
+            raise ValueError(f"ffmpeg could not decode the audio (exit code {self.process.returncode})")
+        return self._take()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def output_format(self):
+        return self.rate, self.channels, 2
+
+class AudioStreamDecoder:
+    """
+    Decodes an audio stream of any supported format to PCM, picking the
+    decoder from its first bytes.
+
+    WAV comes out at its own rate; compressed formats are resampled by
+    ffmpeg to rate and channels, normally the player's output.
+    """
+    def __init__(self, rate=24000, channels=1, ffmpeg="ffmpeg"):
+        self.rate = rate
+        self.channels = channels
+        self.ffmpeg = ffmpeg
+        self.format = None
+        self.decoder = None
+        self.head = b''
+
+    def _open(self, format):
+        if format is None:
+            raise ValueError(f"Unrecognised audio format starting with {self.head[:4]!r}")
+        if format == "wav":
+            return WavStreamDecoder()
+        return FFmpegStreamDecoder(format, self.rate, self.channels, self.ffmpeg)
+
+    def feed(self, data: bytes) -> bytes:
+        if self.decoder is None:
+            self.head += data
+            if len(self.head) < 4:
+                return b''
+            self.format = sniff(self.head)
+            self.decoder = self._open(self.format)
+            data, self.head = self.head, b''
+        return self.decoder.feed(data)
+
+    def flush(self) -> bytes:
+        if self.decoder is None:
+            if self.head:
+                raise ValueError(f"Audio stream of {len(self.head)} bytes, shorter than any header")
+            return b''
+        return self.decoder.flush()
+
+    def close(self):
+        if isinstance(self.decoder, FFmpegStreamDecoder):
+            self.decoder.close()
+
+    @property
+    def output_format(self):
+        """(rate, channels, sample_width) of the PCM, None until the format is known."""
+        return self.decoder.output_format() if self.decoder is not None else None
+
+def decode(audio, rate=24000, channels=1) -> Audio:
+    """
+    An Audio of speech given as an Audio or as bytes of any supported format.
+
+    PCM WAV is parsed in place; other formats are decoded, compressed ones
+    to rate and channels.
+    """
+    if isinstance(audio, Audio):
+        return audio
+    if sniff(audio) == "wav":
+        try:
+            return Audio.from_wav(audio)
+        except ValueError:
+            # Mu-law or another encoding, decoded below
+            pass
+    decoder = AudioStreamDecoder(rate, channels)
+    try:
+        pcm = decoder.feed(audio) + decoder.flush()
+    finally:
+        decoder.close()
+    return Audio(pcm, *decoder.output_format)
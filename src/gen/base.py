@@ -31,6 +31,15 @@ class Gen(ABC):
         """
         pass
     
+    async def warmup(self):
+        """
+        Prepare the instance for its first request.
+
+        Called once at startup, concurrently with the other components. The
+        default does nothing; network implementations can open connections here.
+        """
+        pass
+
     @abstractmethod
     def close(self):
         """
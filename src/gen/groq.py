@@ -1,6 +1,6 @@
 from typing import List, Dict
 from gen.base import Gen
-from groq import Groq
+from clients import groq_client, warm_up
 import os
 
 class GroqGen(Gen):
@@ -8,9 +8,10 @@ class GroqGen(Gen):
                  model="llama-3.1-8b-instant",
                  api_key=os.getenv("GROQ_API_KEY"),
                  temperature=0.7,
-                 max_tokens=1024
+                 max_tokens=1024,
+                 base_url=None
                  ):
-        self.groq = Groq(api_key=api_key)
+        self.groq = groq_client(api_key=api_key, base_url=base_url)
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -23,20 +24,26 @@ class GroqGen(Gen):
         1. messages: List[Dict[str, str]] - The history of messages
         """
         try:
-            response = self.groq.chat.completions.create(
+            response = await self.groq.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 stream=True
             )
-            for chunk in response:
+            # Closing the stream closes the HTTP response, so a cancelled or
+            # abandoned generation stops the provider right away
+            async with response:
+                async for chunk in response:
                     if chunk.choices[0].finish_reason == "stop":
                         break
                     if chunk.choices[0].delta.content:
                         yield chunk.choices[0].delta.content
         except Exception as e:
-            raise Exception(f"Error generating text: {str(e)}")
+            raise Exception(f"Error generating text: {str(e)}") from e
     
+    async def warmup(self):
+        await warm_up(self.groq)
+
     def close(self):
         pass
\ No newline at end of file
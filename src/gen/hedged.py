@@ -0,0 +1,227 @@
+"""
+Hedged generation over several LLM backends.
+
+HedgedGen asks its first backend and, if no token has arrived after
+hedge_delay, the next one as well; whichever produces a token first is
+streamed and the others are cancelled. A backend failing before its first
+token is replaced by the next one right away, so a provider error no longer
+leaves the turn silent.
+
+Each backend has a circuit breaker. Failures, and losing a race to a hedge
+started after it, count against it; once it is open the backend is skipped,
+so a provider in a brownout stops costing every turn the hedge delay.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, List
+
+from gen.base import Gen
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Closed while the backend works. After threshold failures in a row it
+    opens and requests skip the backend; reset_timeout later it is half-open
+    and lets a single request through as a probe, whose outcome closes or
+    reopens it.
+    """
+    def __init__(self, threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        # Times it opened, for reports
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may use the backend now; claims the probe when half-open."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.trips += 1
+                logger.warning(f"Circuit breaker opened after {self.failures} failures")
+            self.opened_at = self.clock()
+        self.probing = False
+
+    def release(self):
+        """Give back a request that ended without telling anything about the backend."""
+        self.probing = False
+
+class HedgeStats:
+    def __init__(self):
+        self.requests = 0
+        # Second requests started because the first token was late
+        self.hedges = 0
+        # Requests started because an earlier one failed
+        self.failovers = 0
+        # Answers streamed from another backend than the first one tried
+        self.rescued = 0
+        self.errors = 0
+
+    def __str__(self):
+        return (f"{self.requests} requests, {self.hedges} hedged, {self.failovers} failed over, "
+                f"{self.rescued} answered by a fallback, {self.errors} errors")
+
+class _Attempt:
+    """One backend's generation, waiting for its first token."""
+    def __init__(self, index, backend, messages, started):
+        self.index = index
+        self.started = started
+        self.tokens = backend.generate(messages)
+        self.first = asyncio.ensure_future(self.tokens.__anext__())
+
+    async def cancel(self):
+        self.first.cancel()
+        await asyncio.wait([self.first])
+        if not self.first.cancelled():
+            # Retrieve it, a result or error no longer matters
+            self.first.exception()
+        await self.tokens.aclose()
+
+class HedgedGen(Gen):
+    """
+    Gen streaming from the fastest of several backends, tried in order.
+
+    Args:
+    1. backends: List[Gen] - Backends in order of preference
+    2. hedge_delay: float - Seconds to wait for a first token before also asking the next backend
+    3. failure_threshold: int - Failures in a row that open a backend's circuit breaker
+    4. reset_timeout: float - Seconds before an open breaker lets a probe request through
+    """
+    def __init__(self, backends: List[Gen], hedge_delay=0.5, failure_threshold=3, reset_timeout=30.0):
+        if not backends:
+            raise ValueError("HedgedGen needs at least one backend")
+        self.backends = list(backends)
+        self.hedge_delay = hedge_delay
+        self.breakers = [CircuitBreaker(failure_threshold, reset_timeout) for _ in self.backends]
+        self.stats = HedgeStats()
+
+    def _name(self, index) -> str:
+        return f"{type(self.backends[index]).__name__} #{index}"
+
+    async def generate(self, messages: List[Dict[str, str]] = []):
+        """
+        Generate text based on the given history, from whichever backend answers first.
+
+        Args:
+        1. messages: List[Dict[str, str]] - The history of messages
+        """
+        loop = asyncio.get_running_loop()
+        self.stats.requests += 1
+        candidates = deque(range(len(self.backends)))
+        attempts = {}
+        winner = None
+        error = None
+
+        def launch(force=False):
+            """Start the next backend whose breaker allows it, returns its index or None."""
+            while candidates:
+                index = candidates.popleft()
+                if force or self.breakers[index].allow():
+                    attempt = _Attempt(index, self.backends[index], messages, loop.time())
+                    attempts[attempt.first] = attempt
+                    return index
+            return None
+
+        first_index = launch()
+        if first_index is None:
+            # Every breaker is open: still try, an answer may come back
+            logger.warning("Every LLM backend's circuit breaker is open, trying them all anyway")
+            candidates.extend(range(len(self.backends)))
+            first_index = launch(force=True)
+        try:
+            while winner is None:
+                latest = max(attempt.started for attempt in attempts.values())
+                timeout = max(0.0, latest + self.hedge_delay - loop.time()) if candidates else None
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    index = launch()
+                    if index is not None:
+                        self.stats.hedges += 1
+                        logger.info(f"No first token after {self.hedge_delay:.2f}s, hedging to {self._name(index)}")
+                    continue
+                for future in done:
+                    attempt = attempts.pop(future)
+                    try:
+                        first_token = future.result()
+                    except StopAsyncIteration:
+                        # An empty answer is still a complete one
+                        first_token = None
+                    except Exception as e:
+                        error = e
+                        self.breakers[attempt.index].failure()
+                        logger.warning(f"{self._name(attempt.index)} failed before its first token: {e}")
+                        await attempt.tokens.aclose()
+                        if launch() is not None:
+                            self.stats.failovers += 1
+                        continue
+                    winner = attempt
+                    break
+                if winner is None and not attempts:
+                    self.stats.errors += 1
+                    raise error
+            # Backends asked before the winner were slower than it, later ones just lost the race
+            for attempt in attempts.values():
+                if attempt.started < winner.started:
+                    self.breakers[attempt.index].failure()
+                else:
+                    self.breakers[attempt.index].release()
+                await attempt.cancel()
+            attempts.clear()
+            if winner.index != first_index:
+                self.stats.rescued += 1
+            if first_token is None:
+                self.breakers[winner.index].success()
+                return
+            yield first_token
+            try:
+                async for token in winner.tokens:
+                    yield token
+            except Exception:
+                # Too late to switch backends, the first tokens are already out
+                self.stats.errors += 1
+                self.breakers[winner.index].failure()
+                raise
+            self.breakers[winner.index].success()
+        finally:
+            for attempt in attempts.values():
+                self.breakers[attempt.index].release()
+                await attempt.cancel()
+            if winner is not None:
+                # Clears a probe claim if the stream was abandoned before an outcome
+                self.breakers[winner.index].release()
+                await winner.tokens.aclose()
+
+    async def warmup(self):
+        await asyncio.gather(*(backend.warmup() for backend in self.backends))
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
@@ -1,6 +1,6 @@
 from typing import List, Dict
 from gen.base import Gen
-from openai import OpenAI
+from clients import openai_client, warm_up
 import os
 
 class OpenAIGen(Gen):
@@ -8,9 +8,10 @@ class OpenAIGen(Gen):
                  model="gpt-3.5-turbo",
                  api_key=os.getenv("OPENAI_API_KEY"),
                  temperature=0.7,
-                 max_tokens=1024
+                 max_tokens=1024,
+                 base_url=None
                  ):
-        self.openai = OpenAI(api_key=api_key)
+        self.openai = openai_client(api_key=api_key, base_url=base_url)
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -23,7 +24,7 @@ class OpenAIGen(Gen):
         1. messages: List[Dict[str, str]] - The history of messages
         """
         try:
-            response = self.openai.chat.completions.create(
+            response = await self.openai.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 # temperature=self.temperature,
@@ -31,13 +32,19 @@ class OpenAIGen(Gen):
                 max_completion_tokens=self.max_tokens,
                 stream=True
             )
-            for chunk in response:
+            # Closing the stream closes the HTTP response, so a cancelled or
+            # abandoned generation stops the provider right away
+            async with response:
+                async for chunk in response:
                     if chunk.choices[0].finish_reason == "stop":
                         break
                     if chunk.choices[0].delta.content:
                         yield chunk.choices[0].delta.content
         except Exception as e:
-            raise Exception(f"Error generating text: {str(e)}")
+            raise Exception(f"Error generating text: {str(e)}") from e
     
+    async def warmup(self):
+        await warm_up(self.openai)
+
     def close(self):
         pass 
\ No newline at end of file
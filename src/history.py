@@ -0,0 +1,130 @@
+"""
+Conversation history sent to the LLM.
+
+Each assistant turn is a single message holding only the sentences that
+actually started playing, so an interrupted answer is remembered the way the
+user heard it. Once the history grows past its token budget the oldest turns
+are summarized (with a summarizer Gen) or dropped, so the prompt, and with it
+the time to first token, stays flat over long calls.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences, keeping names, facts "
+    "and anything the user asked to remember. Reply with the summary only."
+)
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+class AssistantTurn:
+    def __init__(self, history, message):
+        self.history = history
+        self.message = message
+        self.sentences = []
+        self.played = 0
+
+    def add(self, sentence: str) -> int:
+        """Add a generated sentence, returns its index for mark_played."""
+        self.sentences.append(sentence)
+        return len(self.sentences) - 1
+
+    def mark_played(self, index: int):
+        """Record that the sentence at index started playing."""
+        if index + 1 > self.played:
+            self.played = index + 1
+            self.message["content"] = "".join(self.sentences[:self.played]).strip()
+            self.history.changed()
+
+class History:
+    def __init__(self, messages: List[Dict[str, str]] = (), max_tokens=4000, keep_recent=6, summarizer=None):
+        messages = [dict(message) for message in messages]
+        # Leading system messages are never compacted
+        pinned = 0
+        while pinned < len(messages) and messages[pinned]["role"] == "system":
+            pinned += 1
+        self.pinned = messages[:pinned]
+        self.turns = messages[pinned:]
+        self.summary = None
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        # Optional Gen used to summarize old turns instead of dropping them
+        self.summarizer = summarizer
+        # Bumped on every change, lets callers detect a stale snapshot
+        self.version = 0
+        self._compacting = None
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = list(self.pinned)
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(m for m in self.turns if m["content"])
+        return messages
+
+    def tokens(self) -> int:
+        return sum(estimate_tokens(m["content"]) for m in self.messages())
+
+    def changed(self):
+        self.version += 1
+
+    def add_user(self, text: str):
+        self.turns.append({"role": "user", "content": text})
+        self.changed()
+        self._maybe_compact()
+
+    def start_assistant_turn(self) -> AssistantTurn:
+        # The message takes its place now and is filled as sentences get played
+        message = {"role": "assistant", "content": ""}
+        self.turns.append(message)
+        return AssistantTurn(self, message)
+
+    def _maybe_compact(self):
+        if self.tokens() <= self.max_tokens or self._compacting is not None:
+            return
+        if self.summarizer is None:
+            self._drop(self._oldest_turns())
+            return
+        self._compacting = asyncio.create_task(self._summarize(self._oldest_turns()))
+        self._compacting.add_done_callback(lambda _: setattr(self, "_compacting", None))
+
+    def _oldest_turns(self) -> List[Dict[str, str]]:
+        """Oldest messages to remove to get back under budget, keeping the recent ones."""
+        excess = self.tokens() - self.max_tokens
+        removable = self.turns[:max(0, len(self.turns) - self.keep_recent)]
+        oldest = []
+        for message in removable:
+            if excess <= 0 and message["role"] == "user":
+                # Cut only before a user message, so turns stay whole
+                break
+            oldest.append(message)
+            excess -= estimate_tokens(message["content"])
+        return oldest
+
+    def _drop(self, messages):
+        if not messages:
+            return
+        self.turns = [m for m in self.turns if all(m is not old for old in messages)]
+        logger.debug(f"Dropped {len(messages)} old messages, history is ~{self.tokens()} tokens")
+        self.changed()
+
+    async def _summarize(self, messages):
+        if not messages:
+            return
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages if m["content"])
+        if self.summary:
+            transcript = f"Earlier summary: {self.summary}\n{transcript}"
+        try:
+            summary = "".join([token async for token in self.summarizer.generate([
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ])])
+        except Exception as e:
+            logger.error(f"Error summarizing history, dropping old turns instead: {e}")
+        else:
+            self.summary = summary.strip()
+        self._drop(messages)
@@ -1,6 +1,7 @@
 import os
 import logging
 from conversation import Conversation
+from clients import close_clients
 
 # Configure logging globally
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -28,7 +29,10 @@ convo = Conversation(
 
 async def main():
     conversation = convo
-    await conversation.listen()
+    try:
+        await conversation.listen()
+    finally:
+        await close_clients()
 
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import logging
+
+from audioqueue import AudioQueue, audio_size
+from decoders import decode
+from player import BasePlayer
+
+logger = logging.getLogger(__name__)
+
+class NetworkPlayer(BasePlayer):
+    """
+    Player that sends the audio to a remote client instead of a speaker.
+
+    Each clip goes out as one binary message, paced at playback speed so the
+    queue drains like a local player's would and barge-ins still find the
+    unplayed sentences here to drop. On stop() the client is told to drop what
+    it has not played yet with a {"type": "clear"} text message. Must be used
+    from the event loop thread.
+    """
+    def __init__(self, send):
+        # Coroutine function sending a bytes or str message to the client
+        self.send = send
+        self.queue = AudioQueue(measure=lambda item: audio_size(item[0]))
+        self._stopped = asyncio.Event()
+        self.current = False
+        self.playing = False
+        self.task = None
+
+    def enqueue(self, audio: bytes, on_start=None, generation=None, on_done=None):
+        self.queue.put((audio, on_start, on_done), generation)
+
+    def play(self):
+        self.playing = True
+        if self.task is None:
+            self.task = asyncio.create_task(self._sender())
+
+    def stop(self):
+        self.playing = False
+        self.queue.flush()
+        if self.current:
+            self._stopped.set()
+
+    def close(self):
+        self.stop()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _sender(self):
+        while True:
+            generation, (audio, on_start, on_done) = await self.queue.get_async()
+            self.current = True
+            self._stopped.clear()
+            try:
+                # Clients get PCM WAV, compressed speech is decoded off the event loop
+                audio = await asyncio.to_thread(decode, audio)
+                if not self.queue.is_current(generation):
+                    # Flushed while it was being decoded
+                    continue
+                if on_start:
+                    on_start()
+                # Awaits the socket's write buffer, a slow client only stalls its own session
+                await self.send(bytes(audio))
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), audio.duration)
+                except asyncio.TimeoutError:
+                    # Played to the end by now
+                    if on_done:
+                        on_done()
+                    continue
+                await self.send(json.dumps({"type": "clear"}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The connection is gone, nobody is listening anymore
+                logger.debug(f"Stopped sending audio: {e}")
+                return
+            finally:
+                self.current = False
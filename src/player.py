@@ -1,13 +1,15 @@
 from abc import ABC, abstractmethod
+import asyncio
 import threading
 import simpleaudio as sa
-import io
 import queue
-import wave
 import logging
 import time
 import os
-from pydub import AudioSegment
+from audiobuffer import Audio
+from decoders import AudioStreamDecoder, decode
+from audiocache import load_cached_pcm
+from audioqueue import AudioQueue, audio_size
 logger = logging.getLogger(__name__)
 
 class BasePlayer(ABC):
@@ -26,12 +28,47 @@ class BasePlayer(ABC):
         pass
 
     @abstractmethod
-    def enqueue(self, audio: bytes):
+    def enqueue(self, audio: bytes, on_start=None, generation=None, on_done=None):
         """
         Enqueue an audio to the player.
+
+        on_start and on_done, if given, are called from the playback thread
+        when the audio starts and finishes playing. Neither is called for
+        audio dropped by stop(), and on_done not for audio it cut off.
+        generation, if given, is the self.queue generation the audio was made
+        for; it is dropped if stop() flushed the queue since.
         """
         pass
 
+    def prepare(self, audio: bytes) -> Audio:
+        """
+        Decode a whole speech clip to the Audio enqueue() plays without further work.
+
+        Blocking, so called off the event loop ahead of enqueue(). The default
+        decodes compressed speech at decode()'s rate and channels.
+        """
+        return decode(audio)
+
+    async def enqueue_stream(self, stream, on_start=None, generation=None, on_done=None):
+        """
+        Enqueue an audio that is still arriving, as an async iterator of chunks.
+        
+        Returns once the whole stream was consumed. The default implementation
+        decodes the chunks as they arrive and enqueues the audio in one piece.
+        """
+        decoder = AudioStreamDecoder()
+        pcm = []
+        try:
+            # Off the event loop, ffmpeg is started, written to and waited for blocking
+            async for chunk in stream:
+                pcm.append(await asyncio.to_thread(decoder.feed, chunk))
+            pcm.append(await asyncio.to_thread(decoder.flush))
+        finally:
+            decoder.close()
+        pcm = b"".join(pcm)
+        if pcm:
+            self.enqueue(Audio(pcm, *decoder.output_format), on_start, generation, on_done)
+
     @abstractmethod
     def close(self):
         """
@@ -44,7 +81,8 @@ class BasePlayer(ABC):
 
 class Player(BasePlayer):
     def __init__(self):
-        self.queue = queue.Queue()
+        # (audio, on_start, on_done) waiting to be played by the worker thread
+        self.queue = AudioQueue(measure=lambda item: audio_size(item[0]))
         self._stop_event = threading.Event()
         self.current_play_obj = None
 
@@ -60,17 +98,16 @@ class Player(BasePlayer):
 
         try:
             hold_path = os.path.join(os.path.dirname(__file__), '..', 'assets', 'waiting.mp3')
-            hold_segment = AudioSegment.from_mp3(hold_path)
+            # Decoded once with a gentle 2-second fade-in so the music comes in
+            # smoothly, then memory-mapped from the cache on every start
+            hold_pcm, channels, sample_width, sample_rate = load_cached_pcm(hold_path, fade_in_ms=2000)
 
-            # Apply a gentle 2-second fade-in so the music comes in smoothly
-            hold_segment = hold_segment.fade_in(2000)
-
-            # Convert AudioSegment to a WaveObject that simpleaudio can play
+            # Wrap the PCM in a WaveObject that simpleaudio can play
             self.hold_wave_obj = sa.WaveObject(
-                hold_segment.raw_data,
-                num_channels=hold_segment.channels,
-                bytes_per_sample=hold_segment.sample_width,
-                sample_rate=hold_segment.frame_rate,
+                hold_pcm,
+                num_channels=channels,
+                bytes_per_sample=sample_width,
+                sample_rate=sample_rate,
             )
             logger.debug("Hold music loaded successfully")
         except Exception as e:
@@ -80,8 +117,8 @@ class Player(BasePlayer):
         self.thread = threading.Thread(target=self._worker, daemon=True)
         self.thread.start()
     
-    def enqueue(self, audio: bytes):
-        self.queue.put(audio)
+    def enqueue(self, audio: bytes, on_start=None, generation=None, on_done=None):
+        self.queue.put((audio, on_start, on_done), generation)
 
     def play(self):
         self._stop_event.clear()
@@ -95,8 +132,7 @@ class Player(BasePlayer):
             self.current_play_obj = None
         self._stop_event.set()
         self.playing = False
-        with self.queue.mutex:
-            self.queue.queue.clear()
+        self.queue.flush()
     
     def close(self):
         self.stop()
@@ -126,7 +162,7 @@ class Player(BasePlayer):
 
                 # Try to get audio to play; timeout so we can decide on hold music
                 try:
-                    audio = self.queue.get(timeout=self.wait_threshold)
+                    generation, (audio, on_start, on_done) = self.queue.get(timeout=self.wait_threshold)
                 except queue.Empty:
                     if not self.playing:
                         continue
@@ -150,16 +186,19 @@ class Player(BasePlayer):
 
                 logger.debug(f"Playing queued audio: {len(audio)} bytes")
 
-                # Create a BytesIO object from the audio bytes
-                wav_io = io.BytesIO(audio)
+                # Play the samples where they are, PCM WAV bytes are parsed without copying
+                audio = decode(audio)
+                wave_obj = sa.WaveObject(audio.pcm, num_channels=audio.channels,
+                                         bytes_per_sample=audio.sample_width, sample_rate=audio.rate)
 
-                # Use Python's wave module to read the WAV data
-                with wave.open(wav_io, 'rb') as wave_read:
-                    # Create WaveObject from the wave_read object
-                    wave_obj = sa.WaveObject.from_wave_read(wave_read)
+                # Taken just before a stop() flushed the queue
+                if not self.queue.is_current(generation):
+                    continue
 
                 # Play the queued audio
                 self.current_play_obj = wave_obj.play()
+                if on_start:
+                    on_start()
 
                 # Wait briefly to ensure loading
                 time.sleep(0.05)
@@ -173,6 +212,9 @@ class Player(BasePlayer):
                         break
                     time.sleep(0.01)  # Prevent busy waiting
 
+                # Not cut off by a stop()
+                if on_done and self.queue.is_current(generation):
+                    on_done()
                 logger.debug("Queued audio playback completed")
 
             except Exception as e:
@@ -0,0 +1,148 @@
+"""
+Incremental sentence segmentation of streamed LLM tokens.
+
+Chunks end at sentence boundaries: . ? ! followed by whitespace (so
+decimals, URLs and file names never split), not after abbreviations,
+initials or list numbers, and including closing quotes and brackets. Newlines
+end a chunk too. Commas, semicolons and colons are soft boundaries, used for
+the first chunk and for run-on sentences.
+
+Chunk sizes adapt: the first chunk may be short, so speech starts as early
+as possible, and later chunks grow to save TTS requests. Every character is
+looked at once, with a bounded amount of state, so each token costs O(1)
+amortized.
+"""
+from typing import List, Optional
+
+HARD = ".?!"
+SOFT = ",;:"
+CLOSERS = "\"')]}”’»"
+# Words that end in a period without ending the sentence
+ABBREVIATIONS = frozenset((
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "cf", "e.g", "i.e",
+    "approx", "dept", "est", "fig", "gen", "gov", "lt", "col", "sgt", "capt", "rev",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+))
+# Only the end of a word matters for abbreviations, the rest is dropped
+MAX_WORD = 16
+
+class SentenceSegmenter:
+    def __init__(self, first_chars=20, min_chars=60, max_target=200, growth=2.0, max_chars=400):
+        # Shortest first chunk, may end at a soft boundary
+        self.first_chars = first_chars
+        # Shortest second chunk, growing by growth per chunk up to max_target
+        self.min_chars = min_chars
+        self.max_target = max_target
+        self.growth = growth
+        # Longest chunk, split at the last space if no boundary came
+        self.max_chars = max_chars
+
+        self.chunks = 0
+        # Text since the last chunk, self.length characters of it scanned
+        self.parts = []
+        self.length = 0
+        self._unscanned = 0
+        # Position right after a . ? ! or soft mark waiting for whitespace
+        self.pending = None
+        self.pending_soft = False
+        self.word = ""
+        # Whether the current word is the first of its line, for list numbers
+        self.word_starts_line = True
+        self.last_hard = None
+        self.last_soft = None
+        self.last_space = None
+
+    def _target(self) -> int:
+        if self.chunks == 0:
+            return self.first_chars
+        return min(self.max_target, int(self.min_chars * self.growth ** (self.chunks - 1)))
+
+    def _ends_sentence(self, word: str) -> bool:
+        """Whether the word ending with a period can end the sentence."""
+        stem = word.rstrip(CLOSERS).rstrip(".").lstrip("\"'([{“‘«").lower()
+        if stem in ABBREVIATIONS:
+            return False
+        # Initials like "J." and dotted acronyms like "U.S." or "p.m."
+        if all(len(part) == 1 and part.isalpha() for part in stem.split(".")):
+            return False
+        # "1." starting a list item
+        if stem.isdigit() and self.word_starts_line:
+            return False
+        return True
+
+    def _cut(self, position: int) -> str:
+        text = "".join(self.parts)
+        chunk, rest = text[:position], text[position:]
+        self.parts = [rest] if rest else []
+        self.length = len(rest) - self._unscanned
+        # Blank chunks are dropped, they must not make the next one longer
+        if chunk.strip():
+            self.chunks += 1
+        if self.pending is not None:
+            self.pending = self.pending - position if self.pending > position else None
+        self.last_hard = self.last_soft = self.last_space = None
+        return chunk
+
+    def _boundary(self, position: int, soft: bool) -> Optional[str]:
+        target = self._target()
+        if not soft:
+            if position >= target:
+                return self._cut(position)
+            self.last_hard = position
+        else:
+            # Soft boundaries start the answer quickly or break up run-on sentences
+            if position >= (target if self.chunks == 0 else self.max_target):
+                return self._cut(position)
+            self.last_soft = position
+        return None
+
+    def feed(self, token: str) -> List[str]:
+        """Add a token, returns the chunks it completed."""
+        chunks = []
+        self.parts.append(token)
+        for index, char in enumerate(token):
+            self._unscanned = len(token) - index - 1
+            self.length += 1
+            position = self.length
+            if self.pending is not None:
+                if char in CLOSERS and not self.pending_soft:
+                    self.pending = position
+                    continue
+                boundary, soft = self.pending, self.pending_soft
+                self.pending = None
+                if char.isspace():
+                    chunk = self._boundary(boundary, soft)
+                    if chunk:
+                        chunks.append(chunk)
+                        position = self.length
+            if char == "\n":
+                self.word, self.word_starts_line = "", True
+                chunk = self._boundary(position, soft=False)
+                if chunk:
+                    chunks.append(chunk)
+                continue
+            if char.isspace():
+                if self.word:
+                    self.word_starts_line = False
+                self.word = ""
+                self.last_space = position
+                continue
+            self.word = (self.word + char)[-MAX_WORD:]
+            if char in HARD:
+                if char != "." or self._ends_sentence(self.word):
+                    self.pending, self.pending_soft = position, False
+            elif char in SOFT:
+                self.pending, self.pending_soft = position, True
+
+            if self.length >= self.max_chars:
+                cut = self.last_hard or self.last_soft or self.last_space or self.length
+                chunks.append(self._cut(cut))
+        # Nothing to say in the whitespace between paragraphs
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def flush(self) -> Optional[str]:
+        """The text left at the end of the stream, if any."""
+        if not self.length:
+            return None
+        chunk = self._cut(self.length)
+        return chunk if chunk.strip() else None
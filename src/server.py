@@ -0,0 +1,200 @@
+"""
+WebSocket voice server, hosting many conversations on one event loop.
+
+Protocol, one WebSocket per call:
+
+* client to server: binary messages of 16kHz mono 16-bit PCM, any size
+* server to client: binary messages holding one WAV per sentence, to be
+  played in order, and {"type": "clear"} text messages when the caller
+  talked over the assistant and the audio not played yet must be dropped
+
+All sessions share the STT, TTS and Gen instances, and with them the
+provider connection pools, and one Silero ONNX model. VAD inference for all
+sessions runs in batches on one BatchScheduler thread. Each session has its
+own VAD state machine, history and player.
+
+Run from src/: python server.py --port 8765
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import logging
+import os
+from http import HTTPStatus
+
+from websockets.asyncio.server import serve
+
+from clients import close_clients
+from conversation import Conversation, _is_factory
+from gen.groq import GroqGen
+from netplayer import NetworkPlayer
+from stt.groqWhisper import GroqWhisper
+from tracing import Tracer
+from tts.groqPlayai import RESPONSE_FORMATS, SAMPLE_RATES, GroqPlayai
+from vad.netlistener import NetworkListener
+from vad.scheduler import BatchScheduler
+from vad.silero_model import DEFAULT_ONNX_PATH, load_silero_model
+from vad.silerovad import SileroVAD
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "You are a friendly assistant talking on the phone. "
+    "Speak in short, conversational sentences."
+)
+
+class VoiceServer:
+    def __init__(self,
+                 stt=GroqWhisper,
+                 tts=GroqPlayai,
+                 gen=GroqGen,
+                 system_prompt=SYSTEM_PROMPT,
+                 max_sessions=200,
+                 model_path=DEFAULT_ONNX_PATH,
+                 batch_vad=True,
+                 vad_options=None,
+                 conversation_options=None,
+                 tracer=None):
+        # Instances or zero-argument factories, shared by all sessions
+        self.stt = stt
+        self.tts = tts
+        self.gen = gen
+        self.system_prompt = system_prompt
+        self.max_sessions = max_sessions
+        self.model_path = model_path
+        self.vad_options = vad_options or {}
+        self.conversation_options = conversation_options or {}
+        self.tracer = tracer or Tracer()
+        self.batch_vad = batch_vad
+        self.vad_model = None
+        self.vad_scheduler = None
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        # Closes of calls whose conversation ended on its own, kept until done
+        self._hangups = set()
+
+    async def start(self):
+        """Build and warm up the shared components once, for all sessions."""
+        async def build(component):
+            if _is_factory(component):
+                component = await asyncio.to_thread(component)
+            await component.warmup()
+            return component
+        # The ONNX model is stateless, so one instance serves every stream
+        self.vad_model, self.stt, self.tts, self.gen = await asyncio.gather(
+            asyncio.to_thread(load_silero_model, "onnx", self.model_path),
+            build(self.stt), build(self.tts), build(self.gen),
+        )
+        if self.batch_vad:
+            self.vad_scheduler = BatchScheduler(self.vad_model)
+        self.tracer.start()
+
+    def new_conversation(self, listener, send, ring=None) -> Conversation:
+        """
+        Conversation for one call on the shared components. listener and
+        ring feed its VAD, send(message) is awaited with each outgoing message.
+        """
+        return Conversation(
+            vad=SileroVAD(listener=listener, model=self.vad_model, scheduler=self.vad_scheduler,
+                          ring=ring, **self.vad_options),
+            stt=self.stt,
+            tts=self.tts,
+            gen=self.gen,
+            player=NetworkPlayer(send),
+            tracer=self.tracer,
+            warmup=False,
+            initial_history=[{"role": "system", "content": self.system_prompt}],
+            **self.conversation_options,
+        )
+
+    def process_request(self, connection, request):
+        # Turn calls away before the handshake once the server is full
+        if len(self.sessions) >= self.max_sessions:
+            logger.warning("Rejecting a call, server is full")
+            return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Server full\n")
+        return None
+
+    async def handle(self, websocket):
+        if len(self.sessions) >= self.max_sessions:
+            await websocket.close(1013, "server full")
+            return
+
+        session_id = next(self._ids)
+        listener = NetworkListener()
+        conversation = self.new_conversation(listener, websocket.send)
+        self.sessions[session_id] = conversation
+        logger.info(f"📞 Session {session_id} connected ({len(self.sessions)} active)")
+        listening = asyncio.create_task(conversation.listen())
+        listening.add_done_callback(functools.partial(self._on_listen_done, session_id, websocket))
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    listener.feed(message)
+        except Exception as e:
+            logger.debug(f"Session {session_id} connection error: {e}")
+        finally:
+            listening.cancel()
+            await asyncio.gather(listening, return_exceptions=True)
+            conversation.player.close()
+            del self.sessions[session_id]
+            logger.info(f"📴 Session {session_id} ended ({len(self.sessions)} active)")
+
+    def _on_listen_done(self, session_id, websocket, listening):
+        """Hang up a call whose conversation ended without the caller hanging up, e.g. on an error."""
+        if listening.cancelled():
+            return
+        error = listening.exception()
+        if error is not None:
+            logger.error(f"Session {session_id} failed, closing the call: {error!r}")
+            code, reason = 1011, "session failed"
+        else:
+            code, reason = 1000, "session ended"
+        hangup = asyncio.create_task(websocket.close(code, reason))
+        self._hangups.add(hangup)
+        hangup.add_done_callback(self._hangups.discard)
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        await self.start()
+        try:
+            async with serve(self.handle, host, port, process_request=self.process_request, max_size=2 ** 20) as server:
+                logger.info(f"🌐 Serving calls on ws://{host}:{port}")
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.vad_scheduler is not None:
+            self.vad_scheduler.close()
+            self.vad_scheduler = None
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket voice server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=200)
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument("--no-batch-vad", action="store_true", help="one VAD inference thread per session")
+    parser.add_argument("--stt-format", choices=["wav", "flac", "opus"], default="wav", help="utterance upload format")
+    parser.add_argument("--trim-silence", action="store_true", help="upload utterances without the silence around them")
+    parser.add_argument("--tts-format", choices=RESPONSE_FORMATS, default="wav", help="speech download format")
+    parser.add_argument("--tts-rate", type=int, choices=SAMPLE_RATES, help="speech sample rate")
+    args = parser.parse_args()
+
+    stt = functools.partial(GroqWhisper, upload_format=args.stt_format, trim_silence=args.trim_silence)
+    tts = functools.partial(GroqPlayai, response_format=args.tts_format, sample_rate=args.tts_rate)
+    server = VoiceServer(stt=stt, tts=tts, max_sessions=args.max_sessions, batch_vad=not args.no_batch_vad,
+                         tracer=Tracer(port=args.metrics_port))
+    try:
+        await server.serve(args.host, args.port)
+    finally:
+        await close_clients()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper()),
+        format='%(asctime)s │ %(name)-20s │ %(levelname)-8s │ %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Speculative response generation.
+
+When the speaker pauses, the end-of-turn timeout still has to run out before
+the turn is over. A Speculation transcribes the speech so far and starts the
+LLM right away, holding the tokens back. If the turn really ends they are
+replayed and the rest follows live; if the user keeps talking they are thrown
+away.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.committed = 0
+        self.discarded = 0
+        # Tokens generated for speculations that were thrown away
+        self.wasted_tokens = 0
+
+    @property
+    def hit_rate(self) -> float:
+        finished = self.committed + self.discarded
+        return self.committed / finished if finished else 0.0
+
+    def __str__(self):
+        return (f"{self.committed}/{self.committed + self.discarded} committed "
+                f"({self.hit_rate:.0%}), {self.wasted_tokens} wasted tokens")
+
+class Speculation:
+    def __init__(self, transcription, gen, history):
+        # History the speculation was started from, only valid while it is unchanged
+        self.messages = history.messages()
+        self.history_version = history.version
+        self.transcription = asyncio.create_task(transcription)
+        self.tokens = []
+        self._new_token = asyncio.Event()
+        self.task = asyncio.create_task(self._run(gen))
+
+    async def _run(self, gen):
+        text = await self.transcription
+        messages = self.messages + [{"role": "user", "content": text}]
+        try:
+            async for token in gen.generate(messages):
+                self.tokens.append(token)
+                self._new_token.set()
+        finally:
+            self._new_token.set()
+
+    def still_valid(self, history) -> bool:
+        return history.version == self.history_version
+
+    async def stream(self):
+        """
+        Replay the buffered tokens, then follow the live generation. Closing
+        the stream early cancels the generation.
+        """
+        sent = 0
+        try:
+            while True:
+                while sent < len(self.tokens):
+                    yield self.tokens[sent]
+                    sent += 1
+                if self.task.done():
+                    # Surface generation errors
+                    await self.task
+                    return
+                self._new_token.clear()
+                await self._new_token.wait()
+        finally:
+            self.task.cancel()
+
+    def cancel(self):
+        self.transcription.cancel()
+        self.task.cancel()
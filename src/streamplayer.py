@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import os
+import queue
+import time
+from collections import deque
+
+import numpy as np
+import pyaudio
+
+from audiobuffer import Audio
+from audiocache import load_cached_pcm
+from audioqueue import AudioQueue
+from decoders import AudioStreamDecoder, decode
+from player import BasePlayer
+
+logger = logging.getLogger(__name__)
+
+def to_device_format(pcm, rate: int, channels: int, sample_width: int,
+                     device_rate: int, device_channels: int):
+    """Convert PCM to 16-bit at the device rate and channel count."""
+    if sample_width == 2 and channels == device_channels and rate == device_rate:
+        # Already in device format, played as is
+        return pcm
+    if sample_width == 2:
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    elif sample_width == 1:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif sample_width == 4:
+        samples = np.frombuffer(pcm, dtype=np.int32).astype(np.float32) / 65536
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    frames = samples.reshape(-1, channels)
+    if channels != device_channels:
+        # Down-mix to mono, then copy to every device channel
+        frames = np.repeat(frames.mean(axis=1, keepdims=True), device_channels, axis=1)
+    if rate != device_rate and len(frames):
+        # Linear interpolation is plenty for speech
+        count = int(len(frames) * device_rate / rate)
+        positions = np.linspace(0, len(frames) - 1, count)
+        frames = np.stack([np.interp(positions, np.arange(len(frames)), frames[:, c])
+                           for c in range(device_channels)], axis=1)
+    return np.clip(frames, -32768, 32767).astype(np.int16).tobytes()
+
+class Clip:
+    """
+    PCM in device format, possibly still being appended to while it plays.
+
+    The producer appends and the stream callback consumes; deque appends and
+    pops are atomic, so neither side takes a lock.
+    """
+    def __init__(self, pcm: bytes = b"", finished=False, on_start=None, on_done=None):
+        self.chunks = deque()
+        # Bytes appended and not played yet
+        self.queued = 0
+        self.finished = finished
+        # Called by the stream callback with the first frames it plays, and the last
+        self.on_start = on_start
+        self.on_done = on_done
+        if pcm:
+            self.append(pcm)
+
+    def append(self, pcm: bytes):
+        self.chunks.append(memoryview(pcm))
+        self.queued += len(pcm)
+
+    def finish(self):
+        self.finished = True
+
+    @property
+    def done(self):
+        return self.finished and not self.chunks
+
+    def read_into(self, out: bytearray, pos: int) -> int:
+        """Copy available frames into out from pos, returns the new position."""
+        while pos < len(out) and self.chunks:
+            chunk = self.chunks[0]
+            n = min(len(out) - pos, len(chunk))
+            out[pos:pos + n] = chunk[:n]
+            pos += n
+            self.queued -= n
+            if n == len(chunk):
+                self.chunks.popleft()
+            else:
+                self.chunks[0] = chunk[n:]
+        return pos
+
+class StreamPlayer(BasePlayer):
+    """
+    Player on one long-lived PyAudio output stream.
+
+    The stream callback pulls frames from the queued clips, so consecutive
+    sentences play back to back without reopening the device, and stop() takes
+    effect within one buffer: it flushes the queue, and the callback drops the
+    current clip when it sees the queue's new generation. Hold music is mixed
+    into the same stream.
+    """
+    def __init__(self, rate=48000, channels=1, buffer_ms=20, wait_threshold=3):
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        self.frames_per_buffer = int(rate * buffer_ms / 1000)
+
+        # Clips in device format, consumed by the stream callback
+        self.queue = AudioQueue(measure=self._measure)
+        # Queue generation the callback last played from
+        self.generation = self.queue.generation
+        self.current = None
+        self.playing = False
+
+        # Configuration
+        self.wait_threshold = wait_threshold  # seconds to wait before starting hold music
+        self.idle_since = time.monotonic()
+
+        # Hold / waiting music, memory-mapped in device format
+        self.hold_pcm = None
+        self.hold_pos = 0
+        self.hold_playing = False
+        try:
+            hold_path = os.path.join(os.path.dirname(__file__), '..', 'assets', 'waiting.mp3')
+            self.hold_pcm, _, _, _ = load_cached_pcm(
+                hold_path, fade_in_ms=2000, sample_rate=rate, channels=channels, sample_width=2)
+            logger.debug("Hold music loaded successfully")
+        except Exception as e:
+            logger.error(f"Failed to load hold music: {e}")
+
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = self.pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=channels,
+            rate=rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self.stream.start_stream()
+
+    def _measure(self, clip):
+        return clip.queued, clip.queued / (self.rate * self.frame_bytes)
+
+    def prepare(self, audio: bytes) -> Audio:
+        # Compressed speech is decoded straight to the device rate, and the rest
+        # converted here too, so enqueue() has nothing left to do on the loop
+        audio = decode(audio, self.rate, self.channels)
+        pcm = to_device_format(audio.pcm, audio.rate, audio.channels, audio.sample_width,
+                               self.rate, self.channels)
+        return Audio(pcm, self.rate, self.channels)
+
+    def enqueue(self, audio: bytes, on_start=None, generation=None, on_done=None):
+        # Already in device format when prepared, which makes this a no-op
+        audio = self.prepare(audio)
+        self.queue.put(Clip(audio.pcm, finished=True, on_start=on_start, on_done=on_done), generation)
+
+    async def enqueue_stream(self, stream, on_start=None, generation=None, on_done=None):
+        # The clip takes its place in the queue right away and starts playing
+        # as soon as its first frames are decoded
+        clip = Clip(on_start=on_start, on_done=on_done)
+        if not self.queue.put(clip, generation):
+            # Flushed since the speech was requested, it will never play
+            return
+        decoder = AudioStreamDecoder(self.rate, self.channels)
+
+        def decode_into_clip(chunk=None):
+            # Run off the event loop: ffmpeg is started, written to and waited for blocking
+            pcm = decoder.feed(chunk) if chunk is not None else decoder.flush()
+            if pcm:
+                clip.append(to_device_format(pcm, *decoder.output_format, self.rate, self.channels))
+
+        try:
+            async for chunk in stream:
+                await asyncio.to_thread(decode_into_clip, chunk)
+            await asyncio.to_thread(decode_into_clip)
+        finally:
+            decoder.close()
+            clip.finish()
+
+    def play(self):
+        self.idle_since = time.monotonic()
+        self.playing = True
+
+    def stop(self):
+        # The callback drops the current clip on its next buffer
+        self.queue.flush()
+        self.playing = False
+
+    def close(self):
+        self.stop()
+        if self.stream.is_active():
+            self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+    def _fill_hold(self, out, pos):
+        # Loop the hold music over the rest of the buffer
+        size = len(out)
+        while pos < size:
+            n = min(size - pos, len(self.hold_pcm) - self.hold_pos)
+            out[pos:pos + n] = self.hold_pcm[self.hold_pos:self.hold_pos + n]
+            pos += n
+            self.hold_pos = (self.hold_pos + n) % len(self.hold_pcm)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        size = frame_count * self.frame_bytes
+        out = bytearray(size)  # silence unless something fills it
+
+        if self.generation != self.queue.generation:
+            self.generation = self.queue.generation
+            self.current = None
+            self.hold_playing = False
+            self.idle_since = time.monotonic()
+            return bytes(out), pyaudio.paContinue
+
+        pos = 0
+        while pos < size:
+            if self.current is None:
+                try:
+                    generation, self.current = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if generation != self.generation:
+                    # Flushed since this buffer started
+                    self.current = None
+                    break
+            start = pos
+            pos = self.current.read_into(out, pos)
+            if pos > start and self.current.on_start:
+                self.current.on_start()
+                self.current.on_start = None
+            if self.current.done:
+                if self.current.on_done:
+                    self.current.on_done()
+                self.current = None
+            elif pos < size:
+                # Streamed clip waiting for more frames, keep its place
+                break
+
+        now = time.monotonic()
+        if pos > 0 or self.current is not None:
+            # Real audio is playing; ensure hold music stops
+            if self.hold_playing:
+                logger.debug("Stopping hold music")
+                self.hold_playing = False
+            self.idle_since = now
+        elif self.playing and self.hold_pcm is not None and now - self.idle_since >= self.wait_threshold:
+            if not self.hold_playing:
+                logger.debug("Starting hold music")
+                self.hold_playing = True
+                self.hold_pos = 0
+            self._fill_hold(out, pos)
+
+        return bytes(out), pyaudio.paContinue
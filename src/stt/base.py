@@ -18,18 +18,27 @@ class STT(ABC):
         pass
 
     @abstractmethod
-    async def transcribe(self, audio: bytes) -> str:
+    async def transcribe(self, audio) -> str:
         """
         Transcribe audio data and return the text result.
         
         Args:
-        1. audio: bytes - The audio data to transcribe
+        1. audio: Audio or bytes - The audio to transcribe, an audiobuffer.Audio or WAV bytes
         
         Returns:
             str: The transcribed text result
         """
         pass
 
+    async def warmup(self):
+        """
+        Prepare the instance for its first request.
+
+        Called once at startup, concurrently with the other components. The
+        default does nothing; network implementations can open connections here.
+        """
+        pass
+
     @abstractmethod
     def close(self):
         """
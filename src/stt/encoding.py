@@ -0,0 +1,194 @@
+"""
+Compression of utterances before they are uploaded for transcription.
+
+Raw 16 kHz 16-bit PCM is 32 KB per second of speech. FLAC sends about a
+third less without changing a sample, Opus at 24 kbit/s about a tenth.
+Encoding runs in an ffmpeg subprocess fed through pipes, so PCM can be
+streamed in while encoded bytes stream out. A spare process is started
+ahead of each utterance, so the encode does not have to wait for ffmpeg
+to start.
+
+Trimming drops the silence around the speech: the VAD's pre-buffer before
+it and the end-of-turn timeout after it.
+"""
+import asyncio
+import logging
+import shutil
+from typing import AsyncIterator, Tuple
+
+import numpy as np
+
+from audiobuffer import Audio, as_audio
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg output options and upload file name of each format
+FORMATS = {
+    "wav": None,
+    "flac": (["-c:a", "flac", "-compression_level", "5", "-f", "flac"], "audio.flac"),
+    "opus": (["-c:a", "libopus", "-application", "voip", "-f", "ogg"], "audio.ogg"),
+}
+
+def trim_silence(audio: Audio, frame_ms=10, floor_db=-50.0, range_db=35.0, margin_ms=150) -> Audio:
+    """
+    The part of audio between the first and last frames louder than
+    range_db below its loudest frame (and than floor_db), plus margin_ms on
+    each side. The result is a view of the same samples.
+    """
+    if audio.sample_width != 2:
+        return audio
+    samples = np.frombuffer(audio.pcm, dtype=np.int16)
+    frame = audio.rate * frame_ms // 1000 * audio.channels
+    count = len(samples) // frame
+    if count == 0:
+        return audio
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32) / 32768
+    level = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    loud = np.flatnonzero(level > max(floor_db, level.max() - range_db))
+    if len(loud) == 0:
+        return audio
+    margin = margin_ms // frame_ms
+    start = max(0, loud[0] - margin) * frame * 2
+    last = loud[-1] + 1 + margin
+    end = len(audio.pcm) if last >= count else last * frame * 2
+    return Audio(audio.pcm[start:end], audio.rate, audio.channels, audio.sample_width)
+
+class UploadEncoder:
+    """
+    Encodes utterances for upload as wav, flac or opus.
+
+    For flac and opus one idle ffmpeg process is kept running, as the spare
+    for the next utterance, for as long as the encoder lives: one per STT
+    instance, shared by all the sessions using it. close() stops it. Without
+    ffmpeg on the PATH the encoder falls back to wav with a warning.
+    """
+    def __init__(self, format="flac", bitrate="24k", sample_rate=None, trim=True, ffmpeg="ffmpeg"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown upload format {format!r}, expected one of {', '.join(FORMATS)}")
+        if format != "wav" and shutil.which(ffmpeg) is None:
+            # Every transcription would fail otherwise
+            logger.warning(f"{ffmpeg} not found, uploading utterances as wav instead of {format}")
+            format = "wav"
+        self.format = format
+        # Opus only
+        self.bitrate = bitrate
+        # Resample before encoding, None keeps the captured rate
+        self.sample_rate = sample_rate
+        self.trim = trim
+        self.ffmpeg = ffmpeg
+        # (rate, channels) and process of the ffmpeg started ahead of time
+        self._spare = None
+        self._preparing = None
+        self._closing = None
+
+    def _command(self, rate, channels):
+        options, _ = FORMATS[self.format]
+        command = [self.ffmpeg, "-hide_banner", "-loglevel", "error",
+                   "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0"]
+        if self.sample_rate and self.sample_rate != rate:
+            command += ["-ar", str(self.sample_rate)]
+        if self.format == "opus":
+            command += ["-b:a", self.bitrate]
+        return command + options + ["pipe:1"]
+
+    async def _spawn(self, rate, channels):
+        return await asyncio.create_subprocess_exec(
+            *self._command(rate, channels),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def _process(self, rate, channels):
+        """An ffmpeg process for this input format, the spare one if it fits."""
+        spare, self._spare = self._spare, None
+        # The next spare starts while this utterance is encoded
+        self._preparing = asyncio.create_task(self.prepare(rate, channels))
+        self._preparing.add_done_callback(self._prepared)
+        if spare is not None:
+            spare_format, process = spare
+            if spare_format == (rate, channels) and process.returncode is None:
+                return process
+            await self._kill(process)
+        return await self._spawn(rate, channels)
+
+    def _prepared(self, task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Could not start a spare {self.format} encoder: {task.exception()}")
+
+    async def _kill(self, process):
+        """Stop process and reap it."""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    async def prepare(self, rate=16000, channels=1):
+        """Start the spare process for the next utterance."""
+        if self.format == "wav" or self._spare is not None:
+            return
+        process = await self._spawn(rate, channels)
+        # Concurrent utterances may have started one in the meantime
+        if self._spare is None:
+            self._spare = ((rate, channels), process)
+        else:
+            await self._kill(process)
+
+    async def stream(self, chunks: AsyncIterator[bytes], rate=16000, channels=1) -> AsyncIterator[bytes]:
+        """Encode 16-bit PCM chunks as they arrive, yielding encoded bytes as ffmpeg produces them."""
+        process = await self._process(rate, channels)
+
+        async def feed():
+            try:
+                async for chunk in chunks:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            finally:
+                process.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                data = await process.stdout.read(65536)
+                if not data:
+                    break
+                yield data
+            await feeder
+            error = await process.stderr.read()
+            if await process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed encoding {self.format}: {error.decode(errors='replace').strip()}")
+        finally:
+            feeder.cancel()
+            await self._kill(process)
+
+    async def encode(self, audio) -> Tuple[str, object]:
+        """(file name, file content) of the upload for an Audio or WAV bytes."""
+        audio = as_audio(audio)
+        if self.trim:
+            audio = trim_silence(audio)
+        if self.format == "wav":
+            return "audio.wav", audio.file()
+
+        async def pcm():
+            yield audio.pcm
+
+        encoded = [data async for data in self.stream(pcm(), audio.rate, audio.channels)]
+        return FORMATS[self.format][1], b"".join(encoded)
+
+    def close(self):
+        spare, self._spare = self._spare, None
+        try:
+            if self._preparing is not None and not self._preparing.done():
+                self._preparing.cancel()
+            if spare is not None and spare[1].returncode is None:
+                spare[1].kill()
+        except (RuntimeError, ProcessLookupError):
+            # Closed after its event loop, the process went with it
+            return
+        if spare is None:
+            return
+        try:
+            # Reaped on the loop when there is one, by asyncio's child watcher thread otherwise
+            self._closing = asyncio.get_running_loop().create_task(spare[1].wait())
+        except RuntimeError:
+            pass
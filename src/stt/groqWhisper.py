@@ -1,25 +1,30 @@
-import io
-from groq import Groq
+from clients import groq_client, warm_up
 import os
 from stt.base import STT
+from stt.encoding import UploadEncoder
 
 class GroqWhisper(STT):
-    def __init__(self, model="whisper-large-v3-turbo", api_key=os.getenv("GROQ_API_KEY"), language="en"):
-        self.groq = Groq(api_key=api_key)
+    def __init__(self, model="whisper-large-v3-turbo", api_key=os.getenv("GROQ_API_KEY"), language="en", base_url=None,
+                 upload_format="wav", trim_silence=False):
+        self.groq = groq_client(api_key=api_key, base_url=base_url)
         self.model = model
         self.language = language
+        # Utterances are uploaded as wav, flac or opus, optionally without the silence around them
+        self.encoder = UploadEncoder(upload_format, trim=trim_silence)
 
-    async def transcribe(self, audio: bytes) -> str:
-        # Convert bytes to file-like object
-        audio_file = io.BytesIO(audio)
-        audio_file.name = "audio.wav"  # Give it a name for the API
-        
-        response = self.groq.audio.transcriptions.create(
-            file=audio_file,
+    async def transcribe(self, audio) -> str:
+        # The file name tells the API the format
+        filename, upload = await self.encoder.encode(audio)
+        response = await self.groq.audio.transcriptions.create(
+            file=(filename, upload),
             model=self.model,
             language=self.language
         )
         return response.text
     
+    async def warmup(self):
+        await warm_up(self.groq)
+        await self.encoder.prepare()
+
     def close(self):
-        pass
\ No newline at end of file
+        self.encoder.close()
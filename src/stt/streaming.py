@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import re
+from typing import List
+from stt.base import STT
+
+logger = logging.getLogger(__name__)
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch(texts: List[str], max_overlap_words=8) -> str:
+    """
+    Join transcripts of consecutive, slightly overlapping segments.
+
+    The words repeated at the start of a segment because of the audio overlap
+    are dropped by matching them against the end of the text so far.
+    """
+    words = []
+    for text in texts:
+        new_words = text.split()
+        limit = min(max_overlap_words, len(words), len(new_words))
+        for size in range(limit, 0, -1):
+            tail = [_normalize(w) for w in words[-size:]]
+            head = [_normalize(w) for w in new_words[:size]]
+            if tail == head:
+                new_words = new_words[size:]
+                break
+        words.extend(new_words)
+    return " ".join(words)
+
+class StreamingTranscriber:
+    """
+    Transcribes an utterance piece by piece while it is still being spoken.
+
+    Partial segments are sent to the STT as soon as the VAD hands them out, so
+    when the turn ends only the short tail is left to transcribe.
+    """
+    def __init__(self, stt: STT, max_overlap_words=8):
+        self.stt = stt
+        self.max_overlap_words = max_overlap_words
+        self.segments = []
+
+    def feed(self, audio: bytes) -> asyncio.Task:
+        """Start transcribing a partial segment in the background."""
+        logger.debug(f"Transcribing partial segment {len(self.segments)}")
+        segment = asyncio.create_task(self.stt.transcribe(audio))
+        self.segments.append(segment)
+        return segment
+
+    async def finish(self, tail: bytes) -> str:
+        """Transcribe the remaining tail and return the stitched utterance."""
+        self.feed(tail)
+        segments, self.segments = self.segments, []
+        try:
+            texts = await asyncio.gather(*segments)
+        finally:
+            for segment in segments:
+                segment.cancel()
+        return stitch(texts, self.max_overlap_words)
+
+    async def preview(self, tail: bytes) -> str:
+        """Transcript of the segments so far plus tail, without consuming them."""
+        # Shielded, cancelling a preview must not cancel the shared segments
+        segments = [asyncio.shield(segment) for segment in self.segments]
+        texts = await asyncio.gather(*segments, self.stt.transcribe(tail))
+        return stitch(texts, self.max_overlap_words)
+
+    def reset(self):
+        """Drop all partial segments of the current utterance."""
+        for segment in self.segments:
+            segment.cancel()
+        self.segments = []
@@ -0,0 +1,405 @@
+"""
+Multi-process voice server.
+
+One process tops out on one core: VAD inference and the rest of the pipeline
+share the GIL. The supervisor terminates the WebSocket connections and runs
+N worker processes, each hosting its sessions on its own VoiceServer with
+its own event loop, VAD scheduler and provider clients.
+
+New calls go to the ready worker with the fewest sessions (then the least
+busy CPU). Audio never goes through pickling: each worker has one block of
+shared memory with a pair of SharedRingBuffers per session slot, PCM in and
+framed outgoing messages out, and only small control messages use the pipe.
+Messages larger than a quarter of the outbound ring go out in several
+frames, so the ring does not have to fit a whole sentence of WAV. The
+shared memory of all workers is checked against the free space of /dev/shm
+at startup, where running out would crash them with SIGBUS.
+Crashed workers are replaced, their calls are closed so callers can dial
+again, and the workers' metrics are summed into one Prometheus endpoint.
+
+Run from src/: python supervisor.py --workers 4 --port 8765
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import struct
+import time
+from http import HTTPStatus
+from multiprocessing.shared_memory import SharedMemory
+
+from websockets.asyncio.server import serve
+
+from stt.groqWhisper import GroqWhisper
+from tts.groqPlayai import RESPONSE_FORMATS, SAMPLE_RATES, GroqPlayai
+from tracing import Tracer
+from vad.ringbuffer import SharedRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Outgoing messages in the shared ring: length, kind, payload
+FRAME = struct.Struct("<IB")
+BINARY = 0
+TEXT = 1
+# Set on the kind of every frame of a message but its last
+MORE = 0x80
+
+SHM_PATH = "/dev/shm"
+
+def shm_available(path=SHM_PATH):
+    """Bytes free for shared memory, None where it is not a filesystem we can check."""
+    try:
+        stats = os.statvfs(path)
+    except (OSError, AttributeError):
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+class SlotLayout:
+    """Where the ring buffers of each session slot live in a worker's shared memory."""
+    def __init__(self, slots, inbound_bytes, outbound_bytes):
+        self.slots = slots
+        # Multiples of 8 keep every ring header aligned
+        self.inbound_bytes = -(-inbound_bytes // 8) * 8
+        self.outbound_bytes = -(-outbound_bytes // 8) * 8
+        self.slot_size = SharedRingBuffer.size_for(self.inbound_bytes) + SharedRingBuffer.size_for(self.outbound_bytes)
+        self.size = slots * self.slot_size
+
+    def rings(self, buffer, slot):
+        """(inbound, outbound) ring buffers of slot."""
+        start = slot * self.slot_size
+        middle = start + SharedRingBuffer.size_for(self.inbound_bytes)
+        return (SharedRingBuffer(buffer[start:middle]),
+                SharedRingBuffer(buffer[middle:start + self.slot_size]))
+
+def worker_main(index, shm_name, layout, conn, server_options, log_level):
+    logging.basicConfig(level=log_level, format=f'%(asctime)s │ worker {index} │ %(name)-20s │ %(levelname)-8s │ %(message)s',
+                        datefmt='%H:%M:%S')
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    asyncio.run(_worker(shm_name, layout, conn, server_options))
+
+async def _worker(shm_name, layout, conn, server_options, metrics_interval=2.0):
+    # Imported here, the supervisor process itself never loads the models
+    from clients import close_clients
+    from server import VoiceServer
+    from vad.netlistener import NetworkListener
+
+    shm = SharedMemory(name=shm_name)
+    server = VoiceServer(**server_options)
+    await server.start()
+    sessions = {}
+
+    async def run_session(slot):
+        inbound, outbound = layout.rings(shm.buf, slot)
+
+        async def send(message):
+            kind, data = (BINARY, message) if isinstance(message, bytes) else (TEXT, message.encode())
+            fragment = outbound.capacity // 4 - FRAME.size
+            for start in range(0, max(1, len(data)), fragment):
+                last = start + fragment >= len(data)
+                frame = FRAME.pack(len(data[start:start + fragment]), kind if last else kind | MORE)
+                frame += data[start:start + fragment]
+                # The front end drains the ring as fast as the client reads
+                while not outbound.write(frame):
+                    await asyncio.sleep(0.01)
+
+        conversation = server.new_conversation(NetworkListener(), send, ring=inbound)
+        try:
+            await conversation.listen()
+        except Exception as e:
+            # Reported as closed below, the front end hangs up the call
+            logger.error(f"Session in slot {slot} failed: {e!r}")
+        finally:
+            conversation.player.close()
+            conversation.vad.close()
+            inbound.release()
+            outbound.release()
+            del sessions[slot]
+            conn.send(("closed", slot))
+
+    def on_control():
+        while conn.poll():
+            kind, slot = conn.recv()
+            if kind == "open":
+                sessions[slot] = asyncio.create_task(run_session(slot))
+            elif kind == "close" and slot in sessions:
+                sessions[slot].cancel()
+
+    asyncio.get_running_loop().add_reader(conn.fileno(), on_control)
+    conn.send(("ready", None))
+    cpu_time, wall_time = time.process_time(), time.monotonic()
+    try:
+        while True:
+            await asyncio.sleep(metrics_interval)
+            now_cpu, now_wall = time.process_time(), time.monotonic()
+            cpu = (now_cpu - cpu_time) / (now_wall - wall_time)
+            cpu_time, wall_time = now_cpu, now_wall
+            conn.send(("metrics", {"cpu": cpu, "tracer": server.tracer.snapshot()}))
+    finally:
+        server.close()
+        await close_clients()
+
+class Worker:
+    def __init__(self, index, layout, server_options, context):
+        self.index = index
+        self.layout = layout
+        self.shm = SharedMemory(create=True, size=layout.size)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(index, self.shm.name, layout, child_conn, server_options, logging.getLogger().level),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.ready = False
+        self.dead = False
+        # A slot is free once both the front end and the worker released it
+        self.free = list(range(layout.slots))
+        # slot -> websocket of the calls on this worker
+        self.sessions = {}
+        # Slots whose session the worker has not reported closed yet
+        self.running = set()
+        self.cpu = 0.0
+        self.metrics = None
+
+    @property
+    def load(self):
+        return (len(self.sessions), self.cpu)
+
+    def send(self, message):
+        try:
+            self.conn.send(message)
+        except OSError:
+            # Died, the supervisor's monitor takes care of it
+            pass
+
+    def release(self):
+        """Free the shared memory once no call uses it anymore."""
+        if not self.sessions:
+            try:
+                self.shm.close()
+            except BufferError:
+                pass
+
+class Supervisor:
+    """
+    Runs the worker processes and routes calls to them.
+
+    Each session slot takes inbound_ms of 16 kHz PCM plus outbound_bytes of
+    shared memory. The outbound ring only holds what the client has not read
+    yet, and the NetworkPlayer paces speech at playback speed, so a few
+    seconds of 24 kHz WAV are plenty.
+    """
+    def __init__(self, workers=None, sessions_per_worker=100, inbound_ms=5000, outbound_bytes=256 * 1024,
+                 server_options=None, tracer=None):
+        self.worker_count = workers or os.cpu_count()
+        self.layout = SlotLayout(sessions_per_worker, 16000 * 2 * inbound_ms // 1000, outbound_bytes)
+        self._check_shared_memory()
+        # Keyword arguments of each worker's VoiceServer, must be picklable
+        self.server_options = server_options or {}
+        self.tracer = tracer or Tracer()
+        # Spawn, forking a process with a running event loop is not safe
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        # Metrics of workers that were replaced, so totals never go down
+        self.retired_metrics = []
+        self.restarts = 0
+        self._monitor = None
+        # Closes of calls whose session ended in the worker, kept until done
+        self._hangups = set()
+
+    def _check_shared_memory(self):
+        """Fail fast if the workers' shared memory does not fit in /dev/shm."""
+        available = shm_available()
+        needed = self.worker_count * self.layout.size
+        if available is None or needed <= available:
+            return
+        fitting = available // (self.worker_count * self.layout.slot_size)
+        raise RuntimeError(
+            f"{self.worker_count} workers with {self.layout.slots} sessions each need {needed / 2 ** 20:.0f} MiB "
+            f"of shared memory, {SHM_PATH} has {available / 2 ** 20:.0f} MiB free. Use at most {fitting} "
+            f"sessions per worker, fewer workers, or a larger {SHM_PATH} (docker run --shm-size)")
+
+    def _spawn(self, index):
+        worker = Worker(index, self.layout, self.server_options, self.context)
+        asyncio.get_running_loop().add_reader(worker.conn.fileno(), self._on_message, worker)
+        return worker
+
+    async def start(self):
+        self.workers = [self._spawn(index) for index in range(self.worker_count)]
+        self._monitor = asyncio.create_task(self._watch())
+        self.tracer.start()
+
+    def _on_message(self, worker):
+        try:
+            while worker.conn.poll():
+                kind, payload = worker.conn.recv()
+                if kind == "ready":
+                    worker.ready = True
+                    logger.info(f"👷 Worker {worker.index} ready")
+                elif kind == "closed":
+                    self._on_closed(worker, payload)
+                elif kind == "metrics":
+                    worker.cpu = payload["cpu"]
+                    worker.metrics = payload["tracer"]
+                    self.tracer.aggregate(self.retired_metrics + [w.metrics for w in self.workers if w.metrics])
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(worker.conn.fileno())
+
+    def _on_closed(self, worker, slot):
+        worker.running.discard(slot)
+        websocket = worker.sessions.get(slot)
+        if websocket is None:
+            # The front end was done with it already
+            worker.free.append(slot)
+            return
+        # The session ended on its own, e.g. on an error: hang up, and handle()
+        # frees the slot once the call is over
+        logger.warning(f"Session on worker {worker.index} slot {slot} ended, closing the call")
+        hangup = asyncio.create_task(websocket.close(1011, "session ended"))
+        self._hangups.add(hangup)
+        hangup.add_done_callback(self._hangups.discard)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(0.5)
+            for position, worker in enumerate(self.workers):
+                if not worker.process.is_alive():
+                    self._replace(position, worker)
+
+    def _replace(self, position, worker):
+        self.restarts += 1
+        logger.error(f"💥 Worker {worker.index} exited with {worker.process.exitcode}, "
+                     f"restarting it and closing its {len(worker.sessions)} calls")
+        worker.dead = True
+        try:
+            asyncio.get_running_loop().remove_reader(worker.conn.fileno())
+        except (ValueError, OSError):
+            pass
+        if worker.metrics:
+            self.retired_metrics.append(worker.metrics)
+        self.workers[position] = self._spawn(worker.index)
+        worker.shm.unlink()
+        # Hung up all at once in the background, so a slow client holds up neither
+        # the other calls nor the watch over the other workers; handle() frees the
+        # shared memory once the last of them is over
+        for websocket in list(worker.sessions.values()):
+            hangup = asyncio.create_task(websocket.close(1011, "worker restarted"))
+            self._hangups.add(hangup)
+            hangup.add_done_callback(self._hangups.discard)
+        worker.release()
+
+    def _pick_worker(self):
+        candidates = [w for w in self.workers if w.ready and not w.dead and w.free]
+        return min(candidates, key=lambda w: w.load) if candidates else None
+
+    def process_request(self, connection, request):
+        if self._pick_worker() is None:
+            logger.warning("Rejecting a call, all workers are full or starting")
+            return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Server full\n")
+        return None
+
+    async def _forward(self, outbound, websocket):
+        """Send the worker's outgoing messages for one call to the client."""
+        fragments = []
+        while True:
+            header = outbound.peek(FRAME.size)
+            if header is None:
+                await asyncio.sleep(0.01)
+                continue
+            length, kind = FRAME.unpack(header)
+            # Frames are published in one write, so the rest is already there
+            fragments.append(outbound.read(FRAME.size + length)[FRAME.size:])
+            if kind & MORE:
+                continue
+            data = b"".join(fragments)
+            fragments = []
+            await websocket.send(data if kind == BINARY else data.decode())
+
+    async def handle(self, websocket):
+        worker = self._pick_worker()
+        if worker is None:
+            await websocket.close(1013, "server full")
+            return
+        slot = worker.free.pop()
+        inbound, outbound = self.layout.rings(worker.shm.buf, slot)
+        inbound.reset()
+        outbound.reset()
+        worker.sessions[slot] = websocket
+        worker.running.add(slot)
+        worker.send(("open", slot))
+        logger.info(f"📞 Call on worker {worker.index} slot {slot} ({len(worker.sessions)} there)")
+
+        forwarding = asyncio.create_task(self._forward(outbound, websocket))
+        dropped = 0
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes) and not inbound.write(message):
+                    dropped += 1
+                    if dropped == 1 or dropped % 100 == 0:
+                        logger.warning(f"Worker {worker.index} is falling behind, dropped {dropped} audio messages")
+        except Exception as e:
+            logger.debug(f"Call connection error: {e}")
+        finally:
+            forwarding.cancel()
+            await asyncio.gather(forwarding, return_exceptions=True)
+            inbound.release()
+            outbound.release()
+            del worker.sessions[slot]
+            if worker.dead:
+                worker.release()
+            elif slot in worker.running:
+                # The slot is reused once the worker confirms with "closed"
+                worker.send(("close", slot))
+            else:
+                worker.free.append(slot)
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        await self.start()
+        try:
+            async with serve(self.handle, host, port, process_request=self.process_request, max_size=2 ** 20) as server:
+                logger.info(f"🌐 Serving calls on ws://{host}:{port} with {self.worker_count} workers")
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for worker in self.workers:
+            worker.process.terminate()
+            worker.process.join()
+            worker.shm.unlink()
+            worker.release()
+        self.workers = []
+        self.tracer.close()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Multi-process WebSocket voice server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sessions-per-worker", type=int, default=100)
+    parser.add_argument("--metrics-port", type=int, help="serve the summed Prometheus metrics on this port")
+    parser.add_argument("--stt-format", choices=["wav", "flac", "opus"], default="wav", help="utterance upload format")
+    parser.add_argument("--trim-silence", action="store_true", help="upload utterances without the silence around them")
+    parser.add_argument("--tts-format", choices=RESPONSE_FORMATS, default="wav", help="speech download format")
+    parser.add_argument("--tts-rate", type=int, choices=SAMPLE_RATES, help="speech sample rate")
+    args = parser.parse_args()
+
+    stt = functools.partial(GroqWhisper, upload_format=args.stt_format, trim_silence=args.trim_silence)
+    tts = functools.partial(GroqPlayai, response_format=args.tts_format, sample_rate=args.tts_rate)
+    supervisor = Supervisor(args.workers, args.sessions_per_worker, server_options={"stt": stt, "tts": tts},
+                            tracer=Tracer(port=args.metrics_port))
+    await supervisor.serve(args.host, args.port)
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper()),
+        format='%(asctime)s │ %(name)-20s │ %(levelname)-8s │ %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    asyncio.run(main())
@@ -0,0 +1,246 @@
+"""
+Per-turn latency tracing.
+
+Conversation marks the moments of each turn on a TurnTrace: the end of the
+user's speech, STT request and response, first LLM token, first sentence,
+TTS request and response, enqueue, and playback start and stop, when the
+answer was played to the end or cut off. When the turn is over the
+Tracer turns the marks into stage durations, adds them to histograms, and
+optionally appends the turn to a JSON-lines file. It also counts the
+answers cut off by the user, and estimates the LLM tokens and TTS audio
+their early abort saved. The histograms can be scraped in the Prometheus text format from a local HTTP endpoint.
+"""
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+# Stage name -> (from mark, to mark)
+STAGES = {
+    "endpointing": ("speech_end", "turn_detected"),
+    "stt": ("stt_request", "stt_response"),
+    "llm_first_token": ("gen_request", "first_token"),
+    "first_sentence": ("first_token", "first_sentence"),
+    "tts_first_sentence": ("tts_request", "tts_response"),
+    "enqueue_wait": ("first_sentence", "enqueue"),
+    "playback_start": ("enqueue", "playback_start"),
+    "time_to_first_audio": ("speech_end", "playback_start"),
+    "playback": ("playback_start", "playback_stop"),
+}
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+class TurnTrace:
+    def __init__(self, turn: int):
+        self.turn = turn
+        self.started_at = time.time()
+        # First time.monotonic() of each mark
+        self.marks = {}
+        # Durations of stages that happen once per sentence, like TTS requests
+        self.spans = {}
+        self.interrupted = False
+        # LLM tokens received for the answer
+        self.tokens = 0
+
+    def mark(self, name: str, at: float = None, last=False):
+        """
+        Record when name happened, only its first occurrence counts, or its
+        latest one if last. Not thread-safe, call it from the event loop.
+        """
+        if last or name not in self.marks:
+            self.marks[name] = time.monotonic() if at is None else at
+
+    def span(self, name: str, seconds: float):
+        self.spans.setdefault(name, []).append(seconds)
+
+    def stages(self):
+        stages = {}
+        for stage, (start, end) in STAGES.items():
+            if start in self.marks and end in self.marks:
+                stages[stage] = self.marks[end] - self.marks[start]
+        return stages
+
+class Tracer:
+    """
+    Collects finished TurnTraces into per-stage histograms.
+
+    jsonl_path appends one JSON object per turn; port serves the histograms
+    at http://127.0.0.1:<port>/metrics once start() was called.
+    """
+    def __init__(self, jsonl_path=None, port=None, host="127.0.0.1"):
+        self.jsonl_path = jsonl_path
+        self.port = port
+        self.host = host
+        self.histograms = {}
+        self.turns = 0
+        self.interrupted = 0
+        # Answers that ran to the end, and their LLM tokens
+        self.answers = 0
+        self.answer_tokens = 0
+        # Answers aborted by the user, and what stopping them early saved
+        self.aborted = 0
+        self.tokens_saved = 0
+        self.audio_seconds_saved = 0.0
+        self._lock = threading.Lock()
+        self.httpd = None
+
+    def start_turn(self) -> TurnTrace:
+        self.turns += 1
+        return TurnTrace(self.turns)
+
+    def finish(self, trace: TurnTrace):
+        stages = trace.stages()
+        with self._lock:
+            if trace.interrupted:
+                self.interrupted += 1
+            for stage, seconds in stages.items():
+                self._observe(stage, seconds)
+            for stage, durations in trace.spans.items():
+                for seconds in durations:
+                    self._observe(stage, seconds)
+        if self.jsonl_path:
+            origin = trace.marks.get("speech_end", min(trace.marks.values(), default=0.0))
+            record = {
+                "turn": trace.turn,
+                "time": trace.started_at,
+                "interrupted": trace.interrupted,
+                "tokens": trace.tokens,
+                "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in stages.items()},
+                # Every mark, relative to the end of the user's speech
+                "marks_ms": {name: round((at - origin) * 1000, 1) for name, at in trace.marks.items()},
+                "spans_ms": {stage: [round(s * 1000, 1) for s in durations] for stage, durations in trace.spans.items()},
+            }
+            try:
+                with open(self.jsonl_path, "a") as sink:
+                    sink.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write trace: {e}")
+
+    def answer_finished(self, tokens: int):
+        with self._lock:
+            self.answers += 1
+            self.answer_tokens += tokens
+
+    def answer_aborted(self, tokens: int, audio_seconds: float):
+        """
+        Count an answer aborted after tokens, whose cancelled synthesis would
+        have made audio_seconds of speech. The tokens saved are estimated
+        from the average length of the answers that ran to the end.
+        """
+        with self._lock:
+            self.aborted += 1
+            if self.answers:
+                self.tokens_saved += max(0, round(self.answer_tokens / self.answers) - tokens)
+            self.audio_seconds_saved += audio_seconds
+
+    def _observe(self, stage, seconds):
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram()
+        self.histograms[stage].observe(seconds)
+
+    def snapshot(self):
+        """Counters and histograms as plain data, e.g. to send to another process."""
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "interrupted": self.interrupted,
+                "answers": self.answers,
+                "answer_tokens": self.answer_tokens,
+                "aborted": self.aborted,
+                "tokens_saved": self.tokens_saved,
+                "audio_seconds_saved": self.audio_seconds_saved,
+                "histograms": {stage: (list(h.counts), h.count, h.sum) for stage, h in self.histograms.items()},
+            }
+
+    def aggregate(self, snapshots):
+        """Replace this tracer's numbers with the sum of snapshots of other tracers."""
+        histograms = {}
+        for snapshot in snapshots:
+            for stage, (counts, count, total) in snapshot["histograms"].items():
+                histogram = histograms.setdefault(stage, Histogram())
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += count
+                histogram.sum += total
+        with self._lock:
+            self.turns = sum(snapshot["turns"] for snapshot in snapshots)
+            self.interrupted = sum(snapshot["interrupted"] for snapshot in snapshots)
+            for counter in ("answers", "answer_tokens", "aborted", "tokens_saved", "audio_seconds_saved"):
+                setattr(self, counter, sum(snapshot[counter] for snapshot in snapshots))
+            self.histograms = histograms
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP callme_turns_total Conversation turns answered",
+            "# TYPE callme_turns_total counter",
+            f"callme_turns_total {self.turns}",
+            "# HELP callme_turns_interrupted_total Turns cut off by the user",
+            "# TYPE callme_turns_interrupted_total counter",
+            f"callme_turns_interrupted_total {self.interrupted}",
+            "# HELP callme_answers_aborted_total Answers whose generation and synthesis were stopped early",
+            "# TYPE callme_answers_aborted_total counter",
+            f"callme_answers_aborted_total {self.aborted}",
+            "# HELP callme_llm_tokens_saved_total Estimated LLM tokens not generated thanks to early aborts",
+            "# TYPE callme_llm_tokens_saved_total counter",
+            f"callme_llm_tokens_saved_total {self.tokens_saved}",
+            "# HELP callme_tts_audio_seconds_saved_total Estimated speech not synthesized thanks to early aborts",
+            "# TYPE callme_tts_audio_seconds_saved_total counter",
+            f"callme_tts_audio_seconds_saved_total {self.audio_seconds_saved}",
+            "# HELP callme_stage_seconds Latency of each stage of a turn",
+            "# TYPE callme_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'callme_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'callme_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'callme_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'callme_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Serve the metrics endpoint, if a port was given."""
+        if self.port is None or self.httpd is not None:
+            return
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tracer = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info(f"📈 Metrics on http://{self.host}:{self.httpd.server_address[1]}/metrics")
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.tracer.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
@@ -26,7 +26,35 @@ class TTS(ABC):
         1. text: str - The text to generate speech for
         
         Returns:
-            bytes: The generated speech audio
+            bytes: The generated speech audio, WAV or any format decoders.decode understands
+        """
+        pass
+
+    async def generate_speech_stream(self, text: str):
+        """
+        Generate speech audio from text, yielding it as it arrives.
+        
+        The chunks concatenated form the same audio as generate_speech
+        returns, decodable as it arrives (see decoders.AudioStreamDecoder), so
+        playback can start before the whole sentence is synthesized. The default implementation yields the
+        complete result of generate_speech as a single chunk.
+        
+        Args:
+        1. text: str - The text to generate speech for
+        
+        Yields:
+            bytes: The next chunk of the speech audio
+        """
+        speech = await self.generate_speech(text)
+        if speech:
+            yield speech
+
+    async def warmup(self):
+        """
+        Prepare the instance for its first request.
+
+        Called once at startup, concurrently with the other components. The
+        default does nothing; network implementations can open connections here.
         """
         pass
 
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from tts.base import TTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "callme", "tts")
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+class CachedTTS(TTS):
+    """
+    Caches the speech of any TTS implementation, keyed by model, voice,
+    response format, sample rate and text.
+
+    Two tiers: an in-memory LRU bounded by memory_bytes, and a directory of
+    speech files, in whatever format the TTS returns, bounded by disk_bytes,
+    evicting the least recently used files. Hits return without touching the
+    network.
+    """
+    def __init__(self, tts: TTS, cache_dir=DEFAULT_CACHE_DIR, memory_bytes=32 * 1024 * 1024, disk_bytes=512 * 1024 * 1024):
+        self.tts = tts
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, text: str) -> str:
+        model = getattr(self.tts, "model", type(self.tts).__name__)
+        voice = getattr(self.tts, "voice", "")
+        # Read on every call, GroqPlayai falls back to wav if its format is rejected
+        response_format = getattr(self.tts, "response_format", "")
+        sample_rate = getattr(self.tts, "sample_rate", None) or ""
+        return hashlib.sha256(
+            f"{model}\0{voice}\0{response_format}\0{sample_rate}\0{normalize_text(text)}".encode()
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # No extension, the bytes are in the TTS's response format
+        return os.path.join(self.cache_dir, key)
+
+    def _remember(self, key: str, speech: bytes):
+        if len(speech) > self.memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        self.memory[key] = speech
+        self.memory_size += len(speech)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _read_disk(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cached:
+                speech = cached.read()
+        except FileNotFoundError:
+            return None
+        # Mark as recently used for eviction
+        os.utime(path)
+        return speech
+
+    def _write_disk(self, key: str, speech: bytes):
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as cached:
+            cached.write(speech)
+        os.replace(tmp_path, self._path(key))
+
+        # Evict least recently used files until the directory fits its budget
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            # Files of other writers still being written are left alone
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    async def _lookup(self, key: str):
+        speech = self.memory.get(key)
+        if speech is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return speech
+        if self.cache_dir:
+            speech = await asyncio.to_thread(self._read_disk, key)
+            if speech is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, speech)
+                return speech
+        self.misses += 1
+        return None
+
+    async def _store(self, key: str, speech: bytes):
+        self._remember(key, speech)
+        if self.cache_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, speech)
+            except OSError as e:
+                logger.warning(f"Could not write TTS cache: {e}")
+
+    async def generate_speech(self, text: str) -> bytes:
+        key = self._key(text)
+        speech = await self._lookup(key)
+        if speech is not None:
+            logger.debug("TTS cache hit")
+            return speech
+        speech = await self.tts.generate_speech(text)
+        if speech:
+            # The format may have fallen back during the request
+            await self._store(self._key(text), speech)
+        return speech
+
+    async def generate_speech_stream(self, text: str):
+        key = self._key(text)
+        speech = await self._lookup(key)
+        if speech is not None:
+            logger.debug("TTS cache hit")
+            yield speech
+            return
+        # Pass chunks through as they arrive, and cache only complete streams
+        chunks = []
+        async for chunk in self.tts.generate_speech_stream(text):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            await self._store(self._key(text), b"".join(chunks))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def warmup(self):
+        await self.tts.warmup()
+
+    def close(self):
+        logger.debug(f"TTS cache: {self.hits} hits ({self.disk_hits} from disk), {self.misses} misses")
+        self.tts.close()
@@ -1,25 +1,121 @@
 from tts.base import TTS
-from groq import Groq
+from clients import groq_client, warm_up
+from contextlib import aclosing
+from decoders import mulaw_wav_header
+import logging
 import os
+import re
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_FORMATS = ("wav", "flac", "mp3", "mulaw", "ogg")
+SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+# Requested for mu-law when no rate is given, its header has to tell one
+MULAW_RATE = 8000
+# What every request falls back to, the provider's own default
+DEFAULT_OPTIONS = {"response_format": "wav"}
 
 class GroqPlayai(TTS):
-    def __init__(self, model="playai-tts", voice="Quinn-PlayAI", api_key=os.getenv("GROQ_API_KEY")):
-        self.client = Groq(api_key=api_key)
+    def __init__(self, model="playai-tts", voice="Quinn-PlayAI", api_key=os.getenv("GROQ_API_KEY"), base_url=None,
+                 response_format="wav", sample_rate=None):
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"Unknown response format {response_format!r}, expected one of {', '.join(RESPONSE_FORMATS)}")
+        if sample_rate is not None and sample_rate not in SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate {sample_rate}, expected one of {SAMPLE_RATES}")
+        self.client = groq_client(api_key=api_key, base_url=base_url)
         self.model = model
         self.voice = voice
+        # Compressed formats and lower rates download faster, the players decode them all
+        self.response_format = response_format
+        self.sample_rate = sample_rate
+
+    def _options(self):
+        options = {"response_format": self.response_format}
+        if self.sample_rate:
+            options["sample_rate"] = self.sample_rate
+        elif self.response_format == "mulaw":
+            options["sample_rate"] = MULAW_RATE
+        return options
+
+    def _header(self, options, size=None) -> bytes:
+        """WAV header telling the decoders the rate of raw mu-law, nothing for the other formats."""
+        if options["response_format"] != "mulaw":
+            return b""
+        return mulaw_wav_header(options["sample_rate"], size)
+
+    def _fall_back(self, error, options):
+        """
+        Options to retry a request rejected with options, None if it failed for good.
+        Only an error naming the format or rate makes every later request use the
+        provider's default wav, any other bad request retries just this one as wav.
+        """
+        if getattr(error, "status_code", None) != 400 or options == DEFAULT_OPTIONS:
+            return None
+        names = ["response_format", "sample_rate", options["response_format"]]
+        if "sample_rate" in options:
+            names.append(str(options["sample_rate"]))
+        if re.search(r"\b(?:" + "|".join(map(re.escape, names)) + r")\b", str(error), re.IGNORECASE):
+            logger.warning(f"TTS rejected {options['response_format']} at "
+                           f"{options.get('sample_rate', 'default')} Hz, using wav from now on: {error}")
+            self.response_format = "wav"
+            self.sample_rate = None
+        else:
+            logger.warning(f"TTS request failed, retrying it as wav: {error}")
+        return DEFAULT_OPTIONS
 
     async def generate_speech(self, text: str) -> bytes:
+        return await self._generate_speech(text, self._options())
+
+    async def _generate_speech(self, text, options) -> bytes:
         try:
-            response = self.client.audio.speech.create(
+            response = await self.client.audio.speech.create(
                 model=self.model,
                 voice=self.voice,
                 input=text,
-                response_format="wav")
+                **options)
             
-            return response.read()
+            speech = await response.read()
+            return self._header(options, len(speech)) + speech
         except Exception as e:
-            print(f"Error generating speech: {e}")
+            retry = self._fall_back(e, options)
+            if retry is not None:
+                return await self._generate_speech(text, retry)
+            logger.error(f"Error generating speech: {e}")
             return None
     
+    async def generate_speech_stream(self, text: str):
+        # Closed with the outer stream, so an abort still closes the response
+        async with aclosing(self._generate_speech_stream(text, self._options())) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    async def _generate_speech_stream(self, text, options):
+        started = False
+        try:
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=self.model,
+                voice=self.voice,
+                input=text,
+                **options) as response:
+
+                async for chunk in response.iter_bytes():
+                    if not started:
+                        started = True
+                        chunk = self._header(options) + chunk
+                    yield chunk
+        except Exception as e:
+            retry = None if started else self._fall_back(e, options)
+            if retry is not None:
+                async with aclosing(self._generate_speech_stream(text, retry)) as stream:
+                    async for chunk in stream:
+                        yield chunk
+                return
+            # Raise so consumers never mistake a truncated stream for a complete one
+            logger.warning(f"Error streaming speech: {e}")
+            raise
+
+    async def warmup(self):
+        await warm_up(self.client)
+
     def close(self):
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,38 @@
+import asyncio
+from contextlib import aclosing
+
+class PrefetchedSpeech:
+    """
+    Runs a speech stream in the background, buffering its chunks until iterated.
+
+    Lets the next sentences download while the current one is still being
+    handed to the player, without breaking the playback order.
+    """
+    def __init__(self, stream):
+        self.chunks = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream):
+        try:
+            # Cancelling the pump closes the stream and its HTTP response
+            async with aclosing(stream):
+                async for chunk in stream:
+                    self.chunks.put_nowait(chunk)
+        finally:
+            self.chunks.put_nowait(None)
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self.chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        # Surface errors raised by the stream
+        await self.task
+
+    def done(self) -> bool:
+        """Whether the whole stream was downloaded, or gave up."""
+        return self.task.done()
+
+    def cancel(self):
+        self.task.cancel()
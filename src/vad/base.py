@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Callable, Optional
 
 class VAD(ABC):
     """
@@ -19,7 +19,10 @@ class VAD(ABC):
         pass
     
     @abstractmethod
-    async def listen(self) -> AsyncGenerator[bytes, None]:
+    async def listen(self, interrupt: Optional[Callable[[], None]] = None,
+                     on_partial: Optional[Callable[[bytes], None]] = None,
+                     on_pause: Optional[Callable[[bytes], None]] = None,
+                     on_resume: Optional[Callable[[], None]] = None) -> AsyncGenerator[bytes, None]:
         """
         Listen for speech activity and yield audio chunks when speech is detected.
         
@@ -28,6 +31,16 @@ class VAD(ABC):
         2. Detect when speech starts and ends
         3. Yield audio data (as bytes) when speech segments are complete
         
+        Args:
+        1. interrupt: callable - Called when the user speaks over the assistant
+        2. on_partial: callable - Streaming mode, called with wav segments of the
+           ongoing speech. The yielded audio then only holds the part of the
+           segment that was not handed to on_partial yet.
+        3. on_pause: callable - Speculative mode, called with the wav audio not
+           handed to on_partial yet as soon as the speaker pauses
+        4. on_resume: callable - Called when speech resumes after on_pause,
+           before the turn ended
+        
         Yields:
             bytes: wav audio data containing detected speech segments
         """
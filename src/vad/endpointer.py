@@ -0,0 +1,97 @@
+"""
+Adaptive end-of-turn detection.
+
+A fixed silence timeout has to be long enough for the slowest speaker's
+mid-sentence pauses, which adds that whole tail to every turn. The
+AdaptiveEndpointer instead learns how long this speaker pauses without
+giving up the turn, and picks a timeout just above that. It lengthens it in
+noisy rooms, and shortens or lengthens it when the partial transcript ends
+a sentence or trails off.
+"""
+import logging
+import re
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Transcript endings that suggest the speaker is done, or is not done yet
+FINAL_ENDING = re.compile(r"[.?!]\s*$")
+CONTINUING_ENDING = re.compile(r"(,|\b(and|but|or|so|because|like|um|uh))\s*$", re.IGNORECASE)
+
+class AdaptiveEndpointer:
+    def __init__(self,
+                 chunk_ms=32,
+                 initial_ms=640,
+                 min_ms=320,
+                 max_ms=1500,
+                 margin_ms=150,
+                 percentile=0.9,
+                 min_pause_ms=96,
+                 history=50,
+                 noise_alpha=0.05,
+                 noise_weight=1.0,
+                 final_factor=0.6,
+                 continuing_factor=1.5,
+                 cutoff_window_ms=1000):
+        self.chunk_ms = chunk_ms
+        self.initial_ms = initial_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.margin_ms = margin_ms
+        self.percentile = percentile
+        # Shorter dips in the speech probability are not pauses
+        self.min_pause_ms = min_pause_ms
+        self.noise_alpha = noise_alpha
+        self.noise_weight = noise_weight
+        self.final_factor = final_factor
+        self.continuing_factor = continuing_factor
+        # Speech starting this soon after an end of turn means we cut the user off
+        self.cutoff_window_ms = cutoff_window_ms
+
+        # Lengths of the pauses this speaker made without ending the turn
+        self.pauses = deque(maxlen=history)
+        # Running average of the speech probability outside of speech
+        self.noise_floor = 0.0
+        self.hint_factor = 1.0
+        self.cutoffs = 0
+
+    def observe_silence(self, prob: float):
+        """Update the noise floor with a chunk outside of speech."""
+        self.noise_floor += self.noise_alpha * (prob - self.noise_floor)
+
+    def pause_ended(self, pause_chunks: int):
+        """Record a pause after which the speaker kept the turn."""
+        pause_ms = pause_chunks * self.chunk_ms
+        if pause_ms >= self.min_pause_ms:
+            self.pauses.append(pause_ms)
+
+    def speech_started(self, gap_ms: float):
+        """Called at speech start with the time since the last end of turn."""
+        if gap_ms < self.cutoff_window_ms:
+            # The last turn was not over: that silence was a pause of this speaker
+            self.cutoffs += 1
+            self.pauses.append(self.timeout_ms() + gap_ms)
+            logger.debug(f"Probable cut-off, {self.cutoffs} so far")
+        self.hint_factor = 1.0
+
+    def hint(self, transcript: str):
+        """Use the latest partial transcript of the ongoing turn."""
+        if FINAL_ENDING.search(transcript):
+            self.hint_factor = self.final_factor
+        elif CONTINUING_ENDING.search(transcript):
+            self.hint_factor = self.continuing_factor
+        else:
+            self.hint_factor = 1.0
+
+    def timeout_ms(self) -> float:
+        if len(self.pauses) >= 5:
+            ordered = sorted(self.pauses)
+            base = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))] + self.margin_ms
+        else:
+            base = self.initial_ms
+        # Noise keeps the probability near the threshold, be more patient
+        base *= 1 + self.noise_weight * self.noise_floor
+        return min(self.max_ms, max(self.min_ms, base * self.hint_factor))
+
+    def timeout_chunks(self) -> int:
+        return max(1, round(self.timeout_ms() / self.chunk_ms))
@@ -1,6 +1,7 @@
 import pyaudio
-import asyncio
-import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Listener:
     def __init__(self, rate=16000, chunk_ms=32, format=pyaudio.paInt16, channels=1):
@@ -9,6 +10,7 @@ class Listener:
         self.chunk_ms = chunk_ms
         self.format = format
         self.channels = channels
+        self.sample_width = pyaudio.get_sample_size(format)
         self.chunk = int(self.rate * self.chunk_ms / 1000)
         self.stream = self.pyaudio.open(
             format=format,
@@ -23,13 +25,16 @@ class Listener:
             data = self.stream.read(self.chunk)
             yield data
 
-    async def listen_async(self):
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            while True:
-                # Run the blocking read in a thread
-                data = await loop.run_in_executor(executor, self.stream.read, self.chunk)
-                yield data
+    def capture(self, ring, stop_event):
+        """
+        Read the microphone into a ring buffer until stop_event is set.
+
+        Meant to run in its own thread, so reads never wait on the consumer.
+        """
+        while not stop_event.is_set():
+            data = self.stream.read(self.chunk, exception_on_overflow=False)
+            if not ring.write(data):
+                logger.warning("Audio ring buffer full, dropping a chunk")
 
     def close(self):
         self.stream.stop_stream()
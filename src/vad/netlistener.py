@@ -0,0 +1,40 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class NetworkListener:
+    """
+    Listener stand-in for audio arriving over the network.
+
+    Exposes the attributes SileroVAD expects from Listener, but there is no
+    device to read: the connection handler calls feed() with 16-bit mono PCM
+    as it arrives, which goes straight into the VAD's ring buffer.
+    """
+    def __init__(self, rate=16000, chunk_ms=32):
+        self.rate = rate
+        self.chunk_ms = chunk_ms
+        self.channels = 1
+        self.sample_width = 2
+        self.chunk = int(self.rate * self.chunk_ms / 1000)
+        self.ring = None
+        # Messages dropped because the VAD fell a full ring buffer behind
+        self.dropped = 0
+
+    def capture(self, ring, stop_event):
+        # Started in its own thread like Listener.capture, but only needs the ring
+        self.ring = ring
+
+    def feed(self, pcm: bytes) -> bool:
+        """Hand received PCM to the VAD, returns False if it had to be dropped."""
+        ring = self.ring
+        if ring is None:
+            return False
+        if not ring.write(pcm):
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning(f"VAD is falling behind, dropped {self.dropped} audio messages")
+            return False
+        return True
+
+    def close(self):
+        self.ring = None
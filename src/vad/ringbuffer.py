@@ -0,0 +1,138 @@
+import threading
+import time
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer byte ring buffer.
+
+    The producer only ever moves the write position and the consumer only the
+    read position, so neither side takes a lock on the data path: a capture
+    thread can keep writing while the consumer is busy with inference.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        # Monotonic byte counters, wrapped with % capacity on access
+        self.write_pos = 0
+        self.read_pos = 0
+        # Number of writes dropped because the consumer fell a full buffer behind
+        self.overruns = 0
+        self._data_ready = threading.Event()
+
+    def available(self) -> int:
+        return self.write_pos - self.read_pos
+
+    def write(self, data: bytes) -> bool:
+        """Append data, returns False and drops it if there is not enough space."""
+        size = len(data)
+        if self.capacity - self.available() < size:
+            self.overruns += 1
+            return False
+        start = self.write_pos % self.capacity
+        first = min(size, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:size - first] = data[first:]
+        # Publish only once the data is in place
+        self.write_pos += size
+        self._data_ready.set()
+        return True
+
+    def read(self, size: int, timeout: float = None):
+        """Read exactly size bytes, waiting up to timeout seconds. Returns None on timeout."""
+        while self.available() < size:
+            self._data_ready.clear()
+            if self.available() >= size:
+                break
+            if not self._data_ready.wait(timeout):
+                return None
+        start = self.read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        # One copy out of the ring, even when the data wraps around
+        view = memoryview(self.buffer)
+        data = b"".join((view[start:start + first], view[:size - first]))
+        view.release()
+        self.read_pos += size
+        return data
+
+    def clear(self):
+        """Drop all unread data, only call from the consumer side."""
+        self.read_pos = self.write_pos
+
+class SharedRingBuffer:
+    """
+    RingBuffer over a region of shared memory, for a producer and a consumer
+    in different processes.
+
+    The region starts with the write and read positions as two 64-bit
+    counters, followed by the data. There is no cross-process event to wait
+    on, so read() with a timeout polls.
+    """
+    HEADER = 16
+
+    def __init__(self, region: memoryview):
+        self.positions = region[:self.HEADER].cast('Q')
+        self.buffer = region[self.HEADER:]
+        self.capacity = len(self.buffer)
+        self.overruns = 0
+
+    @classmethod
+    def size_for(cls, capacity: int) -> int:
+        return cls.HEADER + capacity
+
+    @property
+    def write_pos(self):
+        return self.positions[0]
+
+    @property
+    def read_pos(self):
+        return self.positions[1]
+
+    def available(self) -> int:
+        return self.positions[0] - self.positions[1]
+
+    def write(self, data: bytes) -> bool:
+        """Append data, returns False and drops it if there is not enough space."""
+        size = len(data)
+        if self.capacity - self.available() < size:
+            self.overruns += 1
+            return False
+        start = self.positions[0] % self.capacity
+        first = min(size, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:size - first] = data[first:]
+        # Publish only once the data is in place
+        self.positions[0] += size
+        return True
+
+    def peek(self, size: int):
+        """The next size bytes without consuming them, None if not all there yet."""
+        if self.available() < size:
+            return None
+        start = self.positions[1] % self.capacity
+        first = min(size, self.capacity - start)
+        return b"".join((self.buffer[start:start + first], self.buffer[:size - first]))
+
+    def read(self, size: int, timeout: float = None):
+        """Read exactly size bytes, waiting up to timeout seconds. Returns None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.available() < size:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.002)
+        data = self.peek(size)
+        self.positions[1] += size
+        return data
+
+    def clear(self):
+        """Drop all unread data, only call from the consumer side."""
+        self.positions[1] = self.positions[0]
+
+    def reset(self):
+        """Start over from zero, only while neither side is using the buffer."""
+        self.positions[0] = 0
+        self.positions[1] = 0
+
+    def release(self):
+        # Views must be released before the shared memory can be closed
+        self.positions.release()
+        self.buffer.release()
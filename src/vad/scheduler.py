@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class BatchScheduler:
+    """
+    Runs VAD inference for many audio streams in batched model calls.
+
+    Instead of one inference thread per SileroVAD, a single thread wakes up
+    every window_ms, takes the next chunk of every stream that has one in its
+    ring buffer, and runs them through the ONNX model as one batch. Each
+    stream keeps its own recurrent state, and its results go through its own
+    segmentation state machine (SileroVAD._process) as before.
+    """
+    def __init__(self, model, window_ms=8, max_batch=256):
+        # A SileroOnnxModel, the torch backend cannot batch separate streams
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.streams = {}
+        # Held while a batch is processed, so remove() never races with it
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+
+        self.batches = 0
+        self.chunks = 0
+
+    def add(self, vad, loop, events):
+        """Start running inference for vad, posting its events to the loop's queue."""
+        with self._lock:
+            self.streams[vad] = (loop, events)
+            if self.thread is None:
+                self._stop_event.clear()
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def remove(self, vad):
+        with self._lock:
+            self.streams.pop(vad, None)
+
+    def close(self):
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    @property
+    def mean_batch(self) -> float:
+        return self.chunks / self.batches if self.batches else 0.0
+
+    def _ready(self):
+        """Next chunk of every stream that has one, up to max_batch streams."""
+        ready = []
+        for vad, (loop, events) in self.streams.items():
+            if vad.ring.available() >= vad.chunk_bytes:
+                ready.append((vad, loop, events, vad.ring.read(vad.chunk_bytes)))
+                if len(ready) == self.max_batch:
+                    break
+        return ready
+
+    def _run_batch(self, ready):
+        pcm = np.frombuffer(b"".join(chunk for _, _, _, chunk in ready), dtype=np.int16)
+        pcm = pcm.reshape(len(ready), -1).astype(np.float32) / 32768
+        probs = self.model.batch(pcm, [vad.vad_state for vad, _, _, _ in ready])
+        self.batches += 1
+        self.chunks += len(ready)
+        for (vad, loop, events, chunk), prob in zip(ready, probs):
+            try:
+                for event in vad._process(chunk, float(prob)):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                logger.error(f"Error processing audio chunk: {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            deadline = time.monotonic() + self.window
+            with self._lock:
+                # Streams that fell behind have more than one chunk waiting
+                while True:
+                    ready = self._ready()
+                    if not ready:
+                        break
+                    try:
+                        self._run_batch(ready)
+                    except Exception as e:
+                        logger.error(f"Error running batched VAD inference: {e}")
+            time.sleep(max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,111 @@
+"""
+Silero VAD model backends.
+
+Both backends take one chunk of float32 PCM and the stream's recurrent state,
+and return the speech probability together with the updated state. The ONNX
+backend runs the model with ONNX Runtime from a local file and never imports
+torch.
+"""
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'silero_vad.onnx')
+
+class SileroTorchModel:
+    def __init__(self):
+        import torch
+        self.torch = torch
+        self.model, _ = torch.hub.load(
+            'snakers4/silero-vad',
+            'silero_vad',
+            force_reload=False,
+            onnx=False
+        )
+
+    def initial_state(self):
+        # The JIT model keeps its recurrent state internally
+        self.model.reset_states()
+        return None
+
+    def __call__(self, pcm: np.ndarray, rate: int, state=None):
+        audio = self.torch.from_numpy(pcm)
+        return self.model(audio, rate).max().item(), state
+
+class SileroOnnxState:
+    """Recurrent state of one audio stream for SileroOnnxModel"""
+    def __init__(self, rnn: np.ndarray, context: np.ndarray):
+        self.rnn = rnn
+        self.context = context
+
+class SileroOnnxModel:
+    def __init__(self, model_path=DEFAULT_ONNX_PATH, rate=16000):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        # One chunk is tiny, extra threads only add synchronization overhead
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.rate = rate
+        # The v5 model expects each chunk prefixed with the tail of the previous one
+        self.context_size = 64 if rate == 16000 else 32
+        self.sr = np.array(rate, dtype=np.int64)
+        logger.debug(f"Loaded Silero ONNX model from {model_path}")
+
+    def initial_state(self):
+        return SileroOnnxState(
+            rnn=np.zeros((2, 1, 128), dtype=np.float32),
+            context=np.zeros((1, self.context_size), dtype=np.float32),
+        )
+
+    def __call__(self, pcm: np.ndarray, rate: int, state: SileroOnnxState):
+        if rate != self.rate:
+            raise ValueError(f"Model was loaded for {self.rate} Hz, got {rate} Hz")
+        audio = np.concatenate([state.context, pcm.reshape(1, -1)], axis=1)
+        output, rnn = self.session.run(None, {
+            'input': audio,
+            'state': state.rnn,
+            'sr': self.sr,
+        })
+        state.rnn = rnn
+        state.context = audio[:, -self.context_size:]
+        return float(output[0][0]), state
+
+    def batch(self, pcm: np.ndarray, states) -> np.ndarray:
+        """
+        Run one chunk of each of several streams in a single call.
+
+        pcm has one row per stream, states holds the matching stream states,
+        which are updated in place. Returns the speech probability per row.
+        """
+        audio = np.concatenate([np.concatenate([state.context for state in states]), pcm], axis=1)
+        output, rnn = self.session.run(None, {
+            'input': audio,
+            'state': np.concatenate([state.rnn for state in states], axis=1),
+            'sr': self.sr,
+        })
+        for index, state in enumerate(states):
+            state.rnn = rnn[:, index:index + 1]
+            state.context = audio[index:index + 1, -self.context_size:]
+        return output[:, 0]
+
+def load_silero_model(backend="auto", model_path=DEFAULT_ONNX_PATH, rate=16000):
+    """
+    Load a Silero VAD backend.
+
+    backend is "onnx", "torch" or "auto", which picks ONNX when the model file
+    exists and falls back to torch hub otherwise.
+    """
+    if backend == "auto":
+        backend = "onnx" if os.path.exists(model_path) else "torch"
+    if backend == "onnx":
+        return SileroOnnxModel(model_path, rate)
+    if backend == "torch":
+        return SileroTorchModel()
+    raise ValueError(f"Unknown Silero backend: {backend}")
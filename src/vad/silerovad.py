@@ -1,25 +1,35 @@
-import torch
 import numpy as np
 import asyncio
 import logging
-import wave
-import io
+import threading
+import time
 from collections import deque
 
+from audiobuffer import PcmBuffer
 from vad.listener import Listener
+from vad.ringbuffer import RingBuffer
+from vad.silero_model import load_silero_model, DEFAULT_ONNX_PATH
 from vad.base import VAD
 logger = logging.getLogger(__name__)
 
+# Events posted from the inference thread to the event loop
+SPEECH = "speech"
+PARTIAL = "partial"
+INTERRUPT = "interrupt"
+PAUSE = "pause"
+RESUME = "resume"
+
 class SileroVAD(VAD):
-    def __init__(self, on_threshold=0.8, off_threshold=0.3, on_consecutive=5, off_consecutive=20, prebuffer_ms=500, min_recording_ms=1000):
-        self.listener = Listener()
-        self.vad_model, utils = torch.hub.load(
-            'snakers4/silero-vad',
-            'silero_vad',
-            force_reload=False,
-            onnx=False
-        )
-        (self.get_speech_timestamps, _, _, _, _) = utils
+    def __init__(self, on_threshold=0.8, off_threshold=0.3, on_consecutive=5, off_consecutive=20, prebuffer_ms=500, min_recording_ms=1000, partial_ms=3000, partial_overlap_ms=320, pause_ms=200, ring_ms=10000, backend="auto", model_path=DEFAULT_ONNX_PATH, endpointer=None, listener=None, model=None, scheduler=None, ring=None):
+        self.listener = listener or Listener()
+        # Optional BatchScheduler running inference for many instances at once
+        self.scheduler = scheduler
+        if scheduler is not None:
+            model = scheduler.model
+        # One inference per listener chunk, 32ms = 512 samples at 16kHz.
+        # An ONNX model can be shared between instances, it keeps no state.
+        self.vad_model = model or load_silero_model(backend, model_path, self.listener.rate)
+        self.vad_state = self.vad_model.initial_state()
         
         self.on_threshold = on_threshold
         self.off_threshold = off_threshold
@@ -28,6 +38,14 @@ class SileroVAD(VAD):
         self.speech_active = False
         self.on_count = self.off_count = 0
 
+        # Optional AdaptiveEndpointer replacing the fixed off_consecutive timeout
+        self.endpointer = endpointer
+        # Chunks since the last end of turn, None before the first one
+        self.chunks_since_end = None
+        # time.monotonic() of the last end of speech and of its detection as end of turn
+        self.speech_ended_at = None
+        self.turn_detected_at = None
+
         # Calculate prebuffer size based on chunk duration
         # Each chunk is listener.chunk_ms (32ms by default)
         self.prebuffer_chunks = max(1, int(prebuffer_ms / self.listener.chunk_ms))
@@ -35,72 +53,188 @@ class SileroVAD(VAD):
         
         # Use deque with maxlen for efficient circular buffer
         self.prebuffer = deque(maxlen=self.prebuffer_chunks)
-        self.speech_buffer = []
+        self.chunk_bytes = self.listener.chunk * self.listener.channels * self.listener.sample_width
+        # The utterance is recorded in place and handed out as views of this buffer
+        self.speech_buffer = PcmBuffer(self.chunk_bytes * int(10000 / self.listener.chunk_ms), self.listener.rate,
+                                       self.listener.channels, self.listener.sample_width)
         self.min_recording_ms = min_recording_ms
-    def _pcm_to_wav(self, pcm_data):
-        """Convert PCM audio data to WAV format"""
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, 'wb') as wav_file:
-            wav_file.setnchannels(self.listener.channels)  # mono
-            wav_file.setsampwidth(2)  # 16-bit = 2 bytes
-            wav_file.setframerate(self.listener.rate)  # 16000 Hz
-            wav_file.writeframes(pcm_data)
-        
-        wav_buffer.seek(0)
-        return wav_buffer.getvalue()
-
-    async def listen(self, interrupt: callable = None):
-        for chunk in self.listener.listen():
-            pcm = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768
-            audio = torch.from_numpy(pcm)
-            
-            prob = self.vad_model(audio, self.listener.rate).max().item()
-            
-            # Always add chunk to prebuffer (circular buffer)
-            self.prebuffer.append(chunk)
-
-            speech_duration = (len(self.speech_buffer) - self.prebuffer_chunks) * self.listener.chunk_ms
-
-            if not self.speech_active:
-                if prob > self.on_threshold:
-                    self.on_count += 1
-                    if self.on_count >= self.on_consecutive:
-                        self.speech_active = True
-                        self.off_count = 0
-                        logger.info("🗣️  Speech start")
-                        # Add prebuffer chunks to speech_buffer when speech starts
-                        self.speech_buffer.extend(list(self.prebuffer))
-                else:
+
+        # Streaming mode: hand out rolling segments of at least partial_ms while
+        # speech is still going on, repeating partial_overlap_ms of audio at each
+        # cut so words split by the cut can be stitched back together
+        self.streaming = False
+        self.partial_chunks = max(1, int(partial_ms / self.listener.chunk_ms))
+        self.partial_overlap_chunks = int(partial_overlap_ms / self.listener.chunk_ms)
+        # Number of speech_buffer chunks already handed out as partial segments
+        self.partial_sent = 0
+
+        # Speculative mode: report the start of every pause of at least pause_ms
+        # during speech, and when speech resumes before the end-of-turn timeout
+        self.speculating = False
+        self.pause_chunks = max(1, int(pause_ms / self.listener.chunk_ms))
+        self.paused = False
+
+        # Microphone capture and inference run in their own threads, so the
+        # event loop never waits on audio frames. The ring buffer between them
+        # absorbs inference stalls of up to ring_ms without dropping frames.
+        ring_chunks = max(1, int(ring_ms / self.listener.chunk_ms))
+        # A SharedRingBuffer can be passed in when the audio comes from another process
+        self.ring = ring or RingBuffer(ring_chunks * self.chunk_bytes)
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def _speech_chunks(self):
+        return len(self.speech_buffer) // self.chunk_bytes
+
+    def _partial_ready(self, speech_duration, in_pause):
+        # Prefer cutting in a pause, only force a cut mid-speech after twice as long
+        unsent = self._speech_chunks() - self.partial_sent
+        needed = self.partial_chunks if in_pause else 2 * self.partial_chunks
+        return speech_duration >= self.min_recording_ms and unsent >= needed
+
+    def _unsent_audio(self, advance=True):
+        """Return the speech not handed out as a partial segment yet, with overlap"""
+        start = max(0, self.partial_sent - self.partial_overlap_chunks) if self.partial_sent else 0
+        if advance:
+            self.partial_sent = self._speech_chunks()
+        return self.speech_buffer.audio(start * self.chunk_bytes)
+
+    def _speech_prob(self, chunk):
+        pcm = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768
+        prob, self.vad_state = self.vad_model(pcm, self.listener.rate, self.vad_state)
+        return prob
+
+    def _end_of_turn_chunks(self):
+        if self.endpointer:
+            return self.endpointer.timeout_chunks()
+        return self.off_consecutive
+
+    def _process(self, chunk, prob):
+        """Advance the segmentation state machine by one chunk, returns the resulting events"""
+        events = []
+
+        # Always add chunk to prebuffer (circular buffer)
+        self.prebuffer.append(chunk)
+
+        speech_duration = (self._speech_chunks() - self.prebuffer_chunks) * self.listener.chunk_ms
+
+        if not self.speech_active:
+            if self.endpointer:
+                self.endpointer.observe_silence(prob)
+            if self.chunks_since_end is not None:
+                self.chunks_since_end += 1
+            if prob > self.on_threshold:
+                self.on_count += 1
+                if self.on_count >= self.on_consecutive:
+                    self.speech_active = True
+                    self.off_count = 0
+                    logger.info("🗣️  Speech start")
+                    if self.endpointer and self.chunks_since_end is not None:
+                        self.endpointer.speech_started(self.chunks_since_end * self.listener.chunk_ms)
+                    # Add prebuffer chunks to speech_buffer when speech starts
+                    self.speech_buffer.extend(self.prebuffer)
+            else:
+                self.on_count = 0
+        else:
+            if prob < self.off_threshold:
+                self.off_count += 1
+                if (self.speculating and self.off_count == self.pause_chunks
+                        and speech_duration >= self.min_recording_ms):
+                    # The turn may be over, hand out the speech so far
+                    self.paused = True
+                    events.append((PAUSE, self._unsent_audio(advance=False)))
+                if self.off_count >= self._end_of_turn_chunks():
+                    self.speech_active = False
+                    self.paused = False
+                    # Process the accumulated speech buffer
+                    if speech_duration >= self.min_recording_ms:
+                        logger.info(f"🔇  Speech end (duration: {speech_duration}ms)")
+                        events.append((SPEECH, self._unsent_audio()))
+                        self.turn_detected_at = time.monotonic()
+                        self.speech_ended_at = self.turn_detected_at - self.off_count * self.listener.chunk_ms / 1000
+                        self.chunks_since_end = 0
+                    else:
+                        logger.info(f"🔇  Speech end (duration: {speech_duration}ms) not enough")
+                    self.speech_buffer.clear()
+                    self.partial_sent = 0
                     self.on_count = 0
             else:
-                if prob < self.off_threshold:
-                    self.off_count += 1
-                    if self.off_count >= self.off_consecutive:
-                        self.speech_active = False
-                        # Process the accumulated speech buffer
-                        if speech_duration >= self.min_recording_ms:
-                            logger.info(f"🔇  Speech end (duration: {speech_duration}ms)")
-                            pcm_audio = b''.join(self.speech_buffer)
-                            wav_audio = self._pcm_to_wav(pcm_audio)
-                            yield wav_audio
-                            self.speech_buffer = []
-                        else:
-                            logger.info(f"🔇  Speech end (duration: {speech_duration}ms) not enough")
-                            self.speech_buffer = []
-                        self.on_count = 0
-                else:
-                    self.off_count = 0
-                    if interrupt and speech_duration >= self.min_recording_ms:
-                        interrupt()
-                    
-            # Add current chunk to speech buffer if speech is active
-            if self.speech_active:
-                self.speech_buffer.append(chunk)
-            
-            # Yield control back to the event loop
-            await asyncio.sleep(0)
+                if self.endpointer and self.off_count:
+                    self.endpointer.pause_ended(self.off_count)
+                self.off_count = 0
+                if self.paused:
+                    self.paused = False
+                    events.append((RESUME, None))
+                if speech_duration >= self.min_recording_ms:
+                    events.append((INTERRUPT, None))
+
+        # Add current chunk to speech buffer if speech is active
+        if self.speech_active:
+            self.speech_buffer.append(chunk)
+
+            # Streaming mode: hand out what was said so far
+            if self.streaming and self._partial_ready(speech_duration, prob < self.off_threshold):
+                events.append((PARTIAL, self._unsent_audio()))
+
+        return events
+
+    def _inference_worker(self, loop, events):
+        while not self._stop_event.is_set():
+            chunk = self.ring.read(self.chunk_bytes, timeout=0.1)
+            if chunk is None:
+                continue
+            try:
+                prob = self._speech_prob(chunk)
+                for event in self._process(chunk, prob):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                logger.error(f"Error processing audio chunk: {e}")
+
+    def _start(self, loop, events):
+        self._stop_event.clear()
+        self.ring.clear()
+        self._threads = [
+            threading.Thread(target=self.listener.capture, args=(self.ring, self._stop_event), daemon=True),
+        ]
+        if self.scheduler is not None:
+            self.scheduler.add(self, loop, events)
+        else:
+            self._threads.append(threading.Thread(target=self._inference_worker, args=(loop, events), daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _stop(self):
+        self._stop_event.set()
+        if self.scheduler is not None:
+            self.scheduler.remove(self)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    async def listen(self, interrupt: callable = None, on_partial: callable = None,
+                     on_pause: callable = None, on_resume: callable = None):
+        events = asyncio.Queue()
+        self.streaming = on_partial is not None
+        self.speculating = on_pause is not None
+        self._start(asyncio.get_running_loop(), events)
+        try:
+            while True:
+                kind, audio = await events.get()
+                if kind == SPEECH:
+                    yield audio
+                elif kind == PARTIAL:
+                    on_partial(audio)
+                elif kind == INTERRUPT and interrupt:
+                    interrupt()
+                elif kind == PAUSE:
+                    on_pause(audio)
+                elif kind == RESUME and on_resume:
+                    on_resume()
+        finally:
+            self._stop()
     
     def close(self):
+        self._stop()
         self.listener.close()
 
     def __del__(self):
@@ -109,7 +243,7 @@ class SileroVAD(VAD):
 if __name__ == "__main__":
     async def main():
         vad = SileroVAD()
-        async for chunk in vad.listen_async():
+        async for chunk in vad.listen():
             print(len(chunk))
 
     asyncio.run(main())
\ No newline at end of file
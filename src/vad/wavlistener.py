@@ -0,0 +1,82 @@
+import logging
+import time
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class WavListener:
+    """
+    Listener stand-in that plays WAV files instead of the microphone.
+
+    Exposes the same attributes and capture/listen methods as Listener, so the
+    real SileroVAD state machine can run on recordings. Files are resampled
+    to 16kHz mono and followed by gap_ms of silence; once they are all played,
+    capture keeps feeding silence so the last turn can end.
+    """
+    def __init__(self, paths, rate=16000, chunk_ms=32, gap_ms=1000, realtime=True):
+        self.rate = rate
+        self.chunk_ms = chunk_ms
+        self.channels = 1
+        self.sample_width = 2
+        self.chunk = int(self.rate * self.chunk_ms / 1000)
+        self.realtime = realtime
+
+        chunk_bytes = self.chunk * self.sample_width
+        audio = bytearray()
+        # Where each file starts in the stream, in seconds
+        self.offsets = []
+        for path in paths:
+            self.offsets.append(len(audio) / self.sample_width / rate)
+            audio += self._read(path)
+            audio += bytes(int(rate * gap_ms / 1000) * self.sample_width)
+        # Pad to whole chunks
+        audio += bytes(-len(audio) % chunk_bytes)
+        self.audio = bytes(audio)
+        self.silence = bytes(chunk_bytes)
+        # time.monotonic() when listen started playing the files
+        self.started_at = None
+
+    def _read(self, path):
+        with wave.open(path, 'rb') as wav_file:
+            rate = wav_file.getframerate()
+            channels = wav_file.getnchannels()
+            if wav_file.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit WAV files are supported")
+            samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+        samples = samples.reshape(-1, channels).mean(axis=1)
+        if rate != self.rate:
+            positions = np.linspace(0, len(samples) - 1, int(len(samples) * self.rate / rate))
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+        return samples.astype(np.int16).tobytes()
+
+    def chunks(self):
+        """All chunks of the recordings, without pacing."""
+        chunk_bytes = self.chunk * self.sample_width
+        for start in range(0, len(self.audio), chunk_bytes):
+            yield self.audio[start:start + chunk_bytes]
+
+    def listen(self):
+        next_time = self.started_at = time.monotonic()
+        for chunk in self.chunks():
+            if self.realtime:
+                next_time += self.chunk_ms / 1000
+                time.sleep(max(0, next_time - time.monotonic()))
+            yield chunk
+        while True:
+            if self.realtime:
+                time.sleep(self.chunk_ms / 1000)
+            yield self.silence
+
+    def capture(self, ring, stop_event):
+        for data in self.listen():
+            if stop_event.is_set():
+                return
+            while not ring.write(data):
+                # Not a live source, wait for the consumer instead of dropping
+                if stop_event.wait(self.chunk_ms / 1000):
+                    return
+
+    def close(self):
+        pass